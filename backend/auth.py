@@ -0,0 +1,433 @@
+"""
+Token authentication: HS256 JWTs, scrypt password hashes and refresh rotation
+Access tokens are verified locally (no database lookup); verified claims are
+kept in a small LRU keyed by the token, so a hot token costs a dict lookup
+per request. Password hashing is deliberately slow and always runs in the
+thread pool, off the event loop. Refresh tokens are single-use: each refresh
+issues a new pair in the same family, and presenting a spent refresh token
+again revokes the whole family. Guests get the same token pairs for a
+random guest id the server picks, so a guest's data is theirs alone.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+# Guest ids are issued by the server (never chosen by the caller) and can't
+# collide with account ids, which are UUIDs
+GUEST_PREFIX = "guest-"
+
+
+# Signing keys shorter than this, or copied from an example file, are refused
+MIN_SECRET_KEY_CHARS = 32
+PLACEHOLDER_SECRET_KEYS = {"your-secret-key", "your-secret-key-here", "secret", "changeme", "change-me"}
+
+
+def check_secret_key(secret: str) -> None:
+    """Raise ValueError for a signing key that is a known placeholder or too short to resist guessing"""
+    if secret.strip().lower() in PLACEHOLDER_SECRET_KEYS:
+        raise ValueError("SECRET_KEY is a placeholder; set it to a random value (e.g. secrets.token_urlsafe(32))")
+    if len(secret) < MIN_SECRET_KEY_CHARS:
+        raise ValueError(f"SECRET_KEY must be at least {MIN_SECRET_KEY_CHARS} characters")
+
+
+class TokenError(Exception):
+    """Token is malformed, forged, expired, of the wrong type or revoked"""
+
+
+class UserExistsError(Exception):
+    pass
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenSigner:
+    """Issues and verifies compact HS256 JWTs"""
+
+    HEADER = b64url_encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+    def __init__(self, secret: str, access_ttl: float = 3600, refresh_ttl: float = 1209600, leeway: float = 0):
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.leeway = leeway
+        # Keyed once; each signature copies the prepared HMAC state
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+    def _signature(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def issue(self, subject: str, kind: str = ACCESS, now: Optional[float] = None, **claims: Any) -> Tuple[str, dict]:
+        """Signed token for ``subject`` plus its claims"""
+        now = time.time() if now is None else now
+        ttl = self.access_ttl if kind == ACCESS else self.refresh_ttl
+        claims = {"sub": subject, "typ": kind, "iat": int(now), "exp": int(now + ttl), **claims}
+        payload = b64url_encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = f"{self.HEADER}.{payload}"
+        token = f"{signing_input}.{b64url_encode(self._signature(signing_input.encode()))}"
+        return token, claims
+
+    def verify(self, token: str, kind: str = ACCESS, now: Optional[float] = None) -> dict:
+        """Claims of a valid, unexpired token of type ``kind``; raises TokenError otherwise"""
+        try:
+            signing_input, signature = token.rsplit(".", 1)
+            header, payload = signing_input.split(".")
+            valid = hmac.compare_digest(self._signature(signing_input.encode()), b64url_decode(signature))
+        except (ValueError, UnicodeEncodeError):
+            raise TokenError("Malformed token")
+        # Anything but the one header we issue (e.g. alg=none) is rejected
+        if not valid or header != self.HEADER:
+            raise TokenError("Invalid token signature")
+        try:
+            claims = json.loads(b64url_decode(payload))
+        except ValueError:
+            raise TokenError("Malformed token")
+        if not isinstance(claims, dict) or claims.get("typ") != kind:
+            raise TokenError("Wrong token type")
+        now = time.time() if now is None else now
+        if not isinstance(claims.get("exp"), int) or claims["exp"] + self.leeway <= now:
+            raise TokenError("Token expired")
+        return claims
+
+
+class ClaimsCache:
+    """LRU of verified access-token claims, keyed by the token string.
+
+    Only exact tokens that already passed signature checks are stored, so a
+    hit is as trustworthy as a fresh verification; expiry is re-checked on
+    every hit.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str, now: float) -> Optional[dict]:
+        claims = self._entries.get(token)
+        if claims is None:
+            self.misses += 1
+            return None
+        if claims["exp"] <= now:
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[token] = claims
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PasswordHasher:
+    """scrypt password hashes, encoded as ``scrypt$n$r$p$salt$hash``.
+
+    Hashing costs tens of milliseconds of CPU by design; call it from the
+    thread pool (hashlib releases the GIL while it runs).
+    """
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, length: int = 32):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.length = length
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int, length: int) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=length,
+                              maxmem=128 * n * r * p + 1024 * 1024)
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        derived = self._derive(password, salt, self.n, self.r, self.p, self.length)
+        return f"scrypt${self.n}${self.r}${self.p}${b64url_encode(salt)}${b64url_encode(derived)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            scheme, n, r, p, salt, expected = encoded.split("$")
+            expected = b64url_decode(expected)
+            derived = self._derive(password, b64url_decode(salt), int(n), int(r), int(p), len(expected))
+        except ValueError:
+            return False
+        return scheme == "scrypt" and hmac.compare_digest(derived, expected)
+
+
+class SQLiteUserStore:
+    """Users and issued refresh tokens in SQLite (WAL), one connection per thread.
+
+    Methods are synchronous and are called from the thread pool. Refresh
+    token use is a single conditional UPDATE, so rotation stays correct
+    across worker processes sharing the database.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            email TEXT NOT NULL,
+            name TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            jti TEXT PRIMARY KEY,
+            family TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            used_at REAL,
+            revoked INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens (family);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # Throwaway connection, so nothing is inherited by forked workers
+        with closing(sqlite3.connect(self.path)) as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def create_user(self, user: Dict[str, Any]) -> None:
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "INSERT INTO users (id, username, email, name, password_hash, created_at) "
+                    "VALUES (:id, :username, :email, :name, :password_hash, :created_at)",
+                    user,
+                )
+        except sqlite3.IntegrityError:
+            raise UserExistsError(user["username"])
+
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        return dict(row) if row else None
+
+    def add_refresh_token(self, jti: str, family: str, user_id: str, expires_at: float) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO refresh_tokens (jti, family, user_id, expires_at) VALUES (?, ?, ?, ?)",
+                (jti, family, user_id, expires_at),
+            )
+
+    def use_refresh_token(self, jti: str, now: float) -> str:
+        """Mark a refresh token spent.
+
+        Returns ``ok``, ``reused`` (already spent: the family is revoked now),
+        ``revoked`` or ``unknown``.
+        """
+        with self._connection() as connection:
+            updated = connection.execute(
+                "UPDATE refresh_tokens SET used_at = ? WHERE jti = ? AND used_at IS NULL AND revoked = 0",
+                (now, jti),
+            ).rowcount
+            if updated:
+                return "ok"
+            row = connection.execute(
+                "SELECT family, used_at FROM refresh_tokens WHERE jti = ?", (jti,)).fetchone()
+            if row is None:
+                return "unknown"
+            if row["used_at"] is None:
+                return "revoked"
+            connection.execute("UPDATE refresh_tokens SET revoked = 1 WHERE family = ?", (row["family"],))
+            return "reused"
+
+    def prune(self, now: float) -> int:
+        """Drop refresh tokens past their expiry"""
+        with self._connection() as connection:
+            return connection.execute("DELETE FROM refresh_tokens WHERE expires_at < ?", (now,)).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+def public_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": user["id"], "username": user["username"], "email": user["email"], "name": user["name"]}
+
+
+def guest_user(user_id: str) -> Dict[str, Any]:
+    """The account-shaped record of a guest (guests have no row in the users table)"""
+    return {"id": user_id, "username": user_id, "email": "", "name": "Guest", "guest": True}
+
+
+class Authenticator:
+    """Login, registration, token refresh and per-request token checks"""
+
+    def __init__(self, store: SQLiteUserStore, signer: TokenSigner,
+                 hasher: Optional[PasswordHasher] = None, cache_size: int = 10000, hash_concurrency: int = 2):
+        self.store = store
+        self.signer = signer
+        self.hasher = hasher or PasswordHasher()
+        # Bounds CPU spent hashing per process: a burst of logins queues here
+        # instead of crowding out the event loop's thread
+        self._hash_slots = asyncio.Semaphore(hash_concurrency)
+        self.claims_cache = ClaimsCache(cache_size)
+        # Verified against when the username is unknown, so both paths cost the same
+        self._dummy_hash: Optional[str] = None
+        self.rejected = 0
+        self.refresh_reuse = 0
+        self.guests = 0
+
+    def authenticate(self, token: str) -> dict:
+        """Claims of a valid access token; raises TokenError. Cheap: runs on the event loop"""
+        now = time.time()
+        claims = self.claims_cache.get(token, now)
+        if claims is None:
+            try:
+                claims = self.signer.verify(token, ACCESS, now)
+            except TokenError:
+                self.rejected += 1
+                raise
+            self.claims_cache.put(token, claims)
+        return claims
+
+    def _issue(self, user: Dict[str, Any], family: Optional[str] = None) -> dict:
+        # Guest tokens say so, so refreshing one doesn't look for an account
+        guest = {"guest": True} if user.get("guest") else {}
+        access_token, _ = self.signer.issue(user["id"], ACCESS, name=user["username"], **guest)
+        refresh_token, refresh = self.signer.issue(
+            user["id"], REFRESH, jti=uuid.uuid4().hex, fam=family or uuid.uuid4().hex, **guest)
+        self.store.add_refresh_token(refresh["jti"], refresh["fam"], user["id"], refresh["exp"])
+        return {
+            "user": public_user(user),
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": int(self.signer.access_ttl),
+        }
+
+    def _login(self, username: str, password: str) -> Optional[dict]:
+        user = self.store.get_user(username)
+        if user is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hasher.hash(secrets.token_urlsafe(16))
+            self.hasher.verify(password, self._dummy_hash)
+            return None
+        if not self.hasher.verify(password, user["password_hash"]):
+            return None
+        return self._issue(user)
+
+    def _register(self, username: str, email: str, name: str, password: str, user_id: Optional[str]) -> dict:
+        user = {
+            "id": user_id or str(uuid.uuid4()),
+            "username": username,
+            "email": email,
+            "name": name or username,
+            "password_hash": self.hasher.hash(password),
+            "created_at": time.time(),
+        }
+        self.store.create_user(user)
+        return self._issue(user)
+
+    def _guest(self) -> dict:
+        self.guests += 1
+        return self._issue(guest_user(f"{GUEST_PREFIX}{uuid.uuid4().hex}"))
+
+    def _refresh(self, token: str) -> dict:
+        claims = self.signer.verify(token, REFRESH)
+        status = self.store.use_refresh_token(claims["jti"], time.time())
+        if status == "reused":
+            self.refresh_reuse += 1
+            logger.warning("Refresh token reused; revoked token family %s", claims["fam"])
+        if status != "ok":
+            raise TokenError("Refresh token is no longer valid")
+        if claims.get("guest"):
+            return self._issue(guest_user(claims["sub"]), family=claims["fam"])
+        user = self.store.get_user_by_id(claims["sub"])
+        if user is None:
+            raise TokenError("Unknown user")
+        return self._issue(user, family=claims["fam"])
+
+    async def login(self, username: str, password: str) -> Optional[dict]:
+        """Token pair and user for valid credentials, None otherwise"""
+        async with self._hash_slots:
+            return await run_in_threadpool(self._login, username, password)
+
+    async def register(self, username: str, email: str, name: str, password: str,
+                       user_id: Optional[str] = None) -> dict:
+        """Create a user and log them in; raises UserExistsError"""
+        async with self._hash_slots:
+            return await run_in_threadpool(self._register, username, email, name, password, user_id)
+
+    async def guest(self) -> dict:
+        """Token pair for a new guest id that only its holder can use"""
+        return await run_in_threadpool(self._guest)
+
+    async def refresh(self, token: str) -> dict:
+        """Rotate a refresh token into a new pair; raises TokenError"""
+        return await run_in_threadpool(self._refresh, token)
+
+    async def ensure_user(self, username: str, password: str, email: str, name: str, user_id: str) -> None:
+        """Create a (demo) user unless the username already exists"""
+        if await run_in_threadpool(self.store.get_user, username) is None:
+            try:
+                await self.register(username, email, name, password, user_id)
+            except UserExistsError:
+                pass
+
+    async def prune(self) -> int:
+        return await run_in_threadpool(self.store.prune, time.time())
+
+    def stats(self) -> dict:
+        return {
+            "claims_cache_size": len(self.claims_cache),
+            "claims_cache_hits": self.claims_cache.hits,
+            "claims_cache_misses": self.claims_cache.misses,
+            "rejected_tokens": self.rejected,
+            "refresh_reuse_detected": self.refresh_reuse,
+            "guest_sessions_issued": self.guests,
+        }
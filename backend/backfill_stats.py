@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Rebuild every user's wellness stats from the raw events
+Reads all stored user chat messages, media suggestions and mood check-ins
+from the chat database and rewrites the per-user aggregates in one
+transaction (see stats_engine.build_aggregates). Run it with the app
+stopped, after changing STATS_SESSION_GAP_SECONDS / STATS_ROLLING_DAYS or to
+repair aggregates; events written while it runs may be counted twice.
+
+    python backfill_stats.py
+    python backfill_stats.py --db /var/lib/mindchat/chat_history.db
+"""
+
+import argparse
+import logging
+import time
+
+from settings import get_settings
+from stats_engine import SQLiteStatsStore, StatsEngine
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=settings.chat_db_path)
+    parser.add_argument("--session-gap", type=float, default=settings.stats_session_gap_seconds)
+    parser.add_argument("--rolling-days", type=int, default=settings.stats_rolling_days)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    store = SQLiteStatsStore(args.db)
+    engine = StatsEngine(store, session_gap=args.session_gap, rolling_days=args.rolling_days)
+    started = time.perf_counter()
+    try:
+        users = engine.backfill()
+    finally:
+        store.close()
+    print(f"Rebuilt stats for {users} users in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Authentication overhead benchmark
+Measures token verification with and without the claims cache, the added
+latency of the auth dependency on an in-process ASGI request (same route
+with and without it), and event-loop lag while logins hash passwords in the
+thread pool. Exits 1 if the cached dependency adds more than --budget-ms.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_auth.db"))
+os.environ.setdefault("SECRET_KEY", "bench-secret-" + "x" * 32)
+
+from fastapi import Depends, FastAPI  # noqa: E402
+
+import main as backend  # noqa: E402
+from auth import TokenSigner  # noqa: E402
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def asgi_request(app, path, headers):
+    """One GET through the ASGI app without a network hop"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8001),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def route_overhead(token, iterations, rounds):
+    """Median per-request cost of /plain and /authed (same handler, plus the dependency)"""
+    app = FastAPI()
+
+    @app.get("/plain")
+    async def plain():
+        return {"ok": True}
+
+    @app.get("/authed")
+    async def authed(claims=Depends(backend.current_user)):
+        return {"ok": True}
+
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    assert await asgi_request(app, "/authed", headers) == 200
+    results = {"/plain": [], "/authed": []}
+    for _ in range(rounds):
+        for path in results:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await asgi_request(app, path, headers)
+            results[path].append((time.perf_counter() - started) / iterations * 1e6)
+    return {path: statistics.median(samples) for path, samples in results.items()}
+
+
+async def login_loop_lag(logins):
+    """Worst event-loop stall while ``logins`` concurrent logins hash passwords"""
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - started - 0.001)
+
+    task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    sessions = await asyncio.gather(*(backend.authenticator.login("demo", "password") for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done = True
+    await task
+    assert all(sessions)
+    return elapsed, worst
+
+
+async def run(args):
+    auth = backend.authenticator
+    await auth.ensure_user("demo", "password", "demo@mindchat.com", "Demo User", "test-user-id")
+    session = await auth.login("demo", "password")
+    token = session["access_token"]
+
+    signer = auth.signer
+    fresh_signer = TokenSigner(os.environ["SECRET_KEY"])
+    print(f"{'operation':<38} {'us/call':>9}")
+    print(f"{'issue access token':<38} {per_call_us(lambda: fresh_signer.issue('u', name='demo'), args.iterations):>9.2f}")
+    print(f"{'verify (signature + claims)':<38} {per_call_us(lambda: signer.verify(token), args.iterations):>9.2f}")
+    print(f"{'authenticate (claims cache hit)':<38} {per_call_us(lambda: auth.authenticate(token), args.iterations):>9.2f}")
+    print(f"{'password hash (scrypt)':<38} {per_call_us(lambda: auth.hasher.hash('password'), 5):>9.0f}")
+
+    routes = await route_overhead(token, args.requests, args.rounds)
+    overhead_ms = (routes["/authed"] - routes["/plain"]) / 1000
+    print(f"\n{'route':<12} {'us/request':>11}")
+    for path, cost in routes.items():
+        print(f"{path:<12} {cost:>11.1f}")
+    print(f"auth dependency overhead: {overhead_ms * 1000:.1f} us/request (budget {args.budget_ms} ms)")
+
+    elapsed, worst = await login_loop_lag(args.logins)
+    print(f"\n{args.logins} concurrent logins: {elapsed * 1000:.0f} ms total, "
+          f"worst event-loop stall {worst * 1000:.2f} ms")
+
+    return overhead_ms <= args.budget_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100000, help="calls per microbenchmark")
+    parser.add_argument("--requests", type=int, default=5000, help="ASGI requests per route per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--budget-ms", type=float, default=0.1, help="max allowed dependency overhead")
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        print("FAIL: auth dependency overhead over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
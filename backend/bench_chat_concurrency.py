@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for /api/v1/chat/send against a local fake OpenAI server
+Shows that chat throughput scales with concurrency now that upstream calls
+no longer block the event loop.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+import fake_openai_server
+
+CHAT_MESSAGE = "I had a long day at work today and I keep thinking about it"
+
+
+async def run_level(app, concurrency: int, requests_per_worker: int) -> dict:
+    """Drive the app with `concurrency` parallel clients and measure throughput"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            for _ in range(requests_per_worker):
+                response = await client.post("/api/v1/chat/send", json={"message": CHAT_MESSAGE})
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = concurrency * requests_per_worker
+    return {"concurrency": concurrency, "requests": total, "seconds": elapsed, "rps": total / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--levels", default="1,4,16,64")
+    parser.add_argument("--requests-per-worker", type=int, default=5)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    fake_openai_server.start_in_thread(args.port, args.latency_ms)
+
+    # main.py builds its OpenAI client at import time, so configure it first
+    os.environ["OPENAI_API_KEY"] = "sk-fake-benchmark-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ["OPENAI_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+    # Every request sends the same message; measure the upstream pool, not cache hits
+    os.environ["COMPLETION_CACHE_BACKEND"] = "off"
+    import main
+
+    print(f"Fake upstream latency: {args.latency_ms:.0f} ms, pool size: {args.max_concurrency}")
+    print(f"{'concurrency':>12} {'requests':>9} {'seconds':>9} {'req/s':>9}")
+
+    async def run_all():
+        # One event loop for every level, as in a real server process
+        for level in (int(x) for x in args.levels.split(",")):
+            result = await run_level(main.app, level, args.requests_per_worker)
+            print(f"{result['concurrency']:>12} {result['requests']:>9} {result['seconds']:>9.2f} {result['rps']:>9.1f}")
+
+    asyncio.run(run_all())
+
+    stats = main.openai_client.stats()
+    print(f"\nPeak in flight: {stats['peak_in_flight']}, peak queued: {stats['peak_queued']}, "
+          f"max wait: {stats['max_wait_ms']} ms, timeouts: {stats['total_timeouts']}")
+
+
+if __name__ == "__main__":
+    main()
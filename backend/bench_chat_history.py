@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Load test for chat history reads on a large SQLite message store
+Fills a scratch database (10M messages by default), then reports p50/p95/p99
+latency for first-page and deep cursor-page history reads.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from chat_store import SQLiteChatStore
+
+SENDERS = ("user", "assistant")
+EMOTIONS = ("neutral", "joy", "sadness", "anxiety", "anger", "fear")
+
+
+def populate(store: SQLiteChatStore, messages: int, users: int, batch: int = 100000) -> None:
+    """Insert `messages` rows spread over `users`, in timestamp order per batch"""
+    connection = store._connection()
+    connection.execute("PRAGMA synchronous=OFF")
+    started = time.perf_counter()
+    now = time.time() - messages
+    for offset in range(0, messages, batch):
+        rows = [
+            (f"msg-{i}", f"user-{i % users}", SENDERS[i % 2], "Lorem ipsum chat message number %d" % i,
+             EMOTIONS[i % len(EMOTIONS)], now + i)
+            for i in range(offset, min(offset + batch, messages))
+        ]
+        with connection:
+            connection.executemany(
+                "INSERT INTO messages (id, user_id, sender, message, emotion_detected, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        done = min(offset + batch, messages)
+        print(f"\r  inserted {done:,}/{messages:,} ({done / (time.perf_counter() - started):,.0f} rows/s)",
+              end="", flush=True)
+    connection.execute("PRAGMA synchronous=NORMAL")
+    print()
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000
+    return pick(0.50), pick(0.95), pick(0.99), statistics.mean(samples) * 1000
+
+
+def run(store: SQLiteChatStore, path: str, args) -> None:
+    """Fill ``store`` up to --messages rows if needed, then time history reads"""
+    existing = store._connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    if existing < args.messages:
+        print(f"Populating {path} with {args.messages:,} messages over {args.users:,} users...")
+        populate(store, args.messages - existing, args.users)
+
+    first_page, deep_page = [], []
+    for _ in range(args.reads):
+        user_id = f"user-{random.randrange(args.users)}"
+
+        started = time.perf_counter()
+        messages, next_key = store.read_page(user_id, None, args.page_size)
+        first_page.append(time.perf_counter() - started)
+
+        # Follow the cursor a few pages back to show reads don't slow down with depth
+        for _ in range(3):
+            if next_key is None:
+                break
+            started = time.perf_counter()
+            messages, next_key = store.read_page(user_id, next_key, args.page_size)
+            deep_page.append(time.perf_counter() - started)
+
+    print(f"\n{'read':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for label, samples in (("first page", first_page), ("cursor page", deep_page)):
+        if samples:
+            p50, p95, p99, mean = percentiles(samples)
+            print(f"{label:<14} {p50:>8.3f} {p95:>8.3f} {p99:>8.3f} {mean:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--db", help="reuse an existing database instead of a scratch file")
+    args = parser.parse_args()
+
+    # A scratch database is removed afterwards; one given with --db is kept
+    scratch = None if args.db else tempfile.mkdtemp(prefix="chat-bench-")
+    path = args.db or os.path.join(scratch, "chat_history.db")
+    store = SQLiteChatStore(path)
+    try:
+        run(store, path, args)
+    finally:
+        store.close()
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the hashed n-gram intent/emotion classifier
+Scores a curated set of messages the keyword tables get wrong (negations,
+inflections, typos) and some they get right, printing the classifier's
+intent and emotion next to the keyword answers, then reports per-message
+latency for single predictions (both heads) and batched ones, and for the
+served paths (chat's detect_emotion, which only asks the classifier about
+texts the word scores can't read, and the endpoints' analyze_emotions).
+Exits 1 if a single prediction takes more than --budget-us or
+detect_emotion more than --chat-budget-us on average, or the classifier
+misses an expected label.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="classifier-bench-"), "chat.db"))
+os.environ["INTENT_CLASSIFIER_ENABLED"] = "true"
+
+import main as backend  # noqa: E402
+from bench_keyword_matcher import SAMPLE_MESSAGES  # noqa: E402
+
+# (message, expected intent, expected emotion)
+EVAL_CASES = [
+    ("I'm not happy", "sadness", "sadness"),
+    ("I'm not happy at all today", "sadness", "sadness"),
+    ("honestly I don't feel good", "sadness", "sadness"),
+    ("nothing makes me excited anymore", "sadness", "sadness"),
+    ("I'm not worried anymore, the results came back fine", "default", "neutral"),
+    ("I was so relieved, I'm not anxious now", "default", "neutral"),
+    ("I've been feeling lonely and empty", "sadness", "sadness"),
+    ("im so stresed about tomorow", "anxiety", "anxiety"),
+    ("I'm freaking out about my interview", "anxiety", "anxiety"),
+    ("my sister ruined my birthday and I'm livid", "anger", "anger"),
+    ("got the job!! best day ever", "positive", "joy"),
+    ("Hello! How are you today?", "greeting", "neutral"),
+    ("tell me a joke, I need to laugh", "joke", None),
+    ("I feel sad and down, I was crying all night", "sadness", "sadness"),
+    # Feeling words inside other words ("made", "thanks", "garage") are not feelings
+    ("this is made of wood", "default", "neutral"),
+    ("the shelf is made of pine", "default", "neutral"),
+    ("thanks", "default", "neutral"),
+    ("I'm fine, thanks", "default", "neutral"),
+    ("the garage door is stuck again", "default", "neutral"),
+]
+
+
+def keyword_labels(text):
+    return backend.fallback_engine.classify(backend.message_matcher.match(text)), backend.emotion_scorer.detect(text)
+
+
+def per_message_us(fn, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(texts)
+    return (time.perf_counter() - started) / repeat / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-us", type=float, default=100.0, help="max mean latency of one prediction")
+    parser.add_argument("--chat-budget-us", type=float, default=20.0,
+                        help="max mean cost of chat's detect_emotion (20 us = 50k messages/s)")
+    args = parser.parse_args()
+
+    classifier = backend.intent_classifier
+    if classifier is None:
+        sys.exit(f"No classifier model at {backend.settings.intent_model_path}; run train_classifier.py")
+    print(f"model {classifier.version}: {classifier.metadata.get('holdout_accuracy')}\n")
+
+    misses = 0
+    print(f"{'message':<44} {'keyword intent':>15} {'model intent':>13} {'keyword emotion':>16} {'model emotion':>14}")
+    for text, intent, emotion in EVAL_CASES:
+        predicted = classifier.predict_all(text)
+        (model_intent, _), (model_emotion, _) = predicted["intent"], predicted["emotion"]
+        keyword_intent, keyword_emotion = keyword_labels(text)
+        wrong = model_intent != intent or (emotion is not None and model_emotion != emotion)
+        misses += wrong
+        print(f"{text[:44]:<44} {keyword_intent:>15} {model_intent:>13} {keyword_emotion:>16} {model_emotion:>14}"
+              f"{'  MISS' if wrong else ''}")
+
+    texts = (SAMPLE_MESSAGES * (args.texts // len(SAMPLE_MESSAGES) + 1))[:args.texts]
+    single = per_message_us(lambda batch: [classifier.predict_all(t) for t in batch], texts, args.repeat)
+    batched = per_message_us(lambda batch: classifier.predict_batch(batch, "emotion"), texts, args.repeat)
+    keywords = per_message_us(lambda batch: [keyword_labels(t) for t in batch], texts, args.repeat)
+    print(f"\n{'keyword tables':<24} {keywords:>8.2f} us/msg")
+    print(f"{'classifier, single':<24} {single:>8.2f} us/msg")
+    print(f"{'classifier, batch':<24} {batched:>8.2f} us/msg")
+
+    # The served paths, on distinct texts so classify_text's cache doesn't help
+    # (its 1024 entries can't hold a pass, so repeats miss too): chat's
+    # detect_emotion and the emotion endpoints' analyze_emotions
+    distinct = [f"{text} {i}" for i, text in enumerate(texts)]
+    chat = per_message_us(lambda batch: [backend.detect_emotion(t) for t in batch], distinct, args.repeat)
+    endpoints = per_message_us(backend.analyze_emotions, distinct, args.repeat)
+    print(f"{'detect_emotion (chat)':<24} {chat:>8.2f} us/msg  ({1e6 / chat:,.0f}/s)")
+    print(f"{'analyze_emotions':<24} {endpoints:>8.2f} us/msg  ({1e6 / endpoints:,.0f}/s)")
+
+    failed = False
+    if misses:
+        print(f"FAIL: {misses} of {len(EVAL_CASES)} messages misclassified")
+        failed = True
+    if single > args.budget_us:
+        print(f"FAIL: single prediction over budget ({args.budget_us} us)")
+        failed = True
+    if chat > args.chat_budget_us:
+        print(f"FAIL: detect_emotion over budget ({args.chat_budget_us} us)")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
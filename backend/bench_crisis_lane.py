@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Crisis-lane benchmark: crisis replies while ordinary chat saturates the upstream
+Floods /api/v1/chat/send with --clients ordinary chats against a local fake
+OpenAI server (--latency-ms per completion, a pool of --max-concurrency
+slots, so most of them queue) and meanwhile sends a crisis message every
+--interval-ms. Prints p50/p99 latency of both kinds of reply, where the
+crisis replies came from (upstream priority lane or local) and the
+crisis_lane_duration_seconds histogram. Exits 1 if the crisis p99 is over
+--budget-ms or a crisis reply came back without resources.
+
+    python bench_crisis_lane.py
+    python bench_crisis_lane.py --priority-slots 0   # priority ordering only, no reserved slots
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+import fake_openai_server
+
+CRISIS_MESSAGES = [
+    "I don't want to live anymore",
+    "I keep thinking about ending it all",
+    "I've been hurting myself again",
+    "I can't go on like this",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] * 1000 if values else float("nan")
+
+
+async def run(app, args):
+    transport = httpx.ASGITransport(app=app)
+    ordinary, crisis, missing_resources = [], [], 0
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def chat(message):
+            started = time.perf_counter()
+            response = await client.post("/api/v1/chat/send", json={"message": message})
+            response.raise_for_status()
+            return time.perf_counter() - started, response.json()["data"]
+
+        async def flood(worker):
+            turn = 0
+            while not stop.is_set():
+                # Distinct messages, so the completion cache can't answer them
+                elapsed, _ = await chat(f"I had a long day at work, part {worker}-{turn}")
+                ordinary.append(elapsed)
+                turn += 1
+
+        async def crisis_sender():
+            nonlocal missing_resources
+            for i in range(args.crisis):
+                await asyncio.sleep(args.interval_ms / 1000)
+                elapsed, data = await chat(CRISIS_MESSAGES[i % len(CRISIS_MESSAGES)])
+                crisis.append(elapsed)
+                missing_resources += not (data.get("crisis") or {}).get("resources")
+            stop.set()
+
+        await asyncio.gather(crisis_sender(), *(flood(i) for i in range(args.clients)))
+    return ordinary, crisis, missing_resources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent ordinary chat clients")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="upstream pool size")
+    parser.add_argument("--priority-slots", type=int, default=2)
+    parser.add_argument("--crisis", type=int, default=20, help="crisis messages to send")
+    parser.add_argument("--interval-ms", type=float, default=200, help="gap between crisis messages")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="max p99 crisis reply latency")
+    args = parser.parse_args()
+
+    fake_openai_server.start_in_thread(args.port, args.latency_ms)
+
+    # main.py builds its OpenAI client at import time, so configure it first
+    os.environ["OPENAI_API_KEY"] = "sk-fake-benchmark-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ["OPENAI_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    os.environ["OPENAI_PRIORITY_SLOTS"] = str(args.priority_slots)
+    os.environ["OPENAI_MAX_QUEUE"] = str(args.clients * 2)
+    os.environ["OPENAI_TIMEOUT_SECONDS"] = "60"
+    os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="crisis-bench-"), "chat.db"))
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+    os.environ.setdefault("UPSTREAM_TOKEN_BUDGET", "1e12")
+    import main as backend
+
+    ordinary, crisis, missing_resources = asyncio.run(run(backend.app, args))
+
+    stats = backend.openai_client.stats()
+    print(f"Fake upstream latency: {args.latency_ms:.0f} ms, pool: {args.max_concurrency} slots "
+          f"+ {args.priority_slots} priority, {args.clients} ordinary clients")
+    print(f"peak queued: {stats['peak_queued']}, max wait: {stats['max_wait_ms']} ms, "
+          f"max priority wait: {stats['max_priority_wait_ms']} ms\n")
+    print(f"{'replies':<10} {'count':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for label, values in (("ordinary", ordinary), ("crisis", crisis)):
+        print(f"{label:<10} {len(values):>6} {percentile(values, 0.5):>9.1f} {percentile(values, 0.99):>9.1f}")
+
+    sources = {labels[0]: series[2] for labels, series in backend.crisis_lane_latency._series.items()}
+    print(f"\ncrisis replies by source: {sources}")
+
+    failed = False
+    if percentile(crisis, 0.99) > args.budget_ms:
+        print(f"FAIL: crisis p99 over budget ({args.budget_ms} ms)")
+        failed = True
+    if missing_resources:
+        print(f"FAIL: {missing_resources} crisis replies without resources")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the emotion scoring engine
+Reports texts/second for single-text and batched scoring (target: >50k/s on one
+core) and shows the substring false positives that whole-word scoring fixes.
+"""
+
+import argparse
+import time
+
+from bench_keyword_matcher import SAMPLE_MESSAGES, legacy_detect_emotion
+from emotion_engine import EMOTION_LEXICON, EmotionScorer
+
+TARGET_TEXTS_PER_SECOND = 50000
+
+# Substring matches the original detector got wrong
+WORD_BOUNDARY_CASES = [
+    "I made dinner for my family tonight",
+    "Heading downtown to see the band",
+    "I downloaded the new app",
+    "We had a great time at the cryptography talk",
+]
+
+
+def measure(label, fn, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(texts)
+    elapsed = time.perf_counter() - started
+    rate = len(texts) * repeat / elapsed
+    status = "ok" if rate >= TARGET_TEXTS_PER_SECOND else "BELOW TARGET"
+    print(f"{label:<24} {rate:>12,.0f} texts/s  {elapsed / repeat / len(texts) * 1e6:>7.2f} us/text  {status}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    scorer = EmotionScorer(EMOTION_LEXICON)
+    texts = (SAMPLE_MESSAGES * (args.texts // len(SAMPLE_MESSAGES) + 1))[:args.texts]
+
+    print(f"{'legacy vs engine':<44} {'legacy':>10} {'engine':>10}")
+    for text in WORD_BOUNDARY_CASES:
+        print(f"{text[:44]:<44} {legacy_detect_emotion(text):>10} {scorer.detect(text):>10}")
+    print()
+
+    measure("legacy detect_emotion", lambda batch: [legacy_detect_emotion(t) for t in batch], texts, args.repeat)
+    measure("engine detect", lambda batch: [scorer.detect(t) for t in batch], texts, args.repeat)
+    measure("engine distribution", lambda batch: [scorer.distribution(t) for t in batch], texts, args.repeat)
+    measure("engine batch", scorer.distribution_batch, texts, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
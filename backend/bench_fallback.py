@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Fallback reply engine benchmark
+Checks that replies don't repeat within a conversation until an intent's
+responses run out and that sequences are reproducible for a seed, then
+measures the per-reply cost (built-in catalog and a large synthetic one;
+engine picks are for already-classified messages, as in the chat path, while
+the original helper scans keywords itself) and /api/v1/chat/send throughput
+in-process with no upstream configured, i.e. every reply served locally as
+when the circuit breaker is open.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# No upstream: every chat reply comes from the fallback engine
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="fallback-bench-"), "chat.db"))
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+import httpx  # noqa: E402
+
+import main as backend  # noqa: E402
+from bench_keyword_matcher import SAMPLE_MESSAGES, legacy_generate_fallback_response  # noqa: E402
+from fallback_engine import FALLBACK_KEYWORDS, FALLBACK_RESPONSES, FallbackEngine, load_fallback_catalog  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+
+
+def synthetic_engine(intents: int, responses: int) -> FallbackEngine:
+    keywords = {f"intent{i}": [f"keyword{i}x", f"phrase {i}y"] for i in range(intents)}
+    replies = {intent: [f"{intent} reply {j}" for j in range(responses)] for intent in keywords}
+    replies["default"] = [f"default reply {j}" for j in range(responses)]
+    return FallbackEngine(keywords, replies)
+
+
+def check_no_repeats(engine: FallbackEngine, matcher: KeywordMatcher, conversations: int = 50):
+    """Each conversation cycles through all of an intent's replies before repeating"""
+    for intent, words in list(engine.keywords.items()) + [("default", [])]:
+        matches = matcher.match(words[0] if words else "")
+        size = len(engine.responses[intent])
+        for c in range(conversations):
+            picks = [engine.respond(matches, f"check-{c}") for _ in range(size)]
+            assert len(set(picks)) == size, f"{intent}: repeated reply within {size} picks"
+    replay = FallbackEngine(engine.keywords, engine.responses, seed=engine.seed)
+    matches = matcher.match("hello")
+    first = [engine.respond(matches, "replay") for _ in range(5)]
+    assert first == [replay.respond(matches, "replay") for _ in range(5)], "sequence not reproducible"
+
+
+def legacy_us(iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        legacy_generate_fallback_response(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def per_reply_us(engine: FallbackEngine, matches_list, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        engine.respond(matches_list[i % len(matches_list)], f"user-{i & 4095}")
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def chat_throughput(concurrency: int, duration: float) -> float:
+    await backend.chat_history.start()
+    await backend.stats_engine.start()
+    transport = httpx.ASGITransport(app=backend.app)
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client, n):
+        nonlocal completed
+        guest = (await client.post("/api/v1/auth/guest")).raise_for_status().json()["data"]
+        headers = {"Authorization": f"Bearer {guest['access_token']}"}
+        i = 0
+        while time.perf_counter() < deadline:
+            message = SAMPLE_MESSAGES[(n + i) % len(SAMPLE_MESSAGES)]
+            response = await client.post("/api/v1/chat/send", json={"message": message}, headers=headers)
+            response.raise_for_status()
+            completed += 1
+            i += 1
+
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(client, n) for n in range(concurrency)))
+            return completed / (time.perf_counter() - started)
+    finally:
+        await backend.chat_history.close()
+        await backend.stats_engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--catalog", help="JSON catalog to benchmark instead of a synthetic one")
+    parser.add_argument("--intents", type=int, default=50, help="synthetic catalog intents")
+    parser.add_argument("--responses", type=int, default=1000, help="synthetic catalog responses per intent")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    builtin = FallbackEngine(FALLBACK_KEYWORDS, FALLBACK_RESPONSES)
+    large = load_fallback_catalog(args.catalog) if args.catalog else synthetic_engine(args.intents, args.responses)
+    check_no_repeats(builtin, KeywordMatcher({"fallback": builtin.keywords}))
+    print("No-repeat and reproducibility checks passed")
+
+    builtin_matcher = KeywordMatcher({"fallback": builtin.keywords})
+    large_matcher = KeywordMatcher({"fallback": large.keywords})
+    builtin_matches = [builtin_matcher.match(m) for m in SAMPLE_MESSAGES]
+    large_matches = [large_matcher.match(" ".join(words)) for words in large.keywords.values()]
+
+    print(f"\n{'variant':<44} {'us/reply':>9}")
+    print(f"{'original (keyword scans + random.choice)':<44} {legacy_us(args.iterations):>9.2f}")
+    label = f"engine pick, built-in ({builtin.stats()['responses']} replies)"
+    print(f"{label:<44} {per_reply_us(builtin, builtin_matches, args.iterations):>9.2f}")
+    label = f"engine pick, large ({large.stats()['responses']} replies)"
+    print(f"{label:<44} {per_reply_us(large, large_matches, args.iterations):>9.2f}")
+
+    rps = asyncio.run(chat_throughput(args.concurrency, args.duration))
+    print(f"\n/api/v1/chat/send, fallback only, {args.concurrency} clients: {rps:.0f} req/s (one process)")
+
+
+if __name__ == "__main__":
+    main()
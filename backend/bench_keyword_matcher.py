@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: compiled single-pass keyword matcher vs the original per-keyword scans
+Also checks that the media helper detects the same category, type and reply
+text as the original (it now also ranks catalog items, see bench_media.py)
+and the fallback helper answers from the same intent, or from the n-gram
+classifier's when it is confident (detect_emotion now scores whole words,
+see bench_emotion_engine.py; fallback replies are picked per conversation,
+see bench_fallback.py). The app runs in its default configuration, with
+the classifier on; the sample messages repeat, so its answers come from
+classify_text's cache and its own cost is measured by bench_classifier.py.
+
+The compiled pipeline now does more than the original: emotions are scored
+on whole words with confidences (instead of substring checks) and media
+replies rank catalog items. Exits 1 if the full pipeline's speedup over the
+original falls below --min-speedup, so a change that makes the per-message
+path slower fails here.
+"""
+
+import argparse
+import sys
+import timeit
+
+from fallback_engine import FALLBACK_RESPONSES
+from main import (check_media_request, classifier_label, detect_emotion, generate_fallback_response,
+                  message_matcher)
+
+SAMPLE_MESSAGES = [
+    "hi",
+    "Hello! How are you today?",
+    "I'm feeling really happy and excited today!",
+    "I've been so anxious about my exams, I can't sleep",
+    "Can you play some relaxing music for me?",
+    "show me a nature video with rain sounds",
+    "I'm so mad at my brother, he made me furious",
+    "tell me a joke, I need to laugh",
+    "I feel sad and down, I was crying all night",
+    "I had a long day at work today and I keep thinking about it",
+    "Honestly I don't know what to say. Things have been weird lately and I'm not sure how I feel about any of it.",
+    "I'm scared of what the doctor will say tomorrow",
+]
+
+
+# Original implementations, kept verbatim as the reference for equivalence and timing
+def legacy_check_media_request(message: str) -> str:
+    """Check if user is requesting media content and return appropriate response with media suggestion"""
+    message_lower = message.lower()
+    
+    # Media keywords for detection
+    media_keywords = {
+        'relaxation': ['relax', 'relaxing', 'calm', 'peaceful', 'stress relief', 'unwind'],
+        'meditation': ['meditate', 'meditation', 'mindfulness', 'breathing', 'center'],
+        'nature': ['nature', 'forest', 'ocean', 'rain', 'birds', 'water', 'natural'],
+        'music': ['music', 'song', 'play music', 'melody', 'tune'],
+        'video': ['video', 'watch', 'show me', 'play video'],
+        'audio': ['audio', 'sound', 'listen', 'hear'],
+        'therapy': ['anxiety', 'depression', 'sleep', 'insomnia', 'therapy', 'therapeutic']
+    }
+    
+    # Check for media request verbs
+    media_verbs = ['play', 'show', 'listen', 'watch', 'start']
+    has_media_verb = any(verb in message_lower for verb in media_verbs)
+    
+    # Detect category
+    detected_category = None
+    for category, keywords in media_keywords.items():
+        if category in ['video', 'audio']:  # Skip type keywords for category detection
+            continue
+        if any(keyword in message_lower for keyword in keywords):
+            detected_category = category
+            break
+    
+    # Detect type preference
+    wants_video = any(keyword in message_lower for keyword in media_keywords['video'])
+    wants_audio = any(keyword in message_lower for keyword in (media_keywords['audio'] + media_keywords['music']))
+    
+    # If it's a clear media request
+    if has_media_verb or detected_category or wants_video or wants_audio:
+        # Return a response with media suggestion signal
+        media_type = 'video' if wants_video else ('audio' if wants_audio else 'any')
+        
+        responses = {
+            'relaxation': f"Of course! I have some wonderful relaxing content that might help you unwind. Let me suggest something perfect for you! 🎵",
+            'meditation': f"That's a great idea! Meditation can be so helpful. I have some guided meditation content that you might enjoy. Let me share something calming with you! 🧘‍♀️",
+            'nature': f"Nature sounds are so soothing! I have some beautiful nature content that can help you feel more connected and peaceful. Let me play something for you! 🌿",
+            'music': f"Music is such a wonderful way to lift your spirits! I have some lovely, calming music that might be just what you need. Let me play something for you! 🎶",
+            'therapy': f"I understand you're looking for something therapeutic. I have some specially selected content designed to help with relaxation and wellness. Let me suggest something that might help! 💙",
+        }
+        
+        if detected_category and detected_category in responses:
+            base_response = responses[detected_category]
+        else:
+            base_response = "I'd love to help you with some wellness content! Let me suggest something that might be perfect for how you're feeling right now! ✨"
+        
+        # Add media suggestion signal for frontend
+        return f"MEDIA_SUGGESTION:{detected_category or 'relaxation'}:{media_type}:{base_response}"
+    
+    return None  # No media request detected
+
+def legacy_generate_fallback_response(message: str) -> str:
+    """Fallback response generator with natural, human-like personality"""
+    text = message.lower()
+    
+    # Greetings
+    if any(k in text for k in ["hi", "hello", "hey", "good morning", "good afternoon"]):
+        greetings = [
+            "Hey there! Good to see you. How's your day treating you so far?",
+            "Hi! I'm glad you're here. What's on your mind today?",
+            "Hello! Nice to see you again. How are things going?"
+        ]
+        import random
+        return random.choice(greetings)
+    
+    # Joke requests
+    if any(k in text for k in ["joke", "funny", "laugh", "humor", "something funny"]):
+        jokes = [
+            "Oh, I love this! Here's one for you: Why don't scientists trust atoms? Because they make up everything! 😄 What kind of jokes do you usually like?",
+            "Alright, here's a good one: I told my wife she was drawing her eyebrows too high. She looked surprised! 😂 Want another one?",
+            "Here's something that always makes me chuckle: Why did the scarecrow win an award? He was outstanding in his field! 🌾 Do you like puns or prefer other kinds of humor?"
+        ]
+        import random
+        return random.choice(jokes)
+    
+    # Anxiety/stress
+    if any(k in text for k in ["anxious", "anxiety", "worried", "panic", "stressed", "overwhelming"]):
+        responses = [
+            "That sounds really tough right now. I'm here with you. Want to try some slow breathing together, or would you rather talk about what's weighing on you?",
+            "I can hear that you're going through something difficult. Sometimes when I feel overwhelmed, taking things one small step at a time helps. What feels most urgent right now?",
+            "That sounds like a lot to carry. You know what? Just taking a moment to reach out shows real strength. What's been the hardest part of today?"
+        ]
+        import random
+        return random.choice(responses)
+    
+    # Sadness
+    if any(k in text for k in ["sad", "down", "depressed", "heartbroken", "upset", "crying"]):
+        responses = [
+            "I'm really sorry you're hurting right now. That sounds genuinely hard. Do you want to tell me what's been going on?",
+            "That sounds painful, and I'm glad you felt comfortable sharing that with me. Sometimes it helps just to have someone listen. What's been the toughest part?",
+            "I hear you, and what you're feeling makes complete sense. You don't have to go through this alone. Want to talk about what happened?"
+        ]
+        import random
+        return random.choice(responses)
+    
+    # Anger/frustration
+    if any(k in text for k in ["angry", "mad", "furious", "frustrated", "annoyed"]):
+        responses = [
+            "That sounds incredibly frustrating. I can understand why you'd feel that way. Want to tell me what happened?",
+            "Wow, that would upset me too. It sounds like something really got to you today. What's been going on?",
+            "I hear the frustration in what you're saying, and honestly, it sounds justified. Do you want to vent about it?"
+        ]
+        import random
+        return random.choice(responses)
+    
+    # Happy/positive
+    if any(k in text for k in ["happy", "excited", "good news", "great", "amazing", "wonderful"]):
+        responses = [
+            "That's fantastic! I love hearing good news. What's got you feeling so positive today?",
+            "Oh wow, that sounds wonderful! I'm genuinely happy for you. Tell me more about what's going well!",
+            "That's so great to hear! Your excitement is contagious. What made this such a good moment for you?"
+        ]
+        import random
+        return random.choice(responses)
+    
+    # Default responses
+    defaults = [
+        "I'm here and really listening. What's going on with you today?",
+        "You know, I'm genuinely curious about what's on your mind. Want to share what you're thinking about?",
+        "I'm glad you're here. Tell me what's happening in your world right now.",
+        "Hey, I'm here for whatever you want to talk about. What's been on your mind lately?"
+    ]
+    import random
+    return random.choice(defaults)
+
+
+def legacy_detect_emotion(text: str) -> str:
+    """Simple emotion detection based on keywords"""
+    text_lower = text.lower()
+    
+    if any(word in text_lower for word in ['sad', 'depressed', 'down', 'upset', 'cry']):
+        return 'sadness'
+    elif any(word in text_lower for word in ['anxious', 'anxiety', 'worried', 'stress', 'nervous']):
+        return 'anxiety'
+    elif any(word in text_lower for word in ['angry', 'mad', 'furious', 'irritated']):
+        return 'anger'
+    elif any(word in text_lower for word in ['happy', 'joy', 'excited', 'great', 'wonderful']):
+        return 'joy'
+    elif any(word in text_lower for word in ['scared', 'afraid', 'fear', 'terrified']):
+        return 'fear'
+    else:
+        return 'neutral'
+
+
+def check_equivalence(messages):
+    """Assert the compiled helpers match the original implementations"""
+    for message in messages:
+        reply = check_media_request(message)
+        if reply:
+            reply = "MEDIA_SUGGESTION:{category}:{type}:".format(**reply["media"]) + reply["message"]
+        assert reply == legacy_check_media_request(message), message
+        reply = generate_fallback_response(message)
+        intent = classifier_label(message, "intent")
+        if intent in FALLBACK_RESPONSES:
+            assert reply in FALLBACK_RESPONSES[intent], message
+            continue
+        expected = legacy_generate_fallback_response(message)
+        assert any(expected in replies and reply in replies for replies in FALLBACK_RESPONSES.values()), message
+
+
+def legacy_pipeline(message):
+    # Original send_message path: media check, fallback, then emotion detection
+    legacy_check_media_request(message) or legacy_generate_fallback_response(message)
+    legacy_detect_emotion(message)
+
+
+def compiled_pipeline(message):
+    matches = message_matcher.match(message)
+    check_media_request(message, matches) or generate_fallback_response(message, matches)
+    detect_emotion(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--min-speedup", type=float, default=1.0,
+                        help="minimum full-pipeline speedup over the original helpers")
+    args = parser.parse_args()
+
+    check_equivalence(SAMPLE_MESSAGES)
+    print(f"Equivalence check passed on {len(SAMPLE_MESSAGES)} messages\n")
+
+    cases = [
+        ("detect_emotion", legacy_detect_emotion, detect_emotion),
+        ("check_media_request", legacy_check_media_request, check_media_request),
+        ("generate_fallback_response", legacy_generate_fallback_response, generate_fallback_response),
+        ("full chat pipeline", legacy_pipeline, compiled_pipeline),
+    ]
+    print(f"{'function':<28} {'legacy us/msg':>14} {'compiled us/msg':>16} {'speedup':>8}")
+    for name, legacy, compiled in cases:
+        runs = args.number * len(SAMPLE_MESSAGES)
+        legacy_time = timeit.timeit(lambda: [legacy(m) for m in SAMPLE_MESSAGES], number=args.number)
+        compiled_time = timeit.timeit(lambda: [compiled(m) for m in SAMPLE_MESSAGES], number=args.number)
+        speedup = legacy_time / compiled_time
+        print(f"{name:<28} {legacy_time / runs * 1e6:>14.2f} {compiled_time / runs * 1e6:>16.2f} "
+              f"{speedup:>7.2f}x")
+
+    if speedup < args.min_speedup:
+        print(f"FAIL: full pipeline speedup {speedup:.2f}x is below {args.min_speedup}x")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Mixed-workload load test for the API
+Runs the app in-process (against the local fake OpenAI server) or targets a
+running server with --url, drives a weighted mix of chat, emotion, profile
+and history requests from concurrent async clients once the app reports
+ready, and reports requests/s, p50/p95/p99 latency per operation and
+event-loop lag after the warm-up period. Results can be saved
+as a JSON baseline and compared against a previous run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+import fake_openai_server
+
+CHAT_MESSAGES = [
+    "I had a long day at work today and I keep thinking about it",
+    "hi",
+    "I've been feeling really anxious about my exams",
+    "Can you tell me a joke?",
+    "Play some relaxing music please",
+    "I'm so happy, I got the job!",
+]
+EMOTION_TEXTS = [
+    "I feel sad and lonely tonight",
+    "I'm nervous about tomorrow",
+    "This is frustrating and makes me angry",
+    "What a wonderful, amazing day",
+]
+
+DEFAULT_MIX = "chat=4,stream=1,emotion=3,profile=2,stats=1,history=2"
+
+
+# Each simulated user is a guest: {"id": guest id, "headers": its bearer token}
+
+def chat(client, user):
+    return client.post("/api/v1/chat/send", json={"message": random.choice(CHAT_MESSAGES)}, headers=user["headers"])
+
+
+async def stream(client, user):
+    async with client.stream("POST", "/api/v1/chat/stream", json={"message": random.choice(CHAT_MESSAGES)},
+                             headers=user["headers"]) as response:
+        async for _ in response.aiter_raw():
+            pass
+    return response
+
+
+def emotion(client, user):
+    return client.post("/api/v1/emotions/analyze", json={"text": random.choice(EMOTION_TEXTS)})
+
+
+def profile(client, user):
+    return client.get(f"/api/v1/profile/{user['id']}", headers=user["headers"])
+
+
+def stats(client, user):
+    return client.get(f"/api/v1/profile/{user['id']}/stats", headers=user["headers"])
+
+
+def history(client, user):
+    return client.get("/api/v1/chat/history", params={"limit": 20}, headers=user["headers"])
+
+
+OPERATIONS = {"chat": chat, "stream": stream, "emotion": emotion, "profile": profile,
+              "stats": stats, "history": history}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def summarize(samples: list, seconds: float) -> dict:
+    """Count, rate and latency percentiles (ms) for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0, "rps": 0.0}
+    ordered = sorted(samples)
+    pick = lambda p: round(ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000, 3)
+    return {
+        "count": len(samples),
+        "rps": round(len(samples) / seconds, 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+    }
+
+
+async def measure_loop_lag(samples: list, interval: float = 0.01) -> None:
+    """Record how late the event loop wakes a task that sleeps for ``interval``"""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(time.perf_counter() - expected, 0.0))
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    """Wait for /ready to return 200, as a load balancer does before sending a worker traffic"""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.perf_counter() > deadline:
+            raise SystemExit(f"Server not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.05)
+
+
+async def start_users(client: httpx.AsyncClient, users: int, concurrency: int, save_profiles: bool) -> list:
+    """A guest session per simulated user, with a saved profile if the mix reads them
+    (reading an id with none saved is a 404)"""
+    pending = iter(range(users))
+    sessions = []
+
+    async def worker():
+        for i in pending:
+            response = await client.post("/api/v1/auth/guest")
+            response.raise_for_status()
+            session = response.json()["data"]
+            user = {"id": session["user"]["id"], "headers": {"Authorization": f"Bearer {session['access_token']}"}}
+            if save_profiles:
+                response = await client.patch(f"/api/v1/profile/{user['id']}", json={"name": f"Load User {i}"},
+                                              headers=user["headers"])
+                response.raise_for_status()
+            sessions.append(user)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, users))))
+    return sessions
+
+
+async def run_load(client: httpx.AsyncClient, weights: dict, concurrency: int, duration: float,
+                   users: int, warmup: float) -> dict:
+    sessions = await start_users(client, users, concurrency, "profile" in weights)
+    names = list(weights)
+    odds = list(weights.values())
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lag = []
+
+    async def worker():
+        deadline = time.perf_counter() + warmup + duration
+        measure_from = time.perf_counter() + warmup
+        while time.perf_counter() < deadline:
+            name = random.choices(names, odds)[0]
+            user = random.choice(sessions)
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, user)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if started < measure_from:
+                continue
+            if ok:
+                latencies[name].append(time.perf_counter() - started)
+            else:
+                errors[name] += 1
+
+    async def measure_lag_after_warmup():
+        await asyncio.sleep(warmup)
+        await measure_loop_lag(lag)
+
+    lag_task = asyncio.create_task(measure_lag_after_warmup())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started - warmup
+    lag_task.cancel()
+
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "overall": {**summarize(everything, elapsed), "errors": sum(errors.values())},
+        "operations": {name: {**summarize(latencies[name], elapsed), "errors": errors[name]} for name in names},
+        "loop_lag_ms": {
+            "p50": round(statistics.median(lag) * 1000, 3) if lag else 0.0,
+            "p99": round(sorted(lag)[int(len(lag) * 0.99)] * 1000, 3) if lag else 0.0,
+            "max": round(max(lag) * 1000, 3) if lag else 0.0,
+        },
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'operation':<10} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    rows = list(result["operations"].items()) + [("overall", result["overall"])]
+    for name, row in rows:
+        if not row["count"]:
+            print(f"{name:<10} {0:>7} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {row['errors']:>7}")
+            continue
+        print(f"{name:<10} {row['count']:>7} {row['rps']:>8.1f} {row['p50_ms']:>8.2f} "
+              f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['errors']:>7}")
+    lag = result["loop_lag_ms"]
+    print(f"\nevent-loop lag: p50 {lag['p50']:.2f} ms, p99 {lag['p99']:.2f} ms, max {lag['max']:.2f} ms")
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """Print per-operation changes against a baseline and return the regressions"""
+    regressions = []
+    print(f"\n{'vs baseline':<10} {'req/s':>9} {'p95':>9} {'p99':>9}")
+    rows = [("overall", result["overall"], baseline.get("overall", {}))]
+    rows += [(name, row, baseline.get("operations", {}).get(name, {})) for name, row in result["operations"].items()]
+    for name, row, base in rows:
+        if not row.get("count") or not base.get("count"):
+            continue
+        changes = []
+        for key, higher_is_better in (("rps", True), ("p95_ms", False), ("p99_ms", False)):
+            change = (row[key] - base[key]) / base[key] if base[key] else 0.0
+            changes.append(f"{change:>+8.1%}")
+            # Sub-millisecond jitter on fast endpoints isn't a regression
+            noise = not higher_is_better and abs(row[key] - base[key]) < min_delta_ms
+            if (-change if higher_is_better else change) > tolerance and not noise:
+                regressions.append(f"{name} {key}: {base[key]} -> {row[key]}")
+        print(f"{name:<10} {' '.join(changes)}")
+    return regressions
+
+
+async def run(args, weights: dict) -> dict:
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60,
+                                     limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            await wait_until_ready(client)
+            return await run_load(client, weights, args.concurrency, args.duration, args.users, args.warmup)
+
+    import main
+    # ASGITransport doesn't send lifespan events, so run startup (and its
+    # background warm-up) and shutdown here as a server would
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await wait_until_ready(client)
+            return await run_load(client, weights, args.concurrency, args.duration, args.users, args.warmup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted operations (default {DEFAULT_MIX})")
+    parser.add_argument("--port", type=int, default=8011, help="fake OpenAI server port (in-process mode)")
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake OpenAI latency (in-process mode)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previously saved JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative change counted as a regression (default 0.15)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore latency changes smaller than this (default 1 ms)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    weights = parse_mix(args.mix)
+
+    if not args.url:
+        fake_openai_server.start_in_thread(args.port, args.latency_ms)
+        # main.py reads its configuration at import time, so set it up first
+        os.environ["OPENAI_API_KEY"] = "sk-fake-benchmark-key"
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+        os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="load-bench-"), "chat.db"))
+        # Every simulated client shares one address; don't measure the rate limiter's 429s
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+    target = args.url or f"in-process app, fake upstream {args.latency_ms:.0f} ms"
+    print(f"Load test: {target}, {args.concurrency} clients, {args.duration:.0f}s, mix {args.mix}")
+    result = asyncio.run(run(args, weights))
+    result["meta"] = {
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "mix": weights,
+        "users": args.users,
+        "fake_latency_ms": None if args.url else args.latency_ms,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+    }
+    print_report(result)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
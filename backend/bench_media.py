@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Media catalog search benchmark
+Builds a synthetic catalog (--items, 100k by default), checks indexed search
+against a brute-force ranking over every item on random queries, then
+reports per-query latency for a linear scan, the inverted index (uncached and
+LRU-cached) and GET /api/v1/media/search in-process. Exits 1 if an uncached
+indexed query averages more than --budget-us.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="media-bench-"), "chat.db"))
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+import httpx  # noqa: E402
+
+from media_catalog import MEDIA_TYPES, MediaCatalog, terms  # noqa: E402
+
+CATEGORIES = ["relaxation", "meditation", "nature", "music", "therapy"]
+
+
+def synthetic_items(count: int, vocabulary: int, seed: int = 3):
+    rng = random.Random(seed)
+    words = [f"tag{i}" for i in range(vocabulary)]
+    return [
+        {
+            "id": f"item-{i}",
+            "title": " ".join(rng.sample(words, 2)),
+            "type": rng.choice(MEDIA_TYPES),
+            "category": rng.choice(CATEGORIES),
+            "url": f"https://media.example/{i}",
+            "duration": rng.randint(60, 3600),
+            "tags": rng.sample(words, 4),
+        }
+        for i in range(count)
+    ]
+
+
+def brute_force(items, query, category, media_type, limit):
+    """Reference ranking: most shared terms first, then catalog order"""
+    wanted = set(terms(query))
+    scored = []
+    for position, item in enumerate(items):
+        if category and item["category"] != category or media_type and item["type"] != media_type:
+            continue
+        text = " ".join([item["title"], item["category"], item["type"], *item["tags"]])
+        score = len(wanted & set(terms(text)))
+        if score or not wanted:
+            scored.append((-score, position))
+    scored.sort()
+    return tuple(position for _, position in scored[:limit]), len(scored)
+
+
+def random_queries(count: int, vocabulary: int, seed: int = 5):
+    rng = random.Random(seed)
+    return [
+        (" ".join(f"tag{rng.randrange(vocabulary)}" for _ in range(rng.randint(0, 3))),
+         rng.choice([None, *CATEGORIES]), rng.choice([None, *MEDIA_TYPES]), 10)
+        for _ in range(count)
+    ]
+
+
+def per_query_us(catalog, queries, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            catalog.search(*query)
+    return (time.perf_counter() - started) / (len(queries) * repeat) * 1e6
+
+
+def linear_scan_us(items, queries):
+    """Substring filter over every item, as the frontend's searchMedia does"""
+    started = time.perf_counter()
+    for query, category, media_type, limit in queries:
+        words = query.split()
+        [item for item in items
+         if (not category or item["category"] == category) and (not media_type or item["type"] == media_type)
+         and any(word in item["title"] or word in item["tags"] for word in words)][:limit]
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+async def endpoint_us(catalog, queries):
+    import main as backend
+    backend.media_catalog = catalog
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for query, category, media_type, limit in queries:
+            params = {"q": query, "limit": limit}
+            if category:
+                params["category"] = category
+            if media_type:
+                params["type"] = media_type
+            response = await client.get("/api/v1/media/search", params=params)
+            response.raise_for_status()
+        return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=2000, help="distinct synthetic tags")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--budget-us", type=float, default=100.0, help="max mean uncached query time")
+    args = parser.parse_args()
+
+    items = synthetic_items(args.items, args.vocabulary)
+    started = time.perf_counter()
+    catalog = MediaCatalog(items)
+    print(f"Indexed {args.items} items in {time.perf_counter() - started:.2f}s "
+          f"({catalog.stats()['terms']} terms)")
+
+    queries = random_queries(args.queries, args.vocabulary)
+    for query in queries[:100]:
+        assert catalog.search(*query) == brute_force(items, *query), query
+    print("Indexed search matches brute-force ranking on 100 queries")
+
+    uncached = MediaCatalog(items, cache_size=0)
+    results = {
+        "linear scan": linear_scan_us(items, queries[:100]),
+        "inverted index": per_query_us(uncached, queries),
+        "inverted index (cached)": per_query_us(catalog, queries, repeat=5),
+        "GET /api/v1/media/search": asyncio.run(endpoint_us(catalog, queries[:500])),
+    }
+    print(f"\n{'search':<28} {'us/query':>10}")
+    for label, cost in results.items():
+        print(f"{label:<28} {cost:>10.1f}")
+
+    if results["inverted index"] > args.budget_us:
+        print(f"FAIL: uncached search over budget ({args.budget_us} us)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Profile store benchmark: cached reads, store reads and partial updates
+Fills a temporary profile store with --users profiles, then times profile
+reads served from the cache, reads that miss it (row load plus
+serialization, in the thread pool) and PATCH-style updates: one changed
+field, a nested preference, and an update that changes nothing (no write).
+Also checks that a read right after an update sees it, that an update
+from a stale version is refused and that the public view has no email.
+Exits 1 if a cached read takes more than --budget-us on average or a check
+fails.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from profile_store import ProfileService, SQLiteProfileStore, VersionConflictError, default_profile
+
+
+async def per_call_us(fn, users, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for user_id in users:
+            await fn(user_id)
+    return (time.perf_counter() - started) / repeat / len(users) * 1e6
+
+
+async def run(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="profile-bench-"), "profiles.db")
+    service = ProfileService(SQLiteProfileStore(path), cache_ttl=3600, cache_size=args.users)
+    users = [f"user-{i}" for i in range(args.users)]
+    for user_id in users:
+        await service.update(user_id, {"name": f"User {user_id}", "bio": "Mental wellness enthusiast"})
+
+    results = {}
+    service._cache.clear()
+    results["read, cache miss"] = await per_call_us(service.get, users)
+    results["read, cached"] = await per_call_us(service.get, users, args.repeat)
+
+    async def load(user_id):
+        # The miss path without the thread-pool hop
+        service._load(user_id)
+    results["load row + serialize"] = await per_call_us(load, users)
+
+    turn = iter(range(10 ** 9))
+    results["update one field"] = await per_call_us(
+        lambda user_id: service.update(user_id, {"location": f"City {next(turn)}"}), users)
+    results["update nested preference"] = await per_call_us(
+        lambda user_id: service.update(user_id, {"preferences": {"timezone": f"Etc/GMT+{next(turn) % 12}"}}), users)
+    results["update, nothing changed"] = await per_call_us(
+        lambda user_id: service.update(user_id, {"bio": "Mental wellness enthusiast"}), users)
+
+    failures = []
+    profile = (await service.get(users[0])).profile
+    updated = await service.update(users[0], {"bio": "Edited"}, profile["version"])
+    if (await service.get(users[0])).profile != updated.profile or updated.profile["version"] != profile["version"] + 1:
+        failures.append("read after update didn't see the update")
+    try:
+        await service.update(users[0], {"bio": "Edited from a stale copy"}, profile["version"])
+        failures.append("update from a stale version was applied")
+    except VersionConflictError:
+        pass
+    if b'"email"' in (await service.get(users[0])).public_body:
+        failures.append("public profile includes the email")
+    notifications = (await service.get(users[0])).profile["preferences"]["notifications"]
+    if notifications != default_profile(users[0])["preferences"]["notifications"]:
+        failures.append("nested update replaced untouched preferences")
+
+    service.close()
+    return results, service.stats(), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the cached reads")
+    parser.add_argument("--budget-us", type=float, default=20.0, help="max mean cost of a cached read")
+    args = parser.parse_args()
+
+    results, stats, failures = asyncio.run(run(args))
+    print(f"{args.users} profiles\n")
+    print(f"{'operation':<28} {'us/call':>9}")
+    for label, cost in results.items():
+        print(f"{label:<28} {cost:>9.2f}")
+    print(f"\n{stats}")
+
+    if results["read, cached"] > args.budget_us:
+        failures.append(f"cached read over budget ({args.budget_us} us)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
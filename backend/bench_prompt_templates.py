@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Prompt token report and render benchmark for the chat prompt templates
+Prints the estimated token breakdown of each prompt variant for the sample
+messages and compares render time against rebuilding the system prompt
+f-string on every request.
+"""
+
+import argparse
+import time
+
+from bench_keyword_matcher import SAMPLE_MESSAGES
+from prompt_templates import ALEX_PERSONA, PROMPT_TEMPLATES, PromptStats
+
+
+def legacy_build_chat_messages(message):
+    """Old layout: persona rebuilt per call with the message embedded in the system prompt"""
+    system_prompt = f"""
+{ALEX_PERSONA}
+
+Current conversation context: The user just asked: "{message}"
+"""
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": message}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'version':<14} {'fingerprint':<13} {'system':>7} {'avg msg':>8} {'avg total':>10} {'max total':>10}")
+    for version, template in PROMPT_TEMPLATES.items():
+        stats = PromptStats()
+        for message in SAMPLE_MESSAGES:
+            stats.record(template, template.render(message))
+        summary = stats.stats()
+        print(f"{version:<14} {template.fingerprint:<13} {template.system_tokens:>7} "
+              f"{summary['avg_message_tokens']:>8} {summary['avg_total_tokens']:>10} {summary['max_total_tokens']:>10}")
+
+    # Distinct system prefixes sent across the sample: 1 means the prefix is cacheable
+    legacy_prefixes = {legacy_build_chat_messages(m)[0]["content"] for m in SAMPLE_MESSAGES}
+    template = next(iter(PROMPT_TEMPLATES.values()))
+    template_prefixes = {template.render(m)[0]["content"] for m in SAMPLE_MESSAGES}
+    print(f"\ndistinct system prefixes over {len(SAMPLE_MESSAGES)} messages: "
+          f"legacy {len(legacy_prefixes)}, template {len(template_prefixes)}")
+
+    print(f"\n{'render':<10} {'ns/call':>10}")
+    for label, build in (("legacy", legacy_build_chat_messages), ("template", template.render)):
+        started = time.perf_counter()
+        for i in range(args.iterations):
+            build(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)])
+        print(f"{label:<10} {(time.perf_counter() - started) / args.iterations * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
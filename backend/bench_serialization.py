@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Serialization microbenchmark for the profile and stats endpoints
+Compares the per-request cost of the original handlers (nested dict built on
+every call, then FastAPI's jsonable_encoder + JSONResponse), the same dicts
+through ORJSONResponse, the payloads now served (profile from the profile
+cache, already serialized; stats computed per user, so timed as orjson bytes plus an ETag digest, without
+the aggregate read) and the 304 path taken when the client's ETag still
+matches.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+os.environ.setdefault("CHAT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="serialization-bench-"), "chat.db"))
+
+import main as backend  # noqa: E402
+
+
+def legacy_profile(user_id):
+    return {
+        "success": True,
+        "data": {
+            "user": {
+                "id": user_id,
+                "username": "demo",
+                "email": "demo@mindchat.com",
+                "name": "Demo User",
+                "bio": "Mental wellness enthusiast",
+                "avatar": "https://api.dicebear.com/7.x/avataaars/svg?seed=" + user_id,
+                "location": "San Francisco, CA",
+                "birthday": "1990-01-01",
+                "occupation": "Software Developer",
+                "phone": "+1 (555) 123-4567",
+                "preferences": {
+                    "theme": "dark",
+                    "language": "en",
+                    "timezone": "America/Los_Angeles",
+                    "notifications": {
+                        "email": True,
+                        "push": True,
+                        "sms": False,
+                        "weekly_summary": True
+                    }
+                },
+                "privacy": {
+                    "profile_visibility": "public",
+                    "show_online_status": True,
+                    "allow_messages": True
+                },
+                "created_at": "2024-01-01T00:00:00Z",
+                "last_login": "2024-09-17T10:00:00Z"
+            }
+        }
+    }
+
+
+def legacy_stats(user_id):
+    return {
+        "success": True,
+        "data": {
+            "stats": {
+                "total_sessions": 45,
+                "streak_days": 7,
+                "total_minutes": 1250,
+                "mood_average": 7.2,
+                "favorite_activity": "Breathing Exercises",
+                "achievements": [
+                    "First Session Complete",
+                    "7-Day Streak",
+                    "Meditation Master",
+                    "Mood Tracker Pro"
+                ],
+                "recent_moods": [
+                    {"date": "2024-09-17", "mood": 8, "notes": "Feeling great!"},
+                    {"date": "2024-09-16", "mood": 7, "notes": "Good day overall"},
+                    {"date": "2024-09-15", "mood": 6, "notes": "Average day"}
+                ]
+            }
+        }
+    }
+
+
+def current_profile(user_id):
+    profile = backend.profile_service.cached(user_id)
+    return backend.json_bytes(profile.body, profile.etag)
+
+
+def profile_not_modified(user_id):
+    profile = backend.profile_service.cached(user_id)
+    return backend.not_modified(profile.etag)
+
+
+async def fill_profile_cache(users):
+    # Only saved profiles (or accounts) can be read, so save each one first
+    for user_id in users:
+        await backend.profile_service.update(user_id, {"name": f"Bench {user_id}"})
+        await backend.profile_service.get(user_id)
+
+
+def current_stats(user_id):
+    body = backend.orjson.dumps(legacy_stats(user_id))
+    return backend.json_bytes(body, f'"stats-{backend.digest(body)}"')
+
+
+def measure(fn, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(f"user-{i & 1023}")
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(fill_profile_cache(f"user-{i}" for i in range(1024)))
+
+    cases = {
+        "profile": [
+            ("dict + JSONResponse", lambda u: JSONResponse(jsonable_encoder(legacy_profile(u)))),
+            ("dict + ORJSONResponse", lambda u: ORJSONResponse(jsonable_encoder(legacy_profile(u)))),
+            ("cached, pre-serialized", current_profile),
+            ("304 (ETag match)", profile_not_modified),
+        ],
+        "stats": [
+            ("dict + JSONResponse", lambda u: JSONResponse(jsonable_encoder(legacy_stats(u)))),
+            ("dict + ORJSONResponse", lambda u: ORJSONResponse(jsonable_encoder(legacy_stats(u)))),
+            ("orjson + ETag digest", current_stats),
+        ],
+    }
+
+    print(f"{'endpoint':<10} {'variant':<24} {'us/request':>11} {'speedup':>8}")
+    for endpoint, variants in cases.items():
+        baseline = None
+        for label, fn in variants:
+            cost = measure(fn, args.iterations)
+            baseline = baseline or cost
+            print(f"{endpoint:<10} {label:<24} {cost:>11.2f} {baseline / cost:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
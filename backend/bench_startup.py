@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark
+Imports the app --runs times in fresh interpreters under `python -X
+importtime` (with an OpenAI key set, so the configured-upstream path is
+measured), prints the median import time and the packages that dominate
+it, and checks that the modules listed in --lazy (the OpenAI SDK by
+default) are not imported with the app. Then starts one worker with
+serve.py and reports the time until /health answers and until /ready says
+the warm-up has finished. Exits 1 if the median import takes more than
+--budget-ms or a lazy module was imported.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def app_env() -> dict:
+    return {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-startup-benchmark",
+        "SECRET_KEY": "startup-benchmark-" + "x" * 32,
+        "CHAT_DB_PATH": os.path.join(tempfile.mkdtemp(prefix="startup-bench-"), "chat.db"),
+    }
+
+
+def import_profile():
+    """``{module: (self_us, cumulative_us)}`` for one ``import main`` in a fresh interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], env=app_env(), cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def by_package(modules):
+    """Self time summed per top-level package, largest first"""
+    totals = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def time_to_ready(port: int):
+    """Seconds from launching a worker until /health answers and until /ready is 200"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--server", "uvicorn", "--workers", "1", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=app_env(), cwd=HERE, stdout=subprocess.DEVNULL)
+    healthy = ready = None
+    try:
+        while ready is None and time.perf_counter() - started < 60:
+            try:
+                if healthy is None:
+                    httpx.get(f"http://127.0.0.1:{port}/health").raise_for_status()
+                    healthy = time.perf_counter() - started
+                if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                    ready = time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        warmup = httpx.get(f"http://127.0.0.1:{port}/ready").json()
+    finally:
+        server.terminate()
+        server.wait()
+    return healthy, ready, warmup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="max median import time of main")
+    parser.add_argument("--lazy", default="openai", help="comma-separated modules that must not be imported")
+    parser.add_argument("--top", type=int, default=10, help="packages to list")
+    parser.add_argument("--port", type=int, default=8022)
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    import_ms = statistics.median(profile["main"][1] for profile in profiles) / 1000
+    print(f"import main: {import_ms:.0f} ms (median of {args.runs})\n")
+    print(f"{'package':<24} {'self ms':>8}")
+    for package, self_us in by_package(profiles[-1])[:args.top]:
+        print(f"{package:<24} {self_us / 1000:>8.1f}")
+
+    eager = [module for module in args.lazy.split(",") if module and module in profiles[-1]]
+    healthy, ready, warmup = time_to_ready(args.port)
+    print(f"\nworker start -> /health: {healthy:.2f}s, -> /ready: {ready:.2f}s" if ready is not None
+          else "\nworker never became ready")
+    print(f"warm-up steps (ms): {warmup['steps_ms']}")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    if import_ms > args.budget_ms:
+        print(f"FAIL: import time over budget ({args.budget_ms} ms)")
+        failed = True
+    if ready is None or warmup["errors"]:
+        print(f"FAIL: warm-up did not finish cleanly: {warmup['errors']}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
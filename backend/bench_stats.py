@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Wellness stats benchmark
+Generates random chat messages, media suggestions and mood check-ins for
+--users users, applies them through the incremental engine (as the app does)
+and checks that a full NumPy backfill from the raw events produces the same
+stats for every user. Then compares a stats read (one aggregate row) with
+recomputing one user's stats from their raw events, and times the backfill.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from chat_store import SQLiteChatStore
+from stats_engine import DAY, SQLiteStatsStore, StatsEngine, build_aggregates
+
+MEDIA_CATEGORIES = ["relaxation", "meditation", "nature", "music", "therapy"]
+
+
+def random_events(users: int, events_per_user: int, days: int, seed: int = 7):
+    """Per-user event streams in timestamp order over the last ``days`` days"""
+    rng = random.Random(seed)
+    now = time.time()
+    messages, moods = [], []
+    for u in range(users):
+        user_id = f"user-{u}"
+        ts = now - days * DAY
+        for n in range(events_per_user):
+            # Mostly short gaps (same session), sometimes hours or days
+            ts += rng.choice([rng.uniform(5, 300)] * 6 + [rng.uniform(3600, 30000), rng.uniform(DAY, 3 * DAY)])
+            if ts > now:
+                break
+            if rng.random() < 0.15:
+                moods.append((user_id, rng.randint(1, 10), rng.choice(["", "ok", "tired", "great day"]), ts))
+            else:
+                sender = "user" if rng.random() < 0.6 else "assistant"
+                media = None
+                if sender == "assistant" and rng.random() < 0.2:
+                    media = {"category": rng.choice(MEDIA_CATEGORIES), "type": "audio", "items": []}
+                messages.append({"id": f"m-{u}-{n}", "user_id": user_id, "sender": sender, "message": "hello",
+                                 "emotion_detected": "neutral", "timestamp": ts, "media": media})
+    return messages, moods
+
+
+async def apply_incrementally(engine: StatsEngine, messages, moods):
+    events = sorted([(m["timestamp"], 0, m) for m in messages] + [(m[3], 1, m) for m in moods],
+                    key=lambda event: event[:2])
+    await engine.start()
+    for _, kind, event in events:
+        if kind == 0:
+            engine.record_message(event["user_id"], event["sender"], event["timestamp"], event["media"])
+        else:
+            engine.record_mood(*event)
+    await engine.flush()
+
+
+async def read_all(engine: StatsEngine, user_ids):
+    return {user_id: await engine.get(user_id) for user_id in user_ids}
+
+
+def scan_one(path: str, engine: StatsEngine, user_id: str):
+    """Stats for one user recomputed from their raw rows (no aggregates)"""
+    with sqlite3.connect(path) as connection:
+        messages = connection.execute(
+            "SELECT user_id, timestamp FROM messages WHERE user_id = ? AND sender = 'user'", (user_id,)).fetchall()
+        media = connection.execute(
+            "SELECT user_id, json_extract(media, '$.category') FROM messages WHERE user_id = ? "
+            "AND sender = 'assistant' AND media IS NOT NULL", (user_id,)).fetchall()
+        moods = connection.execute(
+            "SELECT user_id, timestamp, mood, notes FROM mood_checkins WHERE user_id = ? "
+            "ORDER BY timestamp, seq", (user_id,)).fetchall()
+    aggregates = build_aggregates(messages, media, moods, engine.session_gap, engine.rolling_days, engine.recent_moods)
+    return aggregates[user_id].snapshot(time.time(), engine.rolling_days)
+
+
+async def run(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="stats-bench-"), "chat.db")
+    chat_store = SQLiteChatStore(path)
+    store = SQLiteStatsStore(path)
+    engine = StatsEngine(store)
+    messages, moods = random_events(args.users, args.events, args.days)
+    chat_store.write_batch(messages)
+    chat_store.close()
+
+    started = time.perf_counter()
+    await apply_incrementally(engine, messages, moods)
+    elapsed = time.perf_counter() - started
+    print(f"{len(messages)} messages + {len(moods)} check-ins for {args.users} users applied incrementally "
+          f"in {elapsed:.2f}s ({(len(messages) + len(moods)) / elapsed:.0f} events/s)")
+
+    user_ids = [f"user-{u}" for u in range(args.users)]
+    incremental = await read_all(engine, user_ids)
+    started = time.perf_counter()
+    users = await asyncio.to_thread(engine.backfill)
+    backfill_s = time.perf_counter() - started
+    rebuilt = await read_all(engine, user_ids)
+    mismatched = [user_id for user_id in user_ids if incremental[user_id] != rebuilt[user_id]]
+    assert not mismatched, f"backfill differs for {mismatched[:5]}: {incremental[mismatched[0]]} != {rebuilt[mismatched[0]]}"
+    print(f"Backfill matches incremental stats for all {users} users ({backfill_s * 1000:.0f} ms)")
+
+    sample = user_ids[:200]
+    started = time.perf_counter()
+    for user_id in sample:
+        await engine.get(user_id)
+    read_us = (time.perf_counter() - started) / len(sample) * 1e6
+    started = time.perf_counter()
+    for user_id in sample:
+        scan_one(path, engine, user_id)
+    scan_us = (time.perf_counter() - started) / len(sample) * 1e6
+    print(f"\n{'stats read':<36} {'us/user':>9}")
+    print(f"{'aggregate row (incremental)':<36} {read_us:>9.1f}")
+    print(f"{'recompute from raw events':<36} {scan_us:>9.1f}")
+    await engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=200, help="events per user")
+    parser.add_argument("--days", type=int, default=60, help="days of history")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
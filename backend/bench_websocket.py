@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+WebSocket chat benchmark
+Starts the app with serve.py (one uvicorn worker, no upstream configured, so every reply is
+served locally and the numbers reflect transport and per-turn overhead),
+holds --idle idle chat sessions open and reports the server's memory per
+session, then compares chat turns per second and latency over persistent
+WebSockets with POST /api/v1/chat/send over keep-alive HTTP connections.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from websockets.asyncio.client import connect
+
+MESSAGE = "I had a long day at work today and I keep thinking about it"
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "",
+        "RATE_LIMIT_BACKEND": "off",
+        "CHAT_DB_PATH": os.path.join(tempfile.mkdtemp(prefix="ws-bench-"), "chat.db"),
+        "WS_MAX_CONNECTIONS": "100000",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--server", "uvicorn", "--workers", "1", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health").raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+async def open_idle(url: str, count: int, batch: int = 100):
+    sockets = []
+    for start in range(0, count, batch):
+        opened = await asyncio.gather(*(connect(url, ping_interval=None, max_queue=4, compression=None, open_timeout=30)
+                                        for _ in range(min(batch, count - start))))
+        for ws in opened:
+            await ws.recv()  # ready
+        sockets.extend(opened)
+    return sockets
+
+
+async def guest_tokens(base_url: str, count: int) -> list:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        responses = await asyncio.gather(*(http.post("/api/v1/auth/guest") for _ in range(count)))
+    return [response.raise_for_status().json()["data"]["access_token"] for response in responses]
+
+
+async def ws_turns(url: str, tokens: list, turns: int):
+    latencies = []
+
+    async def client(token):
+        async with connect(f"{url}?token={token}", ping_interval=None, compression=None) as ws:
+            await ws.recv()
+            for _ in range(turns):
+                started = time.perf_counter()
+                await ws.send(json.dumps({"type": "chat", "message": MESSAGE}))
+                while json.loads(await ws.recv())["event"] != "done":
+                    pass
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(token) for token in tokens))
+    return len(tokens) * turns / (time.perf_counter() - started), latencies
+
+
+async def http_turns(base_url: str, tokens: list, turns: int):
+    latencies = []
+    limits = httpx.Limits(max_connections=len(tokens), max_keepalive_connections=len(tokens))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        async def client(token):
+            headers = {"Authorization": f"Bearer {token}"}
+            for _ in range(turns):
+                started = time.perf_counter()
+                response = await http.post("/api/v1/chat/send", json={"message": MESSAGE}, headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(token) for token in tokens))
+        return len(tokens) * turns / (time.perf_counter() - started), latencies
+
+
+async def run(args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    ws_url = f"ws://127.0.0.1:{args.port}/api/v1/chat/ws"
+    server = start_server(args.port)
+    try:
+        # Warm up both paths before measuring memory
+        tokens = await guest_tokens(base_url, args.clients)
+        await ws_turns(ws_url, tokens[:4], 5)
+        await http_turns(base_url, tokens[:4], 5)
+        before = rss_kb(server.pid)
+        sockets = await open_idle(ws_url, args.idle)
+        await asyncio.sleep(1)
+        after = rss_kb(server.pid)
+        open_sessions = httpx.get(f"{base_url}/health").json()["websocket"]["open"]
+        print(f"{open_sessions} idle sessions: server RSS +{(after - before) / 1024:.1f} MB "
+              f"({(after - before) / max(args.idle, 1):.1f} KB/session)")
+
+        print(f"\n{'transport':<26} {'turns/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, turns in (("WebSocket", ws_turns(ws_url, tokens, args.turns)),
+                             ("POST /api/v1/chat/send", http_turns(base_url, tokens, args.turns))):
+            rate, latencies = await turns
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{label:<26} {rate:>9.0f} {statistics.median(latencies) * 1000:>8.2f} {p99 * 1000:>8.2f}")
+        print(f"(with {args.idle} idle sessions open)")
+
+        await asyncio.gather(*(ws.close() for ws in sockets))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8021)
+    parser.add_argument("--idle", type=int, default=2000, help="idle sessions to hold open")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent chatting clients")
+    parser.add_argument("--turns", type=int, default=50, help="chat turns per client")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
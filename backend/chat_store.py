@@ -0,0 +1,282 @@
+"""
+Persistent chat history store
+Messages are written behind the request path in batches and read back with
+keyset (cursor) pagination over an index on (user_id, timestamp).
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(timestamp: float, seq: int) -> str:
+    """Opaque pagination cursor pointing just past (timestamp, seq)"""
+    return base64.urlsafe_b64encode(f"{timestamp!r}:{seq}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        timestamp, seq = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(timestamp), int(seq)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class ChatStore:
+    """Storage interface for chat messages.
+
+    A message is a dict with ``id``, ``user_id``, ``sender``, ``message``,
+    ``timestamp`` and ``emotion_detected`` keys, plus an optional ``media``
+    suggestion (category, type and catalog item ids). Methods are synchronous
+    and are called from a thread pool.
+    """
+
+    def write_batch(self, messages: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def read_page(self, user_id: str, before: Optional[Tuple[float, int]],
+                  limit: int) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, int]]]:
+        """Newest-first page of a user's messages older than ``before``, plus the next page's key"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteChatStore(ChatStore):
+    """SQLite-backed store in WAL mode with one connection per thread"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            user_id TEXT NOT NULL,
+            sender TEXT NOT NULL,
+            message TEXT NOT NULL,
+            emotion_detected TEXT,
+            timestamp REAL NOT NULL,
+            media TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_user_timestamp
+            ON messages (user_id, timestamp, seq);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # Create the schema on a throwaway connection so none is held open at
+        # import time (a preloading server forks workers after importing the app)
+        with closing(sqlite3.connect(self.path)) as connection:
+            connection.executescript(self.SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(messages)")}
+            if "media" not in columns:
+                # Databases created before media suggestions were stored
+                connection.execute("ALTER TABLE messages ADD COLUMN media TEXT")
+                connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def write_batch(self, messages: List[Dict[str, Any]]) -> None:
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO messages (id, user_id, sender, message, emotion_detected, timestamp, media) "
+                "VALUES (:id, :user_id, :sender, :message, :emotion_detected, :timestamp, :media)",
+                [{**m, "media": json.dumps(m["media"]) if m.get("media") else None} for m in messages],
+            )
+
+    def read_page(self, user_id, before, limit):
+        if before is None:
+            rows = self._connection().execute(
+                "SELECT seq, id, sender, message, emotion_detected, timestamp, media FROM messages "
+                "WHERE user_id = ? ORDER BY timestamp DESC, seq DESC LIMIT ?",
+                (user_id, limit + 1),
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT seq, id, sender, message, emotion_detected, timestamp, media FROM messages "
+                "WHERE user_id = ? AND (timestamp, seq) < (?, ?) "
+                "ORDER BY timestamp DESC, seq DESC LIMIT ?",
+                (user_id, before[0], before[1], limit + 1),
+            ).fetchall()
+
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1]["timestamp"], rows[-1]["seq"])
+        messages = [
+            {
+                "id": row["id"],
+                "message": row["message"],
+                "timestamp": row["timestamp"],
+                "sender": row["sender"],
+                "emotion_detected": row["emotion_detected"],
+                "media": json.loads(row["media"]) if row["media"] else None,
+            }
+            for row in rows
+        ]
+        return messages, next_key
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+class WriteBehindQueue:
+    """Records written in batches by a background task.
+
+    ``record`` only enqueues; the writer hands queued records to ``_write``
+    (run in the thread pool) in batches of up to ``batch_size``, waiting at
+    most ``flush_interval`` seconds to fill a batch. Records carry a
+    ``user_id``; ``_pending_users`` counts each user's records still queued,
+    so readers can flush before reading their own writes.
+    """
+
+    LINGER_STEP = 0.005
+    label = "records"
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 0.05):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._pending_users: Counter = Counter()
+
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def _ensure_writer(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._write_loop())
+        return self._queue
+
+    async def start(self) -> None:
+        self._ensure_writer()
+
+    async def close(self) -> None:
+        """Flush queued records and stop the writer"""
+        if self._writer is not None and not self._writer.done():
+            await self.flush()
+            self._writer.cancel()
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """Queue a record for writing (never blocks the request)"""
+        self._ensure_writer().put_nowait(record)
+        self._pending_users[record["user_id"]] += 1
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far has been written"""
+        done = asyncio.get_running_loop().create_future()
+        self._ensure_writer().put_nowait(done)
+        await done
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.flush_interval
+            # Linger in short sleeps rather than asyncio.wait_for(queue.get()),
+            # which can swallow a cancellation (Python < 3.12) and keep the
+            # writer alive through event-loop shutdown
+            while len(batch) < self.batch_size and not isinstance(batch[-1], asyncio.Future):
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, self.LINGER_STEP))
+
+            records = [item for item in batch if not isinstance(item, asyncio.Future)]
+            if records:
+                try:
+                    await run_in_threadpool(self._write, records)
+                    self.written += len(records)
+                    self.batches += 1
+                except Exception:
+                    self.write_errors += 1
+                    logger.exception("Failed to write %d %s", len(records), self.label)
+                for record in records:
+                    self._pending_users[record["user_id"]] -= 1
+                    if self._pending_users[record["user_id"]] <= 0:
+                        del self._pending_users[record["user_id"]]
+
+            for item in batch:
+                if isinstance(item, asyncio.Future) and not item.done():
+                    item.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+        }
+
+
+class ChatHistory(WriteBehindQueue):
+    """Async facade over a ChatStore with a write-behind queue.
+
+    Messages are written in batches (see WriteBehindQueue). Reading a user's
+    history first flushes any of that user's messages still in the queue, so
+    clients read their own writes.
+    """
+
+    label = "chat messages"
+
+    def __init__(self, store: ChatStore, batch_size: int = 256, flush_interval: float = 0.05):
+        super().__init__(batch_size, flush_interval)
+        self.store = store
+
+    def _write(self, messages: List[Dict[str, Any]]) -> None:
+        self.store.write_batch(messages)
+
+    async def close(self) -> None:
+        """Flush queued messages and stop the writer"""
+        await super().close()
+        self.store.close()
+
+    async def history(self, user_id: str, cursor: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """One newest-first page of a user's messages and the cursor for the next page"""
+        before = decode_cursor(cursor) if cursor else None
+        if self._pending_users.get(user_id):
+            await self.flush()
+        messages, next_key = await run_in_threadpool(self.store.read_page, user_id, before, limit)
+        return {
+            "messages": messages,
+            "next_cursor": encode_cursor(*next_key) if next_key else None,
+            "has_more": next_key is not None,
+        }
@@ -0,0 +1,96 @@
+"""
+Circuit breaker for the upstream completion API
+After repeated failures the breaker opens and callers skip the upstream
+entirely (answering locally) until a single half-open probe succeeds.
+"""
+
+import random
+import time
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe.
+
+    ``failure_threshold`` consecutive failures open the circuit for
+    ``reset_timeout`` seconds (or longer, if the upstream sent a Retry-After).
+    After that the next caller is let through as a probe: success closes the
+    circuit, failure re-opens it. All methods are O(1) and never await, so a
+    rejected call costs microseconds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self._probe_in_flight = False
+
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.last_error: Optional[str] = None
+
+    def is_open(self) -> bool:
+        """True while calls should be short-circuited (doesn't claim the probe)"""
+        if self.state == OPEN:
+            return time.monotonic() < self.opened_until
+        return self.state == HALF_OPEN and self._probe_in_flight
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; claims the probe when half-open"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() >= self.opened_until:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self, error: Optional[BaseException] = None, retry_after: Optional[float] = None) -> None:
+        self.consecutive_failures += 1
+        if error is not None:
+            self.last_error = type(error).__name__
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open(retry_after)
+
+    def release(self) -> None:
+        """Give back a probe whose call ended without a verdict (e.g. cancelled)"""
+        self._probe_in_flight = False
+
+    def _open(self, retry_after: Optional[float]) -> None:
+        if self.state != OPEN:
+            self.times_opened += 1
+        self.state = OPEN
+        self._probe_in_flight = False
+        self.opened_until = time.monotonic() + max(self.reset_timeout, retry_after or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        remaining = self.opened_until - time.monotonic() if self.state == OPEN else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "open_remaining_seconds": round(max(remaining, 0.0), 3),
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "last_error": self.last_error,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
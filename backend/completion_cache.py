@@ -0,0 +1,203 @@
+"""
+Cache for LLM completions with single-flight deduplication
+Keys are derived from the normalized user message plus the model/prompt
+parameters, so near-identical openers ("Hi!", "hi") share one upstream call.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " .!?,;:~"
+
+
+def normalize_message(message: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    return _WHITESPACE_RE.sub(" ", message.lower()).strip().rstrip(_TRAILING_PUNCTUATION)
+
+
+def cache_key(message: str, **params: Any) -> str:
+    """Stable key for a completion of ``message`` under ``params`` (model, prompt version, ...)"""
+    material = json.dumps([normalize_message(message), params], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCacheBackend:
+    """Shared cache for multi-worker deployments (requires the optional ``redis`` package).
+
+    Redis handles TTL expiry and eviction (configure ``maxmemory-policy``), so
+    eviction counts are not tracked here.
+    """
+
+    def __init__(self, url: str, ttl: float = 600.0, prefix: str = "completion:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("COMPLETION_CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except Exception:
+            # A cache outage must never take chat down with it
+            self.errors += 1
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    async def set(self, key: str, value: str) -> None:
+        try:
+            await self.client.set(self.prefix + key, value, ex=max(int(self.ttl), 1))
+        except Exception:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "ttl_seconds": self.ttl, "errors": self.errors}
+
+
+class CompletionCache:
+    """Read-through completion cache with single-flight deduplication.
+
+    Concurrent misses for the same key share one upstream call; values larger
+    than ``max_entry_bytes`` are returned but not stored.
+    """
+
+    def __init__(self, backend, max_entry_bytes: int = 4096):
+        self.backend = backend
+        self.max_entry_bytes = max_entry_bytes
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stores = 0
+        self.oversized = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """Cached value for ``key``, counting the lookup as a hit or miss"""
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Optional[str]) -> None:
+        """Store ``value`` unless it is empty or over the size cap"""
+        if not value:
+            return
+        if len(value.encode("utf-8")) > self.max_entry_bytes:
+            self.oversized += 1
+            return
+        await self.backend.set(key, value)
+        self.stores += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Return the cached value, or run ``compute`` once for all concurrent callers
+
+        The computation runs in its own task that every caller (the one that
+        started it included) awaits through a shield, so a caller that is
+        cancelled stops waiting without cancelling it for the others; one
+        that nobody waits for any more still finishes and fills the cache.
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        # Another caller may have started the same computation while we were
+        # waiting on the backend
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        task = asyncio.get_running_loop().create_task(self._compute(key, compute))
+        self._inflight[key] = task
+        # Retrieve the outcome so a failure nobody is left waiting for isn't logged
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        try:
+            value = await compute()
+            await self.set(key, value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters plus backend details"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "stores": self.stores,
+            "oversized": self.oversized,
+            "in_flight": len(self._inflight),
+            **self.backend.stats(),
+        }
+
+
+def build_completion_cache(backend: str, max_entries: int, ttl: float,
+                           max_entry_bytes: int, redis_url: Optional[str] = None) -> Optional[CompletionCache]:
+    """Build the configured cache, or None when caching is turned off"""
+    if backend == "off":
+        return None
+    if backend == "redis":
+        return CompletionCache(RedisCacheBackend(redis_url or "redis://localhost:6379/0", ttl), max_entry_bytes)
+    return CompletionCache(MemoryCacheBackend(max_entries, ttl), max_entry_bytes)
@@ -0,0 +1,181 @@
+"""
+Conversation-context assembly for multi-turn prompts
+Recent turns are included verbatim up to a token budget; turns that don't fit
+are folded into a running summary that is extended incrementally rather than
+rebuilt on every turn.
+"""
+
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from chat_store import ChatHistory
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+# Fixed per-message overhead (role, separators) in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class _LRU(OrderedDict):
+    """OrderedDict that drops its oldest entries beyond ``max_size``"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class _Summary:
+    """Condensed lines for turns that fell out of the verbatim window"""
+
+    __slots__ = ("lines", "tokens", "covered_until")
+
+    def __init__(self):
+        self.lines: List[tuple] = []
+        self.tokens = 0
+        # (timestamp, id) of the newest message folded in so far
+        self.covered_until = (0.0, "")
+
+
+class ContextBuilder:
+    """Builds the prior-turn messages for a user's next completion.
+
+    Loads the newest ``max_turns`` messages (plus a small margin so turns
+    leaving the window are still seen once), keeps as many recent turns as
+    fit in ``token_budget`` and folds the rest into a per-user summary capped
+    at ``summary_budget`` tokens.
+    """
+
+    FOLD_MARGIN = 8
+
+    def __init__(self, history: ChatHistory, max_turns: int = 12, token_budget: int = 1000,
+                 summary_budget: int = 200, max_users: int = 10000):
+        self.history = history
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+
+        self._tokens = _LRU(max_users * 4)
+        self._summaries = _LRU(max_users)
+
+        self.builds = 0
+        self.turns_included = 0
+        self.turns_summarized = 0
+        self.context_tokens = 0
+
+    def tokens(self, message: Dict[str, Any]) -> int:
+        """Token estimate for a stored message, cached by message id"""
+        count = self._tokens.get(message["id"])
+        if count is None:
+            count = estimate_tokens(message["message"])
+            self._tokens.put(message["id"], count)
+        return count
+
+    @staticmethod
+    def condense(message: Dict[str, Any]) -> str:
+        """One short line standing in for a turn in the summary"""
+        first_sentence = _SENTENCE_END_RE.split(message["message"].strip(), 1)[0]
+        if len(first_sentence) > 120:
+            first_sentence = first_sentence[:117].rstrip() + "..."
+        if message["sender"] == "user":
+            emotion = message.get("emotion_detected")
+            mood = f" (seemed {emotion})" if emotion and emotion != "neutral" else ""
+            return f"- They said{mood}: {first_sentence}"
+        return f"- You replied: {first_sentence}"
+
+    def _fold(self, user_id: str, messages: List[Dict[str, Any]]) -> Optional[str]:
+        """Fold not-yet-summarized messages (oldest first) into the user's summary"""
+        summary = self._summaries.get(user_id)
+        if summary is None:
+            summary = _Summary()
+        self._summaries.put(user_id, summary)
+
+        for message in messages:
+            key = (message["timestamp"], message["id"])
+            if key <= summary.covered_until:
+                continue
+            line = self.condense(message)
+            tokens = estimate_tokens(line) - MESSAGE_OVERHEAD_TOKENS
+            summary.lines.append((line, tokens))
+            summary.tokens += tokens
+            summary.covered_until = key
+            self.turns_summarized += 1
+
+        # Keep the most recent condensed lines within the summary budget
+        while summary.tokens > self.summary_budget and summary.lines:
+            _, tokens = summary.lines.pop(0)
+            summary.tokens -= tokens
+
+        if not summary.lines:
+            return None
+        return "Earlier in this conversation:\n" + "\n".join(line for line, _ in summary.lines)
+
+    @property
+    def window(self) -> int:
+        """Stored messages a build looks at"""
+        return self.max_turns + self.FOLD_MARGIN
+
+    async def build(self, user_id: str, exclude_id: Optional[str] = None) -> List[Dict[str, str]]:
+        """Prior-turn messages (oldest first), optionally led by a summary system message"""
+        page = await self.history.history(user_id, limit=self.window)
+        return self.assemble(user_id, [m for m in page["messages"] if m["id"] != exclude_id])
+
+    def assemble(self, user_id: str, newest_first: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Context from the user's latest stored messages, newest first (at most ``window`` of them)
+
+        Turns the summary already covers are never repeated verbatim, even if
+        they would fit in the budget again (e.g. when a long turn is excluded).
+        """
+        folded = self._summaries.get(user_id)
+        covered_until = folded.covered_until if folded else (0.0, "")
+        recent = []
+        used = 0
+        for message in newest_first[:self.max_turns]:
+            if (message["timestamp"], message["id"]) <= covered_until:
+                break
+            tokens = self.tokens(message)
+            if used + tokens > self.token_budget - self.summary_budget:
+                break
+            recent.append(message)
+            used += tokens
+
+        older = newest_first[len(recent):]
+        summary = None
+        if older or folded:
+            summary = self._fold(user_id, list(reversed(older)))
+
+        context = []
+        if summary:
+            context.append({"role": "system", "content": summary})
+            used += estimate_tokens(summary)
+        for message in reversed(recent):
+            role = "user" if message["sender"] == "user" else "assistant"
+            context.append({"role": role, "content": message["message"]})
+
+        self.builds += 1
+        self.turns_included += len(recent)
+        self.context_tokens += used
+        return context
+
+    def stats(self) -> Dict[str, Any]:
+        builds = self.builds or 1
+        return {
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "builds": self.builds,
+            "avg_turns_included": round(self.turns_included / builds, 2),
+            "avg_context_tokens": round(self.context_tokens / builds, 1),
+            "turns_summarized": self.turns_summarized,
+            "summaries_cached": len(self._summaries),
+        }
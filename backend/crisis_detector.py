@@ -0,0 +1,163 @@
+"""
+Crisis-phrase detection for chat messages
+Messages about suicide, self-harm or harming others are recognised before
+anything else in the chat pipeline, so their replies can come from the
+upstream's priority lane (or locally, immediately) with crisis resources
+attached instead of queueing behind ordinary traffic. Every phrase is
+compiled into one whole-word regular expression at import; a message is
+scanned once, in a few microseconds.
+
+The phrase lists follow frontend/src/utils/crisisDetection.ts, minus single
+words that are mostly harmless in chat ("hanging out", "cutting onions").
+Protective phrases ("getting help", "therapy") lower the level by one step,
+as on the frontend.
+"""
+
+import re
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+HIGH = "high"
+MEDIUM = "medium"
+LOW = "low"
+LEVELS = (HIGH, MEDIUM, LOW)
+
+CRISIS_PHRASES: Dict[str, List[str]] = {
+    HIGH: [
+        # Suicide
+        "suicide", "suicidal", "kill myself", "killing myself", "end my life", "ending my life", "take my life",
+        "want to die", "wanna die", "ending it all", "end it all", "no point living", "no reason to live",
+        "better off dead", "suicide plan", "overdose", "jump off a bridge", "pills to overdose", "rope to hang",
+        "hang myself",
+        # Self-harm with intent to injure
+        "cut myself deep", "cut deep", "hurt myself badly", "harm myself seriously", "burn myself",
+        # Harm to others
+        "kill someone", "hurt others", "homicidal", "violent thoughts",
+    ],
+    MEDIUM: [
+        # Self-harm
+        "self harm", "self-harm", "cut myself", "cutting myself", "scratch myself", "hurt myself",
+        "hurting myself", "self injury", "burning myself", "hitting myself", "self mutilation",
+        # Suicidal ideation (less immediate)
+        "thoughts of death", "wish i was dead", "wish i were dead", "life not worth living",
+        "life isnt worth living", "everyone better without me", "everyone would be better off without me",
+        "disappear forever", "tired of living", "give up on life", "dont want to be here anymore",
+        "dont want to live", "cant go on",
+    ],
+    LOW: [
+        "feeling hopeless", "so hopeless", "very depressed", "extremely sad", "deeply troubled", "breaking down",
+        "cant cope", "mental breakdown", "panic attack", "severe anxiety", "everything is pointless",
+        "too much pain", "overwhelming sadness",
+    ],
+}
+
+PROTECTIVE_PHRASES = [
+    "getting help", "therapy", "therapist", "counseling", "counselling", "support system", "family support",
+    "friends care", "seeking treatment", "medication helping", "feeling better", "things improving",
+    "looking forward",
+]
+
+# Shown with every flagged reply; mirrors getEmergencyResources on the frontend
+EMERGENCY_RESOURCES = [
+    {"name": "988 Suicide & Crisis Lifeline", "contact": "Call or text 988"},
+    {"name": "Crisis Text Line", "contact": "Text HOME to 741741"},
+    {"name": "Emergency Services", "contact": "Call 911"},
+]
+SUPPORT_RESOURCES = [
+    {"name": "SAMHSA National Helpline", "contact": "1-800-662-4357"},
+    {"name": "NAMI HelpLine", "contact": "1-800-950-6264"},
+]
+RESOURCES = {
+    HIGH: EMERGENCY_RESOURCES,
+    MEDIUM: EMERGENCY_RESOURCES + SUPPORT_RESOURCES,
+    LOW: SUPPORT_RESOURCES,
+}
+
+# Local replies, used when the upstream can't answer within the crisis deadline
+CRISIS_REPLIES = {
+    HIGH: [
+        "I'm really glad you told me, and I'm worried about you. Your safety matters most right now - please call "
+        "or text 988, or call 911 if you're in immediate danger. You don't have to go through this alone.",
+        "What you're going through sounds incredibly painful, and you deserve support right now. Please reach out "
+        "to the 988 Suicide & Crisis Lifeline (call or text 988) - they're there 24/7. I'm here with you too.",
+    ],
+    MEDIUM: [
+        "Thank you for trusting me with something this hard. You don't have to carry it alone - the people at 988 "
+        "(call or text) are there any time, and I'm here to keep talking. How are you doing right this moment?",
+        "I can hear how much you're hurting, and it matters. If it gets to be too much, please call or text 988 or "
+        "text HOME to 741741. Would you tell me a bit more about what's been going on?",
+    ],
+    LOW: [
+        "It sounds like you're carrying a lot right now, and your feelings make sense. I'm here to listen - and if "
+        "you'd like to talk to someone, the SAMHSA helpline (1-800-662-4357) is free and confidential.",
+        "That sounds really overwhelming. Thank you for telling me. Want to talk through what's weighing on you most "
+        "right now?",
+    ],
+}
+
+# System note added just before the user's message on the upstream crisis lane
+# (after the shared prompt prefix, which stays cacheable)
+CRISIS_GUIDANCE = {
+    "role": "system",
+    "content": "The person may be in crisis or at risk of harm. Respond with calm warmth, take them seriously, "
+               "don't minimise or argue, and gently encourage them to contact the 988 Suicide & Crisis Lifeline "
+               "(call or text 988) or emergency services if they are in danger. Keep it to 2-3 sentences.",
+}
+
+
+class CrisisSignal(NamedTuple):
+    level: str
+    triggers: List[str]
+
+    def payload(self) -> dict:
+        """The ``crisis`` block returned with a flagged chat reply"""
+        return {"level": self.level, "resources": RESOURCES[self.level]}
+
+
+def normalize(text: str) -> str:
+    """Lowercase with apostrophes dropped and whitespace collapsed ("Can't  go on" -> "cant go on")"""
+    return " ".join(text.lower().replace("’", "").replace("'", "").split())
+
+
+def _compile(phrases: Iterable[str]) -> "re.Pattern[str]":
+    # Longest first, so "cut myself deep" wins over "cut myself"
+    alternatives = sorted({normalize(p) for p in phrases}, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(p) for p in alternatives) + r")\b")
+
+
+class CrisisDetector:
+    """Classifies a message's crisis level from whole-word phrase matches"""
+
+    def __init__(self, phrases: Dict[str, List[str]] = CRISIS_PHRASES,
+                 protective: Iterable[str] = PROTECTIVE_PHRASES):
+        self._levels = {}
+        for level in reversed(LEVELS):
+            # A phrase listed under several levels counts at the highest
+            for phrase in phrases.get(level, ()):
+                self._levels[normalize(phrase)] = level
+        self._pattern = _compile(self._levels)
+        self._protective = _compile(protective)
+        self.checked = 0
+        self.flagged = {level: 0 for level in LEVELS}
+
+    def detect(self, text: str) -> Optional[CrisisSignal]:
+        """The message's crisis level and matched phrases, or None"""
+        self.checked += 1
+        normalized = normalize(text)
+        triggers = self._pattern.findall(normalized)
+        if not triggers:
+            return None
+        rank = min(LEVELS.index(self._levels[t]) for t in triggers)
+        if self._protective.search(normalized):
+            rank = min(rank + 1, len(LEVELS) - 1)
+        level = LEVELS[rank]
+        self.flagged[level] += 1
+        return CrisisSignal(level, triggers)
+
+    def reply(self, signal: CrisisSignal, message: str) -> str:
+        """Local reply for a flagged message (stable for the same message)"""
+        replies = CRISIS_REPLIES[signal.level]
+        return replies[zlib.crc32(message.encode()) % len(replies)]
+
+    def stats(self) -> dict:
+        return {"phrases": len(self._levels), "checked": self.checked, "flagged": dict(self.flagged)}
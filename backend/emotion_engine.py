@@ -0,0 +1,222 @@
+"""
+Word-level emotion scoring engine
+Text is tokenized once and every emotion is scored at the same time against a
+precomputed NumPy weight table, giving a ranked distribution with real
+confidence values instead of a first-match keyword bucket.
+"""
+
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+NEUTRAL = 'neutral'
+
+# Raw scores are rounded to this many decimals before ranking, so equal sums
+# of weights (0.9 + 1.0 + 0.9 and 1.0 + 1.0 + 0.8) tie despite float error
+# and the emotion order breaks the tie
+SCORE_DECIMALS = 5
+
+# Leading letters a misspelt feeling word is expected to keep ("stresed")
+STEM_CHARS = 4
+
+# What ``screen`` needs from a chunk of text between spaces: its feeling
+# words, whether it has a cue word and whether it has a likely misspelling
+ChunkEntry = Tuple[Tuple[str, ...], bool, bool]
+
+# Chunks longer than the longest known word by more than this are read but not
+# cached, so the cache holds words with punctuation rather than raw user text
+CHUNK_CACHE_MARGIN = 32
+
+# Per-word weights. Emotion order is also the tie-break order, matching the
+# precedence of the original keyword buckets.
+EMOTION_LEXICON = {
+    'sadness': {
+        'sad': 1.0, 'sadness': 1.0, 'depressed': 1.0, 'depressing': 0.8, 'down': 0.6,
+        'upset': 0.8, 'cry': 1.0, 'crying': 1.0, 'cried': 1.0, 'tears': 0.8,
+        'lonely': 0.9, 'alone': 0.5, 'hopeless': 1.0, 'heartbroken': 1.0, 'miserable': 1.0,
+        'unhappy': 1.0, 'grief': 1.0, 'grieving': 1.0, 'empty': 0.6, 'hurt': 0.6,
+        'hurting': 0.7, 'lost': 0.4, 'sorrow': 1.0, 'gloomy': 0.8
+    },
+    'anxiety': {
+        'anxious': 1.0, 'anxiety': 1.0, 'worried': 1.0, 'worry': 0.9, 'worrying': 0.9,
+        'stress': 0.9, 'stressed': 1.0, 'stressful': 0.9, 'nervous': 1.0, 'panic': 1.0,
+        'panicking': 1.0, 'overwhelmed': 0.9, 'overwhelming': 0.8, 'tense': 0.7, 'uneasy': 0.8,
+        'restless': 0.6, 'overthinking': 0.8, 'pressure': 0.5
+    },
+    'anger': {
+        'angry': 1.0, 'mad': 1.0, 'furious': 1.0, 'irritated': 0.9, 'annoyed': 0.8,
+        'frustrated': 0.9, 'frustrating': 0.8, 'rage': 1.0, 'hate': 0.8, 'pissed': 1.0,
+        'resentful': 0.8, 'outraged': 1.0, 'livid': 1.0
+    },
+    'joy': {
+        'happy': 1.0, 'joy': 1.0, 'joyful': 1.0, 'excited': 1.0, 'great': 0.7,
+        'wonderful': 0.9, 'amazing': 0.8, 'glad': 0.8, 'grateful': 0.8, 'thankful': 0.8,
+        'cheerful': 0.9, 'delighted': 1.0, 'thrilled': 1.0, 'proud': 0.7, 'awesome': 0.7,
+        'fantastic': 0.8, 'love': 0.5, 'relieved': 0.6, 'content': 0.5
+    },
+    'fear': {
+        'scared': 1.0, 'afraid': 1.0, 'fear': 1.0, 'terrified': 1.0, 'frightened': 1.0,
+        'fearful': 1.0, 'horrified': 0.9, 'dread': 0.9, 'threatened': 0.7, 'unsafe': 0.8,
+        'petrified': 1.0
+    }
+}
+
+
+class EmotionScorer:
+    """Scores text against every emotion in one pass over its tokens.
+
+    The lexicon is compiled into a (vocabulary x emotions) float32 matrix. A
+    text's raw scores are the sum of the rows of its known tokens; a fixed
+    neutral prior is appended and the vector is normalised, so a text with no
+    emotional words is neutral with confidence 1.0 and confidence rises with
+    the weight of evidence for the top emotion.
+    """
+
+    def __init__(self, lexicon: Mapping[str, Mapping[str, float]], neutral_prior: float = 0.5,
+                 cue_words: Iterable[str] = (), chunk_cache_size: int = 50000):
+        self.emotions: List[str] = list(lexicon)
+        self.labels: List[str] = self.emotions + [NEUTRAL]
+        self.neutral_prior = neutral_prior
+
+        vocabulary = sorted({word for words in lexicon.values() for word in words})
+        self.vocab: Dict[str, int] = {word: i for i, word in enumerate(vocabulary)}
+        self.weights = np.zeros((len(vocabulary), len(self.labels)), dtype=np.float32)
+        for column, emotion in enumerate(self.emotions):
+            for word, weight in lexicon[emotion].items():
+                self.weights[self.vocab[word], column] = weight
+
+        self._neutral = np.zeros(len(self.labels), dtype=np.float32)
+        self._neutral[-1] = 1.0
+        # Rows as Python floats for ``detect``: summing a few of them is
+        # cheaper than a NumPy gather for one short text
+        self._rows = {word: [float(w) for w in self.weights[i]] for word, i in self.vocab.items()}
+        self._word_labels = {word: self._best(row) for word, row in self._rows.items()}
+        # For ``screen``: words the scores can't read (negations), and the
+        # first letters of the longer feeling words, which misspellings keep
+        self.cue_words = frozenset(cue_words)
+        self._stems = {word[:STEM_CHARS] for word in vocabulary if len(word) > STEM_CHARS}
+        # Tokens never contain a space, so ``screen`` reads a text chunk by
+        # chunk and remembers each word-sized chunk's reading (starting over
+        # when full); longer chunks are read every time
+        self.chunk_cache_size = chunk_cache_size
+        self._cached_chunk_chars = max(map(len, [*vocabulary, *self.cue_words]), default=0) + CHUNK_CACHE_MARGIN
+        self._chunks: Dict[str, Optional[ChunkEntry]] = {}
+
+    def token_ids(self, text: str) -> List[int]:
+        """Vocabulary ids of the known words in ``text`` (whole words only)"""
+        vocab = self.vocab
+        return [vocab[token] for token in TOKEN_RE.findall(text.lower()) if token in vocab]
+
+    def distribution(self, text: str) -> np.ndarray:
+        """Normalised scores over ``labels`` (emotions then neutral) for one text"""
+        ids = self.token_ids(text)
+        if not ids:
+            return self._neutral
+        raw = self.weights[ids].sum(axis=0).round(SCORE_DECIMALS)
+        raw[-1] = self.neutral_prior
+        return raw / raw.sum()
+
+    def distribution_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Normalised scores for many texts, shape (len(texts), len(labels))"""
+        vocab = self.vocab
+        ids: List[int] = []
+        docs: List[int] = []
+        for doc, text in enumerate(texts):
+            for token in TOKEN_RE.findall(text.lower()):
+                index = vocab.get(token)
+                if index is not None:
+                    ids.append(index)
+                    docs.append(doc)
+
+        count = len(texts)
+        raw = np.zeros((count, len(self.labels)), dtype=np.float32)
+        if ids:
+            rows = self.weights[np.asarray(ids, dtype=np.intp)]
+            doc_index = np.asarray(docs, dtype=np.intp)
+            for column in range(len(self.emotions)):
+                raw[:, column] = np.bincount(doc_index, weights=rows[:, column], minlength=count)
+        raw = raw.round(SCORE_DECIMALS)
+        raw[:, -1] = self.neutral_prior
+
+        # Texts without any emotional words are fully neutral
+        raw[raw[:, :-1].sum(axis=1) == 0, -1] = 1.0
+        return raw / raw.sum(axis=1, keepdims=True)
+
+    def detect(self, text: str) -> str:
+        """Most likely label for ``text`` (same answer as ``distribution(text).argmax()``)"""
+        rows = self._rows
+        words = [token for token in TOKEN_RE.findall(text.lower()) if token in rows]
+        if not words:
+            return NEUTRAL
+        if len(words) == 1:
+            return self._word_labels[words[0]]
+        return self._best([sum(column) for column in zip(*[rows[word] for word in words])])
+
+    def screen(self, text: str) -> Tuple[str, bool]:
+        """``detect``'s label and whether the text needs a closer reading than word scores give.
+
+        That is when it has a cue word (a negation), feeling words of more
+        than one emotion, or no feeling word but one that starts like one
+        ("stresed", "anxius").
+        """
+        words: List[str] = []
+        unclear = misspelt = False
+        chunks = self._chunks
+        for chunk in text.lower().split(" "):
+            try:
+                entry = chunks[chunk]
+            except KeyError:
+                entry = self._chunk_entry(chunk)
+            if entry is not None:
+                words += entry[0]
+                unclear = unclear or entry[1]
+                misspelt = misspelt or entry[2]
+        if not words:
+            return NEUTRAL, unclear or misspelt
+        if len(words) == 1:
+            return self._word_labels[words[0]], unclear
+        labels = self._word_labels
+        unclear = unclear or len({labels[word] for word in words}) > 1
+        return self._best([sum(column) for column in zip(*[self._rows[word] for word in words])]), unclear
+
+    def _chunk_entry(self, chunk: str) -> Optional[ChunkEntry]:
+        tokens = TOKEN_RE.findall(chunk)
+        words = tuple(token for token in tokens if token in self._rows)
+        cue = not self.cue_words.isdisjoint(tokens)
+        misspelt = any(token[:STEM_CHARS] in self._stems for token in tokens if len(token) > STEM_CHARS)
+        entry = (words, cue, misspelt) if words or cue or misspelt else None
+        if len(chunk) > self._cached_chunk_chars:
+            return entry
+        if len(self._chunks) >= self.chunk_cache_size:
+            self._chunks.clear()
+        self._chunks[chunk] = entry
+        return entry
+
+    def _best(self, scores: List[float]) -> str:
+        # Rounded like ``distribution``, then the first maximum wins
+        scores = [round(score, SCORE_DECIMALS) for score in scores]
+        scores[-1] = self.neutral_prior
+        return self.labels[scores.index(max(scores))]
+
+    def ranked(self, distribution: np.ndarray) -> Dict[str, float]:
+        """Labels with non-zero scores, most likely first"""
+        order = np.argsort(-distribution, kind='stable')
+        return {self.labels[i]: round(float(distribution[i]), 4) for i in order if distribution[i] > 0}
+
+    def _summary(self, distribution: np.ndarray) -> dict:
+        ranked = self.ranked(distribution)
+        emotion, confidence = next(iter(ranked.items()))
+        return {"emotion": emotion, "confidence": confidence, "emotions": ranked}
+
+    def analyze(self, text: str) -> dict:
+        """Top emotion, its confidence and the ranked distribution for ``text``"""
+        return self._summary(self.distribution(text))
+
+    def analyze_batch(self, texts: Sequence[str]) -> List[dict]:
+        """``analyze`` for many texts, scored in one vectorized pass"""
+        if not texts:
+            return []
+        return [self._summary(row) for row in self.distribution_batch(texts)]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Local fake of the OpenAI chat completions API for benchmarks and load tests
+Every completion sleeps for a fixed latency and returns a canned reply; a
+configurable fraction of requests can instead fail with an HTTP error (and
+optional Retry-After) to exercise retries and the circuit breaker.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_REPLY = "I hear you. That sounds like a lot to carry - want to tell me more about what's going on?"
+
+app = FastAPI(title="Fake OpenAI API")
+app.state.latency = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "200")) / 1000
+app.state.requests = 0
+app.state.error_rate = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+app.state.error_status = int(os.getenv("FAKE_OPENAI_ERROR_STATUS", "429"))
+app.state.retry_after = os.getenv("FAKE_OPENAI_RETRY_AFTER")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: dict):
+    """Mimic a chat completion, streamed word by word when `stream` is set"""
+    app.state.requests += 1
+    if app.state.error_rate and random.random() < app.state.error_rate:
+        return error_response()
+    if payload.get("stream"):
+        return StreamingResponse(stream_chunks(payload), media_type="text/event-stream")
+    await asyncio.sleep(app.state.latency)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "gpt-4o-mini"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": FAKE_REPLY},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 400, "completion_tokens": 20, "total_tokens": 420},
+    }
+
+
+def error_response() -> JSONResponse:
+    """An OpenAI-shaped error for the configured status code"""
+    code = "rate_limit_exceeded" if app.state.error_status == 429 else "server_error"
+    headers = {"retry-after": str(app.state.retry_after)} if app.state.retry_after else None
+    return JSONResponse(
+        {"error": {"message": "Injected failure", "type": code, "param": None, "code": code}},
+        status_code=app.state.error_status,
+        headers=headers,
+    )
+
+
+async def stream_chunks(payload: dict):
+    """Emit the canned reply as chat.completion.chunk events spread over the latency"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    words = FAKE_REPLY.split(" ")
+    for i, word in enumerate(words):
+        await asyncio.sleep(app.state.latency / len(words))
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [
+                {"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}
+            ],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def start_in_thread(port: int, latency_ms: float = 200) -> uvicorn.Server:
+    """Start the fake server on a background thread and wait until it accepts requests"""
+    app.state.latency = latency_ms / 1000
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", help="Retry-After header value sent with failures")
+    args = parser.parse_args()
+    app.state.latency = args.latency_ms / 1000
+    app.state.error_rate = args.error_rate
+    app.state.error_status = args.error_status
+    app.state.retry_after = args.retry_after
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,163 @@
+"""
+Local fallback replies for when the LLM is unavailable
+The intent table and response catalog are loaded once; a reply is picked
+from the classified intent's responses in O(1). Each conversation walks its
+own seeded permutation of every intent's responses, so a user doesn't see
+the same reply twice until the intent's responses are exhausted, and the
+order is reproducible for a given seed. Larger catalogs can be loaded from a
+JSON file (see ``load_fallback_catalog``).
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from math import gcd
+from typing import Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_INTENT = 'default'
+
+# Intent -> trigger keywords; earlier intents take precedence
+FALLBACK_KEYWORDS = {
+    'greeting': ["hi", "hello", "hey", "good morning", "good afternoon"],
+    'joke': ["joke", "funny", "laugh", "humor", "something funny"],
+    'anxiety': ["anxious", "anxiety", "worried", "panic", "stressed", "overwhelming"],
+    'sadness': ["sad", "down", "depressed", "heartbroken", "upset", "crying"],
+    'anger': ["angry", "mad", "furious", "frustrated", "annoyed"],
+    'positive': ["happy", "excited", "good news", "great", "amazing", "wonderful"]
+}
+
+FALLBACK_RESPONSES = {
+    'greeting': [
+        "Hey there! Good to see you. How's your day treating you so far?",
+        "Hi! I'm glad you're here. What's on your mind today?",
+        "Hello! Nice to see you again. How are things going?"
+    ],
+    'joke': [
+        "Oh, I love this! Here's one for you: Why don't scientists trust atoms? Because they make up everything! 😄 What kind of jokes do you usually like?",
+        "Alright, here's a good one: I told my wife she was drawing her eyebrows too high. She looked surprised! 😂 Want another one?",
+        "Here's something that always makes me chuckle: Why did the scarecrow win an award? He was outstanding in his field! 🌾 Do you like puns or prefer other kinds of humor?"
+    ],
+    'anxiety': [
+        "That sounds really tough right now. I'm here with you. Want to try some slow breathing together, or would you rather talk about what's weighing on you?",
+        "I can hear that you're going through something difficult. Sometimes when I feel overwhelmed, taking things one small step at a time helps. What feels most urgent right now?",
+        "That sounds like a lot to carry. You know what? Just taking a moment to reach out shows real strength. What's been the hardest part of today?"
+    ],
+    'sadness': [
+        "I'm really sorry you're hurting right now. That sounds genuinely hard. Do you want to tell me what's been going on?",
+        "That sounds painful, and I'm glad you felt comfortable sharing that with me. Sometimes it helps just to have someone listen. What's been the toughest part?",
+        "I hear you, and what you're feeling makes complete sense. You don't have to go through this alone. Want to talk about what happened?"
+    ],
+    'anger': [
+        "That sounds incredibly frustrating. I can understand why you'd feel that way. Want to tell me what happened?",
+        "Wow, that would upset me too. It sounds like something really got to you today. What's been going on?",
+        "I hear the frustration in what you're saying, and honestly, it sounds justified. Do you want to vent about it?"
+    ],
+    'positive': [
+        "That's fantastic! I love hearing good news. What's got you feeling so positive today?",
+        "Oh wow, that sounds wonderful! I'm genuinely happy for you. Tell me more about what's going well!",
+        "That's so great to hear! Your excitement is contagious. What made this such a good moment for you?"
+    ],
+    # Default responses
+    'default': [
+        "I'm here and really listening. What's going on with you today?",
+        "You know, I'm genuinely curious about what's on your mind. Want to share what you're thinking about?",
+        "I'm glad you're here. Tell me what's happening in your world right now.",
+        "Hey, I'm here for whatever you want to talk about. What's been on your mind lately?"
+    ]
+}
+
+
+class FallbackEngine:
+    """Picks fallback replies by intent, without repeats within a conversation.
+
+    ``keywords`` maps intents (in precedence order) to trigger keywords; it is
+    compiled into the shared ``KeywordMatcher`` under ``group`` so messages
+    are still classified in one pass. ``responses`` maps each intent, plus
+    ``default``, to its replies. Positions are tracked for the
+    ``max_conversations`` most recent conversations of this process.
+    """
+
+    def __init__(self, keywords: Mapping[str, Sequence[str]], responses: Mapping[str, Sequence[str]],
+                 group: str = 'fallback', seed: int = 0, max_conversations: int = 10000):
+        missing = [intent for intent in list(keywords) + [DEFAULT_INTENT] if not responses.get(intent)]
+        if missing:
+            raise ValueError(f"Fallback intents without responses: {', '.join(missing)}")
+        self.keywords = {intent: list(words) for intent, words in keywords.items()}
+        self.responses = {intent: tuple(replies) for intent, replies in responses.items()}
+        self.group = group
+        self.seed = seed
+        self.max_conversations = max_conversations
+        self._tags = [((group, intent), intent) for intent in self.keywords]
+        # Steps coprime with the catalog size give full-cycle permutations
+        self._steps = {intent: [s for s in range(1, len(replies)) if gcd(s, len(replies)) == 1] or [1]
+                       for intent, replies in self.responses.items()}
+        # conversation -> {intent: [picks so far, offset, step]}
+        self._conversations: "OrderedDict[str, Dict[str, list]]" = OrderedDict()
+        self.replies = 0
+
+    def classify(self, matches: FrozenSet[Tuple[str, str]]) -> str:
+        """First matching intent in precedence order, or ``default``"""
+        for tag, intent in self._tags:
+            if tag in matches:
+                return intent
+        return DEFAULT_INTENT
+
+    def _walk(self, conversation: str, intent: str) -> list:
+        state = self._conversations.get(conversation)
+        if state is None:
+            state = self._conversations[conversation] = {}
+            if len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        else:
+            self._conversations.move_to_end(conversation)
+        walk = state.get(intent)
+        if walk is None:
+            material = f"{self.seed}:{conversation}:{intent}".encode()
+            number = int.from_bytes(hashlib.blake2b(material, digest_size=8).digest(), "big")
+            steps = self._steps[intent]
+            walk = state[intent] = [0, number % len(self.responses[intent]), steps[(number >> 32) % len(steps)]]
+        return walk
+
+    def respond(self, matches: FrozenSet[Tuple[str, str]], conversation: Optional[str] = None,
+                intent: Optional[str] = None) -> str:
+        """Next reply for the message's intent in ``conversation``'s sequence.
+
+        ``intent`` (e.g. from the n-gram classifier) overrides the keyword
+        classification when this catalog has replies for it.
+        """
+        if intent is None or intent not in self.responses:
+            intent = self.classify(matches)
+        replies = self.responses[intent]
+        walk = self._walk(conversation or "", intent)
+        picks, offset, step = walk
+        walk[0] += 1
+        self.replies += 1
+        return replies[(offset + step * picks) % len(replies)]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "intents": len(self.keywords),
+            "responses": sum(len(replies) for replies in self.responses.values()),
+            "conversations": len(self._conversations),
+            "replies": self.replies,
+        }
+
+
+def load_fallback_catalog(path: str, **options) -> FallbackEngine:
+    """Build an engine from a JSON catalog.
+
+    The file holds ``{"intents": [{"name": ..., "keywords": [...],
+    "responses": [...]}, ...], "default": [...]}``, intents in precedence
+    order. Raises ValueError for a malformed catalog.
+    """
+    with open(path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    try:
+        keywords: Dict[str, List[str]] = {}
+        responses: Dict[str, List[str]] = {DEFAULT_INTENT: list(catalog["default"])}
+        for intent in catalog["intents"]:
+            keywords[intent["name"]] = list(intent["keywords"])
+            responses[intent["name"]] = list(intent["responses"])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed fallback catalog {path}: {e!r}")
+    return FallbackEngine(keywords, responses, **options)
@@ -0,0 +1,291 @@
+"""
+Hashed n-gram intent and emotion classifier
+A small linear model that runs on the CPU in tens of microseconds, used for
+fallback reply intents and chat emotions when the keyword tables would be
+fooled by phrasing ("I'm not happy" is not a positive message). Text is
+lowercased and turned into hashed features: character 3-5-grams (robust to
+typos and inflections), words (marked when they follow a negation) and word
+bigrams. Each head (intent, emotion) is a softmax over a shared weight
+matrix row-summed at the feature buckets, so inference is one gather and a
+sum.
+
+Models are trained by train_classifier.py and stored in a versioned binary
+file: a JSON header (format, featurizer settings, labels, biases, training
+metadata) followed by the float16 weight matrix, which is memory-mapped
+and widened to float32 once on load (1.7 MB at 2**15 buckets; summing
+float16 rows costs more than the gather), so workers forked from a
+preloaded app share one copy.
+"""
+
+import json
+import math
+import re
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"MCNGRAM\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, format version, header length
+ALIGNMENT = 64
+
+WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# A negation cue marks the next few words ("not really happy" -> !really !happy)
+NEGATIONS = frozenset({
+    "not", "no", "never", "nothing", "hardly", "barely", "without", "isn't", "aren't", "wasn't", "weren't",
+    "don't", "doesn't", "didn't", "can't", "cannot", "couldn't", "won't", "wouldn't", "shouldn't", "haven't",
+    "hasn't", "ain't", "nor",
+})
+NEGATION_SCOPE = 3
+
+# FNV-1a style mixing for character n-grams, in wrapping uint32 arithmetic
+# (0-d arrays: ufuncs take them with less overhead than NumPy scalars)
+FNV_PRIME = np.array(0x01000193, dtype=np.uint32)
+MIX = np.array(0x9E3779B1, dtype=np.uint32)
+
+# Featurizer's per-word hash cache: entries before it starts over, and the
+# longest token it keeps
+TOKEN_CACHE_SIZE = 50000
+TOKEN_CACHE_CHARS = 32
+
+
+def words(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+class Featurizer:
+    """Maps text to hashed feature buckets in ``[0, 2**bits)``.
+
+    Returns bucket indices (repeats allowed, so counts act as weights); the
+    same settings must be used for training and inference, which is why
+    they are stored in the model header.
+    """
+
+    def __init__(self, bits: int = 15, char_ngrams: Sequence[int] = (3, 4, 5)):
+        self.bits = bits
+        self.char_ngrams = tuple(char_ngrams)
+        self._shift = np.array(32 - bits, dtype=np.uint32)
+        self._seeds = {n: np.uint32(zlib.crc32(f"char{n}".encode())) for n in self.char_ngrams}
+        # Every n-gram size is hashed at once, one row per size (shortest
+        # first); step k mixes the k-th character into the rows of sizes > k
+        self._sizes = sorted(set(self.char_ngrams))
+        self._row = {n: row for row, n in enumerate(self._sizes)}
+        self._seed_column = np.array([[self._seeds[n]] for n in self._sizes], dtype=np.uint32)
+        self._first_row = [next(row for row, n in enumerate(self._sizes) if n > k) for k in range(self._sizes[-1])]
+        self._padding = bytes(self._sizes[-1])
+        self._ngram_rows = [(self._row[n], n - 1) for n in self.char_ngrams]
+        # Per word: its plain and negated buckets, the CRC of "b:{word} " its
+        # bigrams continue from, and whether it starts a negation scope
+        self._mask = (1 << bits) - 1
+        self._tokens: Dict[str, Tuple[int, int, int, bool]] = {}
+        self._start = zlib.crc32(b"b:<s> ")
+
+    def _char_buckets(self, normalized: str) -> List[np.ndarray]:
+        raw = normalized.encode()
+        length = len(raw)
+        # Zero padding, so every row can run to the end of the text
+        data = np.frombuffer(raw + self._padding, dtype=np.uint8).astype(np.uint32)
+        h = np.empty((len(self._sizes), length), dtype=np.uint32)
+        h[:] = self._seed_column
+        # Array arithmetic wraps silently, so no errstate is needed
+        for k, first in enumerate(self._first_row):
+            rows = h[first:]
+            np.bitwise_xor(rows, data[k:k + length], out=rows)
+            np.multiply(rows, FNV_PRIME, out=rows)
+        h *= MIX
+        h >>= self._shift
+        return [h[row, :length - tail] for row, tail in self._ngram_rows if length > tail]
+
+    def _token(self, token: str) -> Tuple[int, int, int, bool]:
+        mask = self._mask
+        entry = (zlib.crc32(f"w:{token}".encode()) & mask, zlib.crc32(f"!{token}".encode()) & mask,
+                 zlib.crc32(f"b:{token} ".encode()), token in NEGATIONS or token.endswith("n't"))
+        # Words are short; longer tokens are hashed every time so the cache stays small
+        if len(token) <= TOKEN_CACHE_CHARS:
+            if len(self._tokens) >= TOKEN_CACHE_SIZE:
+                self._tokens.clear()
+            self._tokens[token] = entry
+        return entry
+
+    def _word_buckets(self, tokens: List[str]) -> List[int]:
+        mask = self._mask
+        cache = self._tokens
+        buckets = []
+        scope = 0
+        previous = self._start
+        for token in tokens:
+            entry = cache.get(token) or self._token(token)
+            if scope:
+                scope -= 1
+                buckets.append(entry[1])
+            else:
+                buckets.append(entry[0])
+            if entry[3]:
+                scope = NEGATION_SCOPE
+            # CRC-32 continues across calls, so this is crc32("b:{previous} {token}")
+            buckets.append(zlib.crc32(token.encode(), previous) & mask)
+            previous = entry[2]
+        return buckets
+
+    def buckets(self, text: str) -> np.ndarray:
+        tokens = words(text)
+        parts = self._char_buckets(f" {' '.join(tokens)} ")
+        parts.append(np.array(self._word_buckets(tokens), dtype=np.uint32))
+        return np.concatenate(parts).astype(np.intp)
+
+    def buckets_batch(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated buckets of every text and each text's start offset"""
+        parts = [self.buckets(text) for text in texts]
+        lengths = np.fromiter((len(p) for p in parts), dtype=np.intp, count=len(parts))
+        starts = np.zeros(len(parts), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        return (np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)), starts
+
+    def config(self) -> Dict[str, Any]:
+        return {"bits": self.bits, "char_ngrams": list(self.char_ngrams)}
+
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class IntentClassifier:
+    """Linear model over hashed features with one softmax head per label set.
+
+    ``weights`` has one row per feature bucket and the heads' labels as
+    columns, side by side; ``heads`` maps each head name to its labels in
+    column order. A text's scores are the sum of its buckets' rows divided
+    by the square root of the bucket count, plus the bias.
+    """
+
+    def __init__(self, featurizer: Featurizer, heads: Dict[str, List[str]], weights: np.ndarray,
+                 bias: np.ndarray, version: str = "untrained", metadata: Optional[Dict[str, Any]] = None):
+        if weights.shape != (2 ** featurizer.bits, sum(len(labels) for labels in heads.values())):
+            raise ValueError(f"Weight matrix shape {weights.shape} doesn't match the featurizer and heads")
+        self.featurizer = featurizer
+        self.heads = {name: list(labels) for name, labels in heads.items()}
+        self.weights = weights
+        self._table = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.version = version
+        self.metadata = metadata or {}
+        self._columns: Dict[str, slice] = {}
+        start = 0
+        for name, labels in self.heads.items():
+            self._columns[name] = slice(start, start + len(labels))
+            start += len(labels)
+        self.predictions = 0
+
+    def scores(self, text: str) -> np.ndarray:
+        """Raw scores over every head's columns for one text"""
+        buckets = self.featurizer.buckets(text)
+        if not len(buckets):
+            return self.bias.copy()
+        # Row sum as a vector-matrix product, which is several times faster than .sum(axis=0)
+        count = len(buckets)
+        scores = np.ones(count, dtype=np.float32) @ self._table.take(buckets, axis=0)
+        scores *= 1.0 / math.sqrt(count)
+        scores += self.bias
+        return scores
+
+    def scores_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Raw scores for many texts, shape (len(texts), columns), in one gather"""
+        buckets, starts = self.featurizer.buckets_batch(texts)
+        scores = np.tile(self.bias, (len(texts), 1))
+        if not len(buckets):
+            return scores
+        lengths = np.diff(np.append(starts, len(buckets)))
+        present = lengths > 0
+        sums = np.add.reduceat(self._table.take(buckets, axis=0), starts[present], axis=0)
+        scores[present] += sums / np.sqrt(lengths[present])[:, None]
+        return scores
+
+    def _top(self, scores: List[float], head: str) -> Tuple[str, float]:
+        # A dozen columns: plain floats beat NumPy's per-call overhead here
+        head_scores = scores[self._columns[head]]
+        top = max(head_scores)
+        best = head_scores.index(top)
+        return self.heads[head][best], 1.0 / sum(math.exp(score - top) for score in head_scores)
+
+    def predict(self, text: str, head: str) -> Tuple[str, float]:
+        """Most likely label of ``head`` for ``text`` and its probability"""
+        self.predictions += 1
+        return self._top(self.scores(text).tolist(), head)
+
+    def predict_all(self, text: str) -> Dict[str, Tuple[str, float]]:
+        """``predict`` for every head, sharing one feature pass"""
+        self.predictions += 1
+        scores = self.scores(text).tolist()
+        return {head: self._top(scores, head) for head in self.heads}
+
+    def predict_batch(self, texts: Sequence[str], head: str) -> List[Tuple[str, float]]:
+        """``predict`` for many texts, featurized and scored in one pass"""
+        if not texts:
+            return []
+        self.predictions += len(texts)
+        probabilities = softmax(self.scores_batch(texts)[:, self._columns[head]])
+        best = probabilities.argmax(axis=1)
+        labels = self.heads[head]
+        return [(labels[i], float(probabilities[row, i])) for row, i in enumerate(best.tolist())]
+
+    def probabilities(self, text: str, head: str) -> Dict[str, float]:
+        """Every label of ``head`` with its probability, most likely first"""
+        return self._ranked(softmax(self.scores(text)[self._columns[head]]), head)
+
+    def probabilities_batch(self, texts: Sequence[str], head: str) -> List[Dict[str, float]]:
+        """``probabilities`` for many texts, featurized and scored in one pass"""
+        if not texts:
+            return []
+        self.predictions += len(texts)
+        return [self._ranked(row, head) for row in softmax(self.scores_batch(texts)[:, self._columns[head]])]
+
+    def _ranked(self, probabilities: np.ndarray, head: str) -> Dict[str, float]:
+        order = np.argsort(-probabilities, kind="stable")
+        return {self.heads[head][i]: round(float(probabilities[i]), 4) for i in order}
+
+    def save(self, path: str) -> None:
+        """Write the model file (header, then the weight matrix as float16)"""
+        header = json.dumps({
+            "version": self.version,
+            "featurizer": self.featurizer.config(),
+            "heads": [[name, labels] for name, labels in self.heads.items()],  # column order
+            "bias": [round(float(b), 6) for b in self.bias],
+            "dtype": "float16",
+            "shape": list(self.weights.shape),
+            "metadata": self.metadata,
+        }, sort_keys=True).encode()
+        prefix = HEADER.pack(MAGIC, FORMAT_VERSION, len(header)) + header
+        padding = b"\0" * (-len(prefix) % ALIGNMENT)
+        with open(path, "wb") as f:
+            f.write(prefix + padding)
+            f.write(np.ascontiguousarray(self.weights, dtype=np.float16).tobytes())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "heads": {name: len(labels) for name, labels in self.heads.items()},
+            "buckets": len(self.weights),
+            "predictions": self.predictions,
+        }
+
+
+def load_classifier(path: str) -> IntentClassifier:
+    """Load a model file, memory-mapping its weights (read-only)"""
+    with open(path, "rb") as f:
+        magic, format_version, header_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a classifier model file")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} has model format {format_version}, expected {FORMAT_VERSION}")
+        header = json.loads(f.read(header_length))
+    offset = HEADER.size + header_length
+    offset += -offset % ALIGNMENT
+    weights = np.memmap(path, dtype=np.dtype(header["dtype"]), mode="r", offset=offset,
+                        shape=tuple(header["shape"]))
+    featurizer = Featurizer(**header["featurizer"])
+    return IntentClassifier(featurizer, dict(header["heads"]), weights, np.array(header["bias"], dtype=np.float32),
+                            version=header["version"], metadata=header["metadata"])
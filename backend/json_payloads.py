@@ -0,0 +1,47 @@
+"""
+Pre-serialized JSON payloads and conditional (ETag) responses
+Handlers that serialize (and usually cache) their own response bodies send
+them as bytes with an ETag, which is checked against If-None-Match before
+anything is built.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+JSON_MEDIA_TYPE = "application/json"
+# Clients may cache but must revalidate, which is a cheap 304 when nothing changed
+CACHE_CONTROL = "private, no-cache"
+
+
+def digest(data: bytes, size: int = 16) -> str:
+    return hashlib.blake2b(data, digest_size=size // 2).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers ``etag`` (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_bytes(body: bytes, etag: Optional[str] = None) -> Response:
+    """Response for an already-serialized JSON body"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL} if etag else None
+    return Response(body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
@@ -0,0 +1,131 @@
+"""
+Single-pass multi-keyword matcher shared by the chat helpers
+All keyword tables are compiled into one trie-shaped regex at import time, so
+classifying a word is one scan instead of one substring scan per keyword.
+Messages are split on spaces and each word-sized chunk's keywords are
+remembered, so the words a chat sees over and over cost a dict lookup each.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+Tag = Tuple[str, str]
+# A chunk's keyword tags and the keywords with spaces that may start in it
+ChunkEntry = Tuple[FrozenSet[Tag], Tuple[str, ...]]
+
+# Chunks longer than the longest keyword by more than this are scanned but not
+# cached, so the cache holds words with punctuation rather than raw user text
+CHUNK_CACHE_MARGIN = 32
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Build a regex alternation shaped like a trie (shared prefixes factored out)"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node: dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        # Prefer the longest alternative so the widest keyword at a position wins
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if terminal else body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Classifies text against named keyword groups in a single pass.
+
+    ``groups`` maps a group name to an ordered mapping of category -> keywords,
+    e.g. ``{"emotion": {"sadness": ["sad", "down"], ...}}``. Matching keeps the
+    substring semantics of ``keyword in text.lower()``: every keyword that occurs
+    anywhere in the text is reported, including keywords nested inside or
+    overlapping other keywords. Up to ``chunk_cache_size`` distinct chunks
+    (text between spaces) are cached before the cache starts over; chunks
+    longer than ``CHUNK_CACHE_MARGIN`` past the longest keyword never are,
+    which keeps the cache's memory bounded.
+    """
+
+    def __init__(self, groups: Mapping[str, Mapping[str, Sequence[str]]], chunk_cache_size: int = 50000):
+        self.groups = {name: list(categories) for name, categories in groups.items()}
+
+        tags_by_keyword: Dict[str, set] = {}
+        for group, categories in groups.items():
+            for category, keywords in categories.items():
+                for keyword in keywords:
+                    tags_by_keyword.setdefault(keyword.lower(), set()).add((group, category))
+
+        # A match of a long keyword also implies every keyword it contains
+        keywords = list(tags_by_keyword)
+        self._tags: Dict[str, FrozenSet[Tag]] = {}
+        for keyword in keywords:
+            implied = set()
+            for other in keywords:
+                if other in keyword:
+                    implied |= tags_by_keyword[other]
+            self._tags[keyword] = frozenset(implied)
+
+        # Zero-width lookahead so a match is attempted at every position and
+        # overlapping keywords are all seen in one left-to-right scan
+        self._regex = re.compile("(?=(" + _trie_pattern(keywords) + "))")
+
+        # Keywords without a space lie inside one chunk of the text split on
+        # spaces; one with a space is looked for in the whole text when a
+        # chunk ends with its first word
+        self._phrases = [(keyword.split(" ", 1)[0], keyword) for keyword in keywords if " " in keyword]
+        self._phrase_heads = tuple(head for head, _ in self._phrases)
+        self.chunk_cache_size = chunk_cache_size
+        self._cached_chunk_chars = max(map(len, keywords), default=0) + CHUNK_CACHE_MARGIN
+        self._chunks: Dict[str, Optional[ChunkEntry]] = {}
+
+    def match(self, text: str) -> FrozenSet[Tag]:
+        """Return every (group, category) whose keywords occur in ``text``"""
+        lowered = text.lower()
+        found = set()
+        chunks = self._chunks
+        for chunk in lowered.split(" "):
+            try:
+                entry = chunks[chunk]
+            except KeyError:
+                entry = self._chunk_entry(chunk)
+            if entry is not None:
+                chunk_tags, phrases = entry
+                found |= chunk_tags
+                for phrase in phrases:
+                    if phrase in lowered:
+                        found |= self._tags[phrase]
+        return frozenset(found)
+
+    def _chunk_entry(self, chunk: str) -> Optional[ChunkEntry]:
+        found = set()
+        for keyword in set(self._regex.findall(chunk)):
+            found |= self._tags[keyword]
+        phrases = ()
+        if self._phrase_heads and chunk.endswith(self._phrase_heads):
+            phrases = tuple(phrase for head, phrase in self._phrases if chunk.endswith(head))
+        entry = (frozenset(found), phrases) if found or phrases else None
+        if len(chunk) > self._cached_chunk_chars:
+            return entry
+        if len(self._chunks) >= self.chunk_cache_size:
+            self._chunks.clear()
+        self._chunks[chunk] = entry
+        return entry
+
+    def first(self, matches: FrozenSet[Tag], group: str) -> str:
+        """First category of ``group`` (in declaration order) present in ``matches``"""
+        for category in self.groups[group]:
+            if (group, category) in matches:
+                return category
+        return None
+
+    def categories(self, matches: FrozenSet[Tag], group: str) -> List[str]:
+        """All categories of ``group`` present in ``matches``, in declaration order"""
+        return [category for category in self.groups[group] if (group, category) in matches]
@@ -0,0 +1,424 @@
+"""
+Async OpenAI completion client with a bounded pool of in-flight upstream calls,
+a priority lane, retries with jittered backoff and a circuit breaker
+The OpenAI SDK is imported when the client is first used, not with this
+module: it is the single largest import in the app.
+"""
+
+import asyncio
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker, backoff_delay
+
+# HTTP statuses that mean "upstream trouble, try again later" rather than a bad request
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailableError(Exception):
+    """Base for upstream failures where the caller should answer locally instead"""
+
+
+class UpstreamBusyError(UpstreamUnavailableError):
+    """Raised when the wait queue for upstream calls is full"""
+
+
+class UpstreamTimeoutError(UpstreamUnavailableError):
+    """Raised when an upstream call (including its queue wait) exceeds the timeout"""
+
+
+class UpstreamFailedError(UpstreamUnavailableError):
+    """Raised when the upstream keeps failing (rate limit, quota, 5xx, connection) after retries"""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised without calling the upstream while the circuit breaker is open"""
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """True for errors that say the upstream is unhealthy rather than the request being wrong"""
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Delay requested by the upstream's Retry-After (or retry-after-ms) header, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class SlotPool:
+    """Upstream call slots with a priority lane.
+
+    ``slots`` are shared by every call; ``priority_slots`` more can only be
+    taken by priority calls, so one can start even when ordinary traffic
+    has every shared slot. When a slot frees up, waiting priority calls get
+    it before any ordinary call, and ordinary calls are served in arrival
+    order.
+    """
+
+    def __init__(self, slots: int, priority_slots: int = 0):
+        self.slots = slots
+        self.priority_slots = priority_slots
+        self.busy = 0
+        self._waiters: Dict[bool, deque] = {True: deque(), False: deque()}
+
+    def _free(self, priority: bool) -> bool:
+        if priority:
+            return self.busy < self.slots + self.priority_slots
+        return self.busy < self.slots and not self._waiters[True]
+
+    def locked(self, priority: bool = False) -> bool:
+        """True if a call of this kind would have to wait"""
+        return not self._free(priority) or bool(self._waiters[priority])
+
+    async def acquire(self, priority: bool = False) -> None:
+        if not self.locked(priority):
+            self.busy += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait was cancelled: give it back
+                self.release()
+            elif waiter in self._waiters[priority]:
+                self._waiters[priority].remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self.busy -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        priority_waiters, waiters = self._waiters[True], self._waiters[False]
+        while priority_waiters and self.busy < self.slots + self.priority_slots:
+            self._hand_over(priority_waiters.popleft())
+        while waiters and not priority_waiters and self.busy < self.slots:
+            self._hand_over(waiters.popleft())
+
+    def _hand_over(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():  # skip waiters cancelled since they queued
+            self.busy += 1
+            waiter.set_result(None)
+
+
+class CompletionClient:
+    """Wraps AsyncOpenAI so chat completions never block the event loop.
+
+    At most ``max_concurrency`` completions are in flight at once; further
+    callers wait in a queue of at most ``max_queue`` entries and are rejected
+    with ``UpstreamBusyError`` beyond that. Every call, including the time
+    spent queueing and retrying, is bounded by ``timeout`` seconds.
+
+    Priority calls (``complete(..., priority=True)``, used for crisis
+    messages) skip that queue: they may use ``priority_slots`` extra slots,
+    take the next free slot ahead of every ordinary caller, aren't refused
+    for a full queue and can have a shorter timeout of their own.
+
+    Rate limits, 5xx and connection errors are retried up to ``max_retries``
+    times with full-jitter backoff (or the upstream's Retry-After), as long
+    as the retry fits in the timeout. Calls that still fail count against the
+    circuit breaker; while it is open, calls fail immediately with
+    ``CircuitOpenError`` so callers can answer locally.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 16,
+        max_queue: int = 256,
+        priority_slots: int = 2,
+        timeout: float = 20.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._api_key = api_key
+        self.base_url = base_url
+        self._client = None
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.priority_slots = priority_slots
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self._slots = None
+        self._loop = None
+
+        # Queueing / backpressure counters
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_in_flight = 0
+        self.peak_queued = 0
+        self.total_calls = 0
+        self.total_completed = 0
+        self.total_timeouts = 0
+        self.total_rejected = 0
+        self.total_errors = 0
+        self.total_retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_upstream_seconds = 0.0
+        self.priority_queued = 0
+        self.total_priority_calls = 0
+        self.max_priority_wait_seconds = 0.0
+
+    @property
+    def client(self):
+        """The AsyncOpenAI client, built (and the SDK imported) on first use"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self._api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    def _pool(self) -> SlotPool:
+        # Waiters are futures bound to the loop the pool was first used on,
+        # so rebuild it if the app is being served from a new loop (e.g. test clients).
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = SlotPool(self.max_concurrency, self.priority_slots)
+            self._loop = loop
+        return self._slots
+
+    async def _acquire(self, pool: SlotPool, started: float, deadline: float, priority: bool) -> None:
+        """Take an upstream slot, queueing (bounded, unless ``priority``) if all slots are busy"""
+        if pool.locked(priority):
+            # All slots are busy: queue up, unless the queue is already full
+            if not priority and self.queued >= self.max_queue:
+                self.total_rejected += 1
+                raise UpstreamBusyError("Upstream completion queue is full")
+            if priority:
+                self.priority_queued += 1
+            else:
+                self.queued += 1
+                self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                remaining = deadline - time.perf_counter()
+                await asyncio.wait_for(pool.acquire(priority), timeout=max(remaining, 0.001))
+            except asyncio.TimeoutError:
+                self.total_timeouts += 1
+                raise UpstreamTimeoutError("Timed out waiting for an upstream slot")
+            finally:
+                if priority:
+                    self.priority_queued -= 1
+                else:
+                    self.queued -= 1
+        else:
+            await pool.acquire(priority)
+
+        waited = time.perf_counter() - started
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if priority:
+            self.max_priority_wait_seconds = max(self.max_priority_wait_seconds, waited)
+
+    def is_available(self) -> bool:
+        """False while the circuit is open, so callers can skip straight to a local answer"""
+        if self.breaker.is_open():
+            self.breaker.short_circuited += 1
+            return False
+        return True
+
+    def _check_circuit(self) -> bool:
+        """Raise CircuitOpenError if calls are being short-circuited; True if this call is the half-open probe"""
+        probing = self.breaker.state != "closed"
+        if not self.breaker.allow():
+            raise CircuitOpenError("Upstream circuit is open")
+        return probing
+
+    def _retry_delay(self, error: BaseException, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the call shouldn't be retried"""
+        if attempt >= self.max_retries or getattr(error, "code", None) == "insufficient_quota":
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        if time.perf_counter() + delay >= deadline:
+            return None
+        return delay
+
+    def _release(self, pool: SlotPool, call_started: float) -> None:
+        self.in_flight -= 1
+        self.total_upstream_seconds += time.perf_counter() - call_started
+        pool.release()
+
+    async def _start(self, pool: SlotPool, started: float, request: Callable[[], Awaitable[Any]],
+                     timeout: Optional[float] = None, priority: bool = False) -> Tuple[Any, float]:
+        """Take a slot and run ``request`` with retries, within ``timeout`` (default: the client's).
+
+        Returns the result and its start time with the slot still held; the
+        caller releases it with ``_release``.
+        """
+        deadline = started + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            await self._acquire(pool, started, deadline, priority)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            call_started = time.perf_counter()
+            holding = True
+            try:
+                result = await asyncio.wait_for(request(), timeout=max(deadline - call_started, 0.001))
+                holding = False
+                return result, call_started
+            except asyncio.TimeoutError:
+                self.total_timeouts += 1
+                if timeout is None:
+                    # A caller's shorter deadline says nothing about upstream health
+                    self.breaker.record_failure(UpstreamTimeoutError())
+                raise UpstreamTimeoutError("Upstream completion timed out")
+            except Exception as error:
+                self.total_errors += 1
+                if not is_upstream_failure(error):
+                    raise
+                delay = self._retry_delay(error, attempt, deadline)
+                if delay is None:
+                    self.breaker.record_failure(error, retry_after_seconds(error))
+                    raise UpstreamFailedError(f"Upstream completion failed: {error}") from error
+            finally:
+                if holding:
+                    self._release(pool, call_started)
+
+            self.total_retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def complete(self, messages: List[Dict[str, str]], priority: bool = False,
+                       timeout: Optional[float] = None, **params: Any) -> Optional[str]:
+        """Run one chat completion and return the message content.
+
+        ``priority`` puts the call in the priority lane; ``timeout``
+        overrides the client's bound on queueing, retries and the call.
+        """
+        self.total_calls += 1
+        if priority:
+            self.total_priority_calls += 1
+        probing = self._check_circuit()
+        pool = self._pool()
+        try:
+            response, call_started = await self._start(
+                pool, time.perf_counter(),
+                lambda: self.client.chat.completions.create(messages=messages, **params),
+                timeout, priority,
+            )
+            self._release(pool, call_started)
+            self.breaker.record_success()
+        finally:
+            if probing:
+                self.breaker.release()
+
+        self.total_completed += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+        if response.choices and response.choices[0].message.content:
+            return response.choices[0].message.content
+        return None
+
+    async def stream(self, messages: List[Dict[str, str]], **params: Any) -> AsyncIterator[str]:
+        """Run one streaming chat completion, yielding content deltas as they arrive.
+
+        The timeout bounds the queue wait plus the time to the first delta, and
+        then the gap between consecutive deltas. Only starting the stream is
+        retried; a stream that fails part-way raises ``UpstreamFailedError``.
+        """
+        self.total_calls += 1
+        probing = self._check_circuit()
+        pool = self._pool()
+        try:
+            response, call_started = await self._start(
+                pool, time.perf_counter(),
+                lambda: self.client.chat.completions.create(messages=messages, stream=True, **params),
+            )
+            try:
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except asyncio.TimeoutError:
+                self.total_timeouts += 1
+                self.breaker.record_failure(UpstreamTimeoutError())
+                raise UpstreamTimeoutError("Upstream completion stream timed out")
+            except (GeneratorExit, asyncio.CancelledError):
+                raise
+            except Exception as error:
+                self.total_errors += 1
+                if not is_upstream_failure(error):
+                    raise
+                self.breaker.record_failure(error)
+                raise UpstreamFailedError(f"Upstream completion stream failed: {error}") from error
+            else:
+                self.total_completed += 1
+                self.breaker.record_success()
+            finally:
+                self._release(pool, call_started)
+        finally:
+            if probing:
+                self.breaker.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage and queueing metrics"""
+        completed = self.total_completed or 1
+        waited = (self.total_calls - self.total_rejected) or 1
+        return {
+            "client_ready": self._client is not None,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "priority_slots": self.priority_slots,
+            "timeout_seconds": self.timeout,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_in_flight": self.peak_in_flight,
+            "peak_queued": self.peak_queued,
+            "priority_queued": self.priority_queued,
+            "total_priority_calls": self.total_priority_calls,
+            "total_calls": self.total_calls,
+            "total_completed": self.total_completed,
+            "total_timeouts": self.total_timeouts,
+            "total_rejected": self.total_rejected,
+            "total_errors": self.total_errors,
+            "total_retries": self.total_retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_wait_ms": round(self.total_wait_seconds / waited * 1000, 3),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "max_priority_wait_ms": round(self.max_priority_wait_seconds * 1000, 3),
+            "avg_upstream_ms": round(self.total_upstream_seconds / completed * 1000, 3),
+            "circuit": self.breaker.stats(),
+        }
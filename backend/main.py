@@ -3,30 +3,258 @@ Simplified AI Mental Health Assistant - FastAPI Backend
 Main application entry point with just authentication
 """
 
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Path, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+import json
+import math
+import orjson
 import logging
 import time
-import uvicorn
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
-
-# Load environment variables
-load_dotenv()
-
-# Initialize OpenAI client
-openai_api_key = os.getenv('OPENAI_API_KEY')
-if openai_api_key:
-    openai_client = OpenAI(api_key=openai_api_key)
-    print(f"OpenAI configured with API key: {openai_api_key[:15]}...")
+import uuid
+import asyncio
+import secrets
+from auth import Authenticator, SQLiteUserStore, TokenError, TokenSigner, UserExistsError, check_secret_key
+from chat_store import ChatHistory, SQLiteChatStore
+from circuit_breaker import CircuitBreaker
+from completion_cache import build_completion_cache, cache_key
+from context_builder import ContextBuilder, estimate_tokens
+from crisis_detector import CRISIS_GUIDANCE, CrisisDetector, CrisisSignal
+from emotion_engine import EMOTION_LEXICON, NEUTRAL, EmotionScorer
+from fallback_engine import FALLBACK_KEYWORDS, FALLBACK_RESPONSES, FallbackEngine, load_fallback_catalog
+from intent_classifier import NEGATIONS, load_classifier
+from json_payloads import digest, etag_matches, json_bytes, not_modified
+from keyword_matcher import KeywordMatcher
+from media_catalog import MEDIA_LIBRARY, MEDIA_TYPES, MediaCatalog, load_media_catalog
+from llm_client import CompletionClient, UpstreamUnavailableError
+from metrics import CONTENT_TYPE, MetricsMiddleware, Registry
+from profile_store import ProfileService, SQLiteProfileStore, VersionConflictError, default_profile, iso_timestamp
+from prompt_templates import PromptStats, get_prompt_template
+from rate_limit import build_rate_limiter
+from request_limits import BodySizeLimitMiddleware, BodyTooLarge
+from settings import get_settings
+from schemas import (
+    ID_PATTERN, MAX_ID_CHARS, MAX_TEXT_CHARS, AuthResponse, AvatarRequest, ChatHistoryResponse, ChatRequest,
+    ChatResponse, ChatSocketFrame, EmotionRequest, EmotionResponse, LoginRequest, MediaSearchResponse, MoodCheckIn, ProfileUpdate,
+    RefreshRequest, RegisterRequest, documented,
+)
+from stats_engine import SQLiteStatsStore, StatsEngine
+from warmup import Warmup
+from ws_sessions import (
+    CLOSE_POLICY_VIOLATION, CLOSE_TOO_BIG, CLOSE_TRY_AGAIN_LATER, ChatSession, SendTimeout, SessionRegistry,
+)
+
+# Environment and backend/.env, parsed once (settings.py)
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# OpenAI client; the SDK is imported and the HTTP client built on first use
+# (or during warm-up), not at import
+if settings.openai_api_key:
+    openai_client = CompletionClient(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url,
+        max_concurrency=settings.openai_max_concurrency,
+        max_queue=settings.openai_max_queue,
+        priority_slots=settings.openai_priority_slots,
+        timeout=settings.openai_timeout_seconds,
+        max_retries=settings.openai_max_retries,
+        backoff_base=settings.openai_retry_backoff_seconds,
+        backoff_max=settings.openai_retry_backoff_max_seconds,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.openai_circuit_failure_threshold,
+            reset_timeout=settings.openai_circuit_reset_seconds,
+        ),
+    )
 else:
     openai_client = None
-    print("Warning: OPENAI_API_KEY not found in environment variables")
+    logger.warning("OPENAI_API_KEY not set; chat replies come from the local fallback engine")
+
+# Completion cache (memory, redis or off), shared by /chat/send and /chat/stream
+completion_cache = build_completion_cache(
+    backend=settings.completion_cache_backend,
+    max_entries=settings.completion_cache_max_entries,
+    ttl=settings.completion_cache_ttl_seconds,
+    max_entry_bytes=settings.completion_cache_max_entry_bytes,
+    redis_url=settings.redis_url,
+)
+
+# Chat history: SQLite (WAL) store written behind the request path
+ANONYMOUS_USER = "anonymous"
+chat_history = ChatHistory(
+    SQLiteChatStore(settings.chat_db_path),
+    batch_size=settings.chat_write_batch_size,
+    flush_interval=settings.chat_write_flush_seconds,
+)
+
+# Per-user wellness stats, updated incrementally as messages and mood
+# check-ins are written (stats_engine.py; rebuild with backfill_stats.py)
+stats_engine = StatsEngine(
+    SQLiteStatsStore(settings.chat_db_path),
+    session_gap=settings.stats_session_gap_seconds,
+    rolling_days=settings.stats_rolling_days,
+    batch_size=settings.chat_write_batch_size,
+    flush_interval=settings.chat_write_flush_seconds,
+)
+
+# User profiles (profile_store.py): SQLite rows behind a per-worker cache of
+# serialized responses; PATCH writes only the changed columns
+profile_service = ProfileService(
+    SQLiteProfileStore(settings.chat_db_path),
+    defaults=lambda user_id: profile_defaults(user_id),  # defined with the helpers below
+    cache_ttl=settings.profile_cache_ttl_seconds,
+    cache_size=settings.profile_cache_max_entries,
+    # Ids with nothing stored have a profile only if they are accounts
+    unsaved=lambda user_id: account_profile(user_id),
+)
+
+# Prior turns sent with each completion, trimmed/summarized to a token budget
+context_builder = ContextBuilder(
+    chat_history,
+    max_turns=settings.chat_context_max_turns,
+    token_budget=settings.chat_context_token_budget,
+    summary_budget=settings.chat_context_summary_tokens,
+)
+
+# System prompt variant (built once; see prompt_templates.py)
+chat_prompt = get_prompt_template(settings.chat_prompt_version)
+prompt_stats = PromptStats()
+
+# Token authentication (auth.py). Without SECRET_KEY a per-process key is
+# generated: tokens then don't survive restarts, and workers only share it
+# when the app is preloaded before forking (serve.py's default). A placeholder
+# or short key fails startup, since anyone could forge tokens with it
+secret_key = settings.secret_key
+if secret_key:
+    check_secret_key(secret_key)
+else:
+    secret_key = secrets.token_urlsafe(32)
+    logger.warning("SECRET_KEY not set; using a random key for this process")
+authenticator = Authenticator(
+    SQLiteUserStore(settings.auth_db_path or settings.chat_db_path),
+    TokenSigner(
+        secret_key,
+        access_ttl=settings.access_token_ttl_seconds,
+        refresh_ttl=settings.refresh_token_ttl_seconds,
+    ),
+    cache_size=settings.auth_claims_cache_size,
+    hash_concurrency=settings.auth_hash_concurrency,
+)
+# With AUTH_REQUIRED unset, requests without a token are still served as
+# before (anonymous / user_id from the request); a token that is sent must be valid
+AUTH_REQUIRED = settings.auth_required
+DEMO_USER_ENABLED = settings.demo_user_enabled
+
+# Request rate limits (per user and per client IP, sliding window) and a
+# per-user upstream token budget; users over budget get local replies
+rate_limiter = build_rate_limiter(
+    backend=settings.rate_limit_backend,
+    limits={
+        "chat": (settings.rate_limit_chat_per_user, settings.rate_limit_chat_per_ip),
+        "emotion": (settings.rate_limit_emotion_per_user, settings.rate_limit_emotion_per_ip),
+    },
+    window=settings.rate_limit_window_seconds,
+    token_capacity=settings.upstream_token_budget,
+    token_refill_per_second=settings.upstream_tokens_per_minute / 60,
+    redis_url=settings.redis_url,
+)
+
+# Metrics exposed on /metrics (per worker process)
+metrics = Registry()
+request_latency = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+chat_stage_latency = metrics.histogram(
+    "chat_stage_duration_seconds", "Time spent in each stage of the chat pipeline", ("stage",))
+chat_replies = metrics.counter(
+    "chat_replies_total", "Chat replies by source (upstream, fallback, over_budget, media, crisis, error)",
+    ("source",))
+crisis_lane_latency = metrics.histogram(
+    "crisis_lane_duration_seconds", "Time from receiving a crisis-flagged message to its reply, by reply source",
+    ("source",))
+metrics.callback(
+    "upstream_tokens_total", "Tokens reported by the upstream API", type="counter", labelnames=("kind",),
+    collect=lambda: {"prompt": openai_client.prompt_tokens, "completion": openai_client.completion_tokens}
+    if openai_client else None)
+metrics.callback(
+    "prompt_tokens_estimated_total", "Estimated prompt tokens sent upstream (includes streamed replies)",
+    type="counter", labelnames=("part",),
+    collect=lambda: {"system": prompt_stats.system_tokens, "context": prompt_stats.context_tokens,
+                     "message": prompt_stats.message_tokens})
+metrics.callback("upstream_in_flight", "Upstream completions in flight",
+                 lambda: openai_client.in_flight if openai_client else None)
+metrics.callback("upstream_queued", "Completions waiting for an upstream slot",
+                 lambda: openai_client.queued if openai_client else None)
+metrics.callback("upstream_priority_queued", "Priority (crisis) completions waiting for an upstream slot",
+                 lambda: openai_client.priority_queued if openai_client else None)
+metrics.callback("upstream_circuit_open", "1 while the upstream circuit breaker is open or half-open",
+                 lambda: int(openai_client.breaker.state != "closed") if openai_client else None)
+metrics.callback(
+    "completion_cache_lookups_total", "Completion cache lookups by result", type="counter", labelnames=("result",),
+    collect=lambda: {"hit": completion_cache.hits, "miss": completion_cache.misses,
+                     "coalesced": completion_cache.coalesced} if completion_cache else None)
+metrics.callback(
+    "rate_limited_requests_total", "Requests refused by the rate limiter, by scope and key type", type="counter",
+    labelnames=("limit",), collect=lambda: dict(rate_limiter.limited) if rate_limiter else None)
+metrics.callback(
+    "profile_cache_lookups_total", "Profile cache lookups by result", type="counter", labelnames=("result",),
+    collect=lambda: {"hit": profile_service.hits, "miss": profile_service.misses})
+metrics.callback("chat_history_queued", "Chat messages waiting to be written", lambda: chat_history.stats()["queued"])
+
+# Crisis-phrase detection (crisis_detector.py), run before anything else in a
+# chat turn; flagged messages take the upstream's priority lane and fall back
+# to a local reply once CRISIS_REPLY_TIMEOUT has passed
+crisis_detector = CrisisDetector()
+CRISIS_REPLY_TIMEOUT = settings.crisis_reply_timeout_seconds
+# Recorded for flagged messages the emotion detectors read as neutral or positive ("I want to kill myself")
+CRISIS_EMOTION = "sadness"
+metrics.callback(
+    "crisis_messages_total", "Chat messages flagged by the crisis detector, by level", type="counter",
+    labelnames=("level",), collect=lambda: crisis_detector.flagged)
+
+# Largest number of texts scored in one batch-analysis pass
+EMOTION_BATCH_MAX_SIZE = settings.emotion_batch_max_size
+
+# Request bodies over these sizes are refused with 413 before being read
+MAX_REQUEST_BYTES = settings.max_request_bytes
+EMOTION_BATCH_MAX_BYTES = settings.emotion_batch_max_bytes
+
+# WebSocket chat sessions (ws_sessions.py), capped per worker process
+ws_sessions = SessionRegistry(
+    max_connections=settings.ws_max_connections,
+    heartbeat_interval=settings.ws_heartbeat_seconds,
+    send_timeout=settings.ws_send_timeout_seconds,
+)
+metrics.callback("websocket_sessions", "Open chat WebSocket sessions", lambda: len(ws_sessions.sessions))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and flush them on shutdown"""
+    await chat_history.start()
+    await stats_engine.start()
+    await authenticator.prune()
+    if DEMO_USER_ENABLED:
+        await authenticator.ensure_user("demo", "password", "demo@mindchat.com", "Demo User", "test-user-id")
+    # Served from here on; /ready waits for the warm-up
+    warmup_task = asyncio.create_task(warmup.run())
+    yield
+    warmup_task.cancel()
+    await ws_sessions.close()
+    await chat_history.close()
+    await stats_engine.close()
+    profile_service.close()
 
 # Create a simple FastAPI application
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="AI Mental Health Assistant API - Simplified",
     description="Simplified version for testing authentication",
     version="1.0.0",
@@ -34,6 +262,13 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=MAX_REQUEST_BYTES,
+    path_limits={"/api/v1/emotions/analyze/batch": EMOTION_BATCH_MAX_BYTES},
+)
+app.add_middleware(MetricsMiddleware, histogram=request_latency)
+
 # Simple CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +276,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Health check endpoint
@@ -51,434 +287,1097 @@ async def health_check():
         "status": "healthy",
         "service": "AI Mental Health Assistant API",
         "version": "1.0.0",
-        "timestamp": time.time()
+        "timestamp": time.time(),
+        "upstream": openai_client.stats() if openai_client else None,
+        "completion_cache": completion_cache.stats() if completion_cache else None,
+        "chat_history": chat_history.stats(),
+        "chat_context": context_builder.stats(),
+        "user_stats": stats_engine.stats(),
+        "profiles": profile_service.stats(),
+        "fallback": fallback_engine.stats(),
+        "media_catalog": media_catalog.stats(),
+        "intent_classifier": intent_classifier.stats() if intent_classifier else None,
+        "crisis_detector": crisis_detector.stats(),
+        "auth": authenticator.stats(),
+        "rate_limit": rate_limiter.stats() if rate_limiter else None,
+        "websocket": ws_sessions.stats(),
+        "warmup": warmup.stats(),
+        "prompt": {"version": chat_prompt.version, "fingerprint": chat_prompt.fingerprint, **prompt_stats.stats()}
     }
 
-# Simple authentication endpoints for testing
-@app.post("/api/v1/auth/login", tags=["Authentication"])
-async def login_user(credentials: dict):
-    """Simple login endpoint for testing"""
-    username = credentials.get("username")
-    password = credentials.get("password")
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """Readiness: 200 once this worker's warm-up has finished, 503 until then"""
+    return ORJSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+@app.get("/metrics", tags=["Health"])
+async def prometheus_metrics():
+    """Prometheus metrics: route latency, chat stage timings, reply sources, token usage"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+# Authentication endpoints
+BEARER_CHALLENGE = {"WWW-Authenticate": "Bearer"}
+
+async def current_user(request: Request) -> Optional[dict]:
+    """Claims of the request's bearer token; None for anonymous requests.
     
-    # Simple test credentials
-    if username == "demo" and password == "password":
-        return {
-            "success": True,
-            "message": "Login successful",
-            "data": {
-                "user": {
-                    "id": "test-user-id",
-                    "username": username,
-                    "email": "demo@mindchat.com",
-                    "name": "Demo User"
-                },
-                "access_token": "test-access-token-123",
-                "refresh_token": "test-refresh-token-456",
-                "token_type": "bearer",
-                "expires_in": 3600
-            }
-        }
-    else:
-        raise HTTPException(status_code=401, detail="Incorrect username or password")
+    An invalid or expired token is a 401, as is a missing one when
+    AUTH_REQUIRED is set. Verified tokens are cached, so this is a header
+    lookup plus a dict hit for tokens seen before.
+    """
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers=BEARER_CHALLENGE)
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Invalid authorization header", headers=BEARER_CHALLENGE)
+    try:
+        return authenticator.authenticate(token)
+    except TokenError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers=BEARER_CHALLENGE)
 
-@app.post("/api/v1/auth/register", tags=["Authentication"])
-async def register_user(user_data: dict):
-    """Simple register endpoint for testing"""
-    username = user_data.get("username")
-    email = user_data.get("email")
+SIGN_IN_REQUIRED = "Sign in or start a guest session (POST /api/v1/auth/guest) to use a user id"
+
+async def resolve_user_id(claims: Optional[dict], requested: Optional[str]) -> str:
+    """The authenticated (account or guest) user's id; another user's id is a 403.
     
-    if not username or not email:
-        raise HTTPException(status_code=400, detail="Username and email are required")
+    Without a token the caller is ``anonymous``: an id is only ever taken
+    from a token, so naming any other id without one is a 401.
+    """
+    if claims is None:
+        if requested and requested != ANONYMOUS_USER:
+            raise HTTPException(status_code=401, detail=SIGN_IN_REQUIRED, headers=BEARER_CHALLENGE)
+        return ANONYMOUS_USER
+    if requested and requested != ANONYMOUS_USER and requested != claims["sub"]:
+        raise HTTPException(status_code=403, detail="Not allowed to access another user's data")
+    return claims["sub"]
+
+async def authorize_path_user(claims: Optional[dict], user_id: str) -> None:
+    """For routes with the user id in the path, which only its token holder may
+    use: no token is a 401, another user's id (or ``anonymous``) a 403"""
+    if claims is None:
+        raise HTTPException(status_code=401, detail=SIGN_IN_REQUIRED, headers=BEARER_CHALLENGE)
+    if await resolve_user_id(claims, user_id) != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to access another user's data")
+
+def is_owner(claims: Optional[dict], user_id: str) -> bool:
+    """Whether the caller holds ``user_id``'s token"""
+    return claims is not None and claims["sub"] == user_id
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def quota_key_for(claims: Optional[dict], ip: str) -> str:
+    """Key the caller's upstream token budget is kept under"""
+    return f"user:{claims['sub']}" if claims else f"ip:{ip}"
+
+async def over_rate_limit(scope: str, claims: Optional[dict], ip: str) -> Optional[int]:
+    """Seconds to wait if this request is over the ``scope`` limits, else None
+    
+    Authenticated callers are limited per user and per IP, anonymous ones
+    per IP only (a user_id in the body is not trusted).
+    """
+    if rate_limiter:
+        retry_after = await rate_limiter.check(scope, claims["sub"] if claims else None, ip)
+        if retry_after is not None:
+            return max(math.ceil(retry_after), 1)
+    return None
+
+def too_many_requests(retry_after: int) -> HTTPException:
+    return HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": str(retry_after)})
+
+def rate_limited(scope: str):
+    """Dependency applying the ``scope`` request limits (429 with Retry-After); returns the caller's quota key"""
+    async def check_rate_limit(request: Request, claims: Optional[dict] = Depends(current_user)) -> str:
+        ip = client_ip(request)
+        retry_after = await over_rate_limit(scope, claims, ip)
+        if retry_after is not None:
+            raise too_many_requests(retry_after)
+        return quota_key_for(claims, ip)
+    return check_rate_limit
+
+async def screen_chat_message(message: str, claims: Optional[dict], ip: str):
+    """Crisis-check a chat message, then apply the chat rate limits; returns (crisis, retry_after)
     
+    The check comes first so the limits never keep crisis resources from a
+    flagged message: callers answer it anyway, with the local crisis reply
+    rather than the upstream, and refuse only unflagged messages.
+    """
+    with chat_stage_latency.time("crisis_check"):
+        crisis = crisis_detector.detect(message)
+    return crisis, await over_rate_limit("chat", claims, ip)
+
+@app.post("/api/v1/auth/login", tags=["Authentication"], responses=documented(AuthResponse))
+async def login_user(credentials: LoginRequest):
+    """Exchange username and password for an access/refresh token pair"""
+    session = await authenticator.login(credentials.username, credentials.password)
+    if session is None:
+        raise HTTPException(status_code=401, detail="Incorrect username or password")
+    return {
+        "success": True,
+        "message": "Login successful",
+        "data": session
+    }
+
+@app.post("/api/v1/auth/register", tags=["Authentication"], responses=documented(AuthResponse))
+async def register_user(user_data: RegisterRequest):
+    """Create an account and return a token pair for it"""
+    try:
+        session = await authenticator.register(user_data.username, user_data.email, user_data.name, user_data.password)
+    except UserExistsError:
+        raise HTTPException(status_code=409, detail="Username already taken")
     return {
         "success": True,
         "message": "User registered successfully",
-        "data": {
-            "user": {
-                "id": "new-user-id",
-                "username": username,
-                "email": email,
-                "name": user_data.get("name", "")
-            },
-            "access_token": "test-access-token-123",
-            "refresh_token": "test-refresh-token-456",
-            "token_type": "bearer",
-            "expires_in": 3600
-        }
+        "data": session
+    }
+
+@app.post("/api/v1/auth/guest", tags=["Authentication"], responses=documented(AuthResponse))
+async def start_guest_session():
+    """Return a token pair for a new guest id (history, profile and stats without an account)"""
+    return {
+        "success": True,
+        "message": "Guest session started",
+        "data": await authenticator.guest()
+    }
+
+@app.post("/api/v1/auth/refresh", tags=["Authentication"], responses=documented(AuthResponse))
+async def refresh_tokens(refresh_data: RefreshRequest):
+    """Rotate a refresh token into a new token pair
+    
+    Each refresh token works once; reusing a spent one revokes every token
+    issued from the same login.
+    """
+    try:
+        session = await authenticator.refresh(refresh_data.refresh_token)
+    except TokenError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers=BEARER_CHALLENGE)
+    return {
+        "success": True,
+        "message": "Token refreshed",
+        "data": session
     }
 
 # Simple chat endpoints
-@app.post("/api/v1/chat/send", tags=["Chat"])
-async def send_message(message_data: dict):
+@app.post("/api/v1/chat/send", tags=["Chat"], responses=documented(ChatResponse))
+async def send_message(message_data: ChatRequest, request: Request, claims: Optional[dict] = Depends(current_user)):
     """Send a message to the AI assistant"""
-    message = message_data.get("message", "")
+    received = time.perf_counter()
+    message = message_data.message
+    user_id = await resolve_user_id(claims, message_data.user_id)
+    ip = client_ip(request)
     
-    if not message:
-        raise HTTPException(status_code=400, detail="Message is required")
+    # Crisis messages are answered first, with resources, ahead of other traffic
+    crisis, retry_after = await screen_chat_message(message, claims, ip)
+    if retry_after is not None and not crisis:
+        raise too_many_requests(retry_after)
+    with chat_stage_latency.time("emotion"):
+        emotion = message_emotion(message, crisis)
+    user_record = record_chat_message(user_id, "user", message, emotion)
+    if crisis:
+        reply = await crisis_response(message, crisis, received, user_id, user_record["id"],
+                                      upstream=retry_after is None)
+        return {
+            "success": True,
+            "data": {**record_chat_message(user_id, "assistant", reply, emotion), "crisis": crisis.payload()}
+        }
+    
+    # Classify the message once; every keyword helper reuses the result
+    with chat_stage_latency.time("classify"):
+        matches = message_matcher.match(message)
+    
+    # Media requests are answered from the catalog
+    with chat_stage_latency.time("media_check"):
+        media_reply = check_media_request(message, matches)
+    if media_reply:
+        chat_replies.inc("media")
+        return {
+            "success": True,
+            "data": record_chat_message(user_id, "assistant", media_reply["message"], emotion, media_reply["media"])
+        }
     
     # Simple AI responses based on keywords
-    ai_response = generate_ai_response(message)
+    ai_response = await generate_ai_response(message, matches, user_id, user_record["id"], quota_key_for(claims, ip))
     
     return {
         "success": True,
-        "data": {
-            "id": "msg-123",
-            "message": ai_response,
-            "timestamp": time.time(),
-            "sender": "assistant",
-            "emotion_detected": detect_emotion(message)
-        }
+        "data": record_chat_message(user_id, "assistant", ai_response, emotion)
     }
 
-@app.get("/api/v1/chat/history", tags=["Chat"])
-async def get_chat_history():
-    """Get chat history for the user"""
+@app.post("/api/v1/chat/stream", tags=["Chat"])
+async def stream_message(message_data: ChatRequest, request: Request, claims: Optional[dict] = Depends(current_user)):
+    """Send a message to the AI assistant and stream the reply as Server-Sent Events
+    
+    Events: `emotion` (emotion_detected for the user's message), `crisis`
+    (level and resources for a crisis-flagged message), `media` (media
+    suggestion short-circuit), `delta` (a chunk of the reply) and `done` (the
+    complete message, same shape as /api/v1/chat/send data).
+    """
+    message = message_data.message
+    user_id = await resolve_user_id(claims, message_data.user_id)
+    ip = client_ip(request)
+    crisis, retry_after = await screen_chat_message(message, claims, ip)
+    if retry_after is not None and not crisis:
+        raise too_many_requests(retry_after)
+    
+    return StreamingResponse(
+        chat_event_stream(message, user_id, crisis, quota_key_for(claims, ip), upstream=retry_after is None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/v1/chat/ws")
+async def chat_websocket(websocket: WebSocket,
+                         token: Optional[str] = Query(None, max_length=2048),
+                         user_id: Optional[str] = Query(None, max_length=MAX_ID_CHARS, pattern=ID_PATTERN)):
+    """Chat over one long-lived WebSocket (browsers can't send headers, so the access token goes in `token`)
+    
+    Client frames: `{"type": "chat", "message": "...", "ref": "..."}`, `ping`,
+    `pong` (heartbeat reply) and `state`. Server frames are `{"event", "data",
+    "ref"}` with the /chat/stream events (`emotion`, `crisis`, `media`, `delta`, `done`)
+    plus `ready`, `ping`, `pong`, `state` and `error`. Turns on one connection
+    run one at a time; frames sent meanwhile wait in the socket.
+    """
+    claims = None
+    try:
+        if token:
+            claims = authenticator.authenticate(token)
+        elif AUTH_REQUIRED:
+            raise TokenError("Not authenticated")
+        user_id = await resolve_user_id(claims, user_id)
+    except (TokenError, HTTPException) as e:
+        await websocket.close(CLOSE_POLICY_VIOLATION, getattr(e, "detail", None) or str(e))
+        return
+    
+    ip = websocket.client.host if websocket.client else "unknown"
+    session = ChatSession(websocket, user_id, claims, quota_key_for(claims, ip), ip,
+                          recent_turns=context_builder.window, send_timeout=ws_sessions.send_timeout)
+    try:
+        await websocket.accept()
+    except (OSError, RuntimeError):
+        # Client gave up during the handshake
+        return
+    if not ws_sessions.add(session):
+        await session.close(CLOSE_TRY_AGAIN_LATER, "Too many connections")
+        return
+    try:
+        await session.send("ready", {"user_id": user_id, "heartbeat": ws_sessions.heartbeat_interval})
+        while True:
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                break
+            session.touch()
+            text = received.get("text") or (received.get("bytes") or b"").decode("utf-8", "replace")
+            if len(text) > MAX_REQUEST_BYTES:
+                await session.close(CLOSE_TOO_BIG, "Frame too large")
+                break
+            try:
+                frame = ChatSocketFrame.model_validate_json(text)
+            except ValidationError as e:
+                await session.send("error", {"status": 422, "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            
+            if frame.type == "ping":
+                await session.send("pong", None, frame.ref)
+            elif frame.type == "state":
+                await session.send("state", {"user_id": user_id, "turns": session.turns, "emotion": session.emotion,
+                                             "emotions": dict(session.emotions)}, frame.ref)
+            elif frame.type == "chat":
+                if not frame.message.strip():
+                    await session.send("error", {"status": 422, "detail": "Empty message"}, frame.ref)
+                    continue
+                crisis, retry_after = await screen_chat_message(frame.message, claims, ip)
+                if retry_after is not None and not crisis:
+                    await session.send("error", {"status": 429, "detail": "Too many requests",
+                                                 "retry_after": retry_after}, frame.ref)
+                    continue
+                session.busy = True
+                try:
+                    async for event, data in chat_events(frame.message, user_id, crisis, session.quota_key, session,
+                                                         upstream=retry_after is None):
+                        await session.send(event, data, frame.ref)
+                finally:
+                    session.busy = False
+                    session.turns += 1
+    except WebSocketDisconnect:
+        pass
+    except SendTimeout:
+        ws_sessions.slow_clients += 1
+        await session.close(CLOSE_TRY_AGAIN_LATER, "Client too slow")
+    finally:
+        ws_sessions.remove(session)
+
+@app.get("/api/v1/chat/history", tags=["Chat"], responses=documented(ChatHistoryResponse))
+async def get_chat_history(
+    user_id: Optional[str] = Query(None, max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+    cursor: Optional[str] = Query(None, max_length=128),
+    limit: int = Query(50, ge=1, le=200),
+    claims: Optional[dict] = Depends(current_user)
+):
+    """Get chat history for the token's user, newest first
+    
+    Pass the returned `next_cursor` as `cursor` to fetch the next (older) page.
+    Needs a bearer token (account or guest); `user_id`, if given, must match it.
+    Anonymous chats aren't stored, so there is no history without one.
+    """
+    if claims is None:
+        raise HTTPException(status_code=401, detail=SIGN_IN_REQUIRED, headers=BEARER_CHALLENGE)
+    user_id = await resolve_user_id(claims, user_id)
+    try:
+        page = await chat_history.history(user_id, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     return {
         "success": True,
-        "data": {
-            "messages": [],
-            "total": 0
-        }
+        "data": page
     }
 
 # Simple emotion detection endpoint
-@app.post("/api/v1/emotions/analyze", tags=["Emotions"])
-async def analyze_emotion(emotion_data: dict):
+@app.post("/api/v1/emotions/analyze", tags=["Emotions"], responses=documented(EmotionResponse),
+          dependencies=[Depends(rate_limited("emotion"))])
+async def analyze_emotion(emotion_data: EmotionRequest):
     """Analyze emotion from text"""
-    text = emotion_data.get("text", "")
+    text = emotion_data.text
     
-    emotion = detect_emotion(text)
+    analysis = analyze_emotions([text])[0]
     
     return {
         "success": True,
         "data": {
-            "emotion": emotion,
-            "confidence": 0.85,
+            "emotion": analysis["emotion"],
+            "confidence": analysis["confidence"],
+            "emotions": analysis["emotions"],
             "text": text
         }
     }
 
+@app.post("/api/v1/emotions/analyze/batch", tags=["Emotions"], dependencies=[Depends(rate_limited("emotion"))])
+async def analyze_emotion_batch(request: Request):
+    """Analyze emotions for many texts in one request
+    
+    Accepts `{"texts": [...]}` (at most EMOTION_BATCH_MAX_SIZE texts) or, with
+    Content-Type `application/x-ndjson`, one text or `{"text": ...}` object per
+    line, streamed in and scored in chunks of EMOTION_BATCH_MAX_SIZE, each
+    chunk's results sent as soon as it is scored. Results are NDJSON, one
+    line per input, each tagged with its `index` and `success`; invalid
+    items report an `error` without failing the rest of the batch. A
+    streamed body over the size limit ends the results with an error line
+    without an `index`.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        return RequestStreamingResponse(emotion_batch_ndjson_results(request), media_type="application/x-ndjson")
+    
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    
+    texts = body.get("texts") if isinstance(body, dict) else None
+    if not isinstance(texts, list):
+        raise HTTPException(status_code=400, detail="texts must be a list")
+    
+    if len(texts) > EMOTION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(texts)} texts (max {EMOTION_BATCH_MAX_SIZE})"
+        )
+    
+    async def results():
+        yield await run_in_threadpool(analyze_emotion_chunk, list(enumerate(texts)))
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+# Media catalog endpoints
+@app.get("/api/v1/media/search", tags=["Media"], responses=documented(MediaSearchResponse))
+async def search_media(
+    q: str = Query("", max_length=200),
+    category: Optional[str] = Query(None, max_length=32),
+    media_type: Optional[str] = Query(None, alias="type", pattern="^(" + "|".join(MEDIA_TYPES) + ")$"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Search the media catalog: items sharing the most terms with `q` first (all items when `q` is empty), filtered by category and type"""
+    positions, total = media_catalog.search(q, category, media_type, limit)
+    return json_bytes(b'{"success":true,"data":{"total":%d,"items":%b}}' % (total, media_catalog.items_json(positions)))
+
+@app.get("/api/v1/media/{item_id}", tags=["Media"])
+async def get_media_item(item_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN)):
+    """Get one media item (e.g. one suggested in a chat reply)"""
+    position = media_catalog.positions.get(item_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Media item not found")
+    return json_bytes(b'{"success":true,"data":{"item":%b}}' % media_catalog.item_json[position])
+
 # User Profile Management endpoints
 @app.get("/api/v1/profile/{user_id}", tags=["Profile"])
-async def get_user_profile(user_id: str):
-    """Get user profile information"""
-    # In a real app, fetch from database
-    return {
-        "success": True,
-        "data": {
-            "user": {
-                "id": user_id,
-                "username": "demo",
-                "email": "demo@mindchat.com",
-                "name": "Demo User",
-                "bio": "Mental wellness enthusiast",
-                "avatar": "https://api.dicebear.com/7.x/avataaars/svg?seed=" + user_id,
-                "location": "San Francisco, CA",
-                "birthday": "1990-01-01",
-                "occupation": "Software Developer",
-                "phone": "+1 (555) 123-4567",
-                "preferences": {
-                    "theme": "dark",
-                    "language": "en",
-                    "timezone": "America/Los_Angeles",
-                    "notifications": {
-                        "email": True,
-                        "push": True,
-                        "sms": False,
-                        "weekly_summary": True
-                    }
-                },
-                "privacy": {
-                    "profile_visibility": "public",
-                    "show_online_status": True,
-                    "allow_messages": True
-                },
-                "created_at": "2024-01-01T00:00:00Z",
-                "last_login": "2024-09-17T10:00:00Z"
-            }
-        }
-    }
+async def get_user_profile(request: Request, user_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+                           claims: Optional[dict] = Depends(current_user)):
+    """Get user profile information (supports If-None-Match; 304 when unchanged)
+    
+    The whole profile needs the owner's token. Anyone else gets the public
+    fields (no email, phone, birthday, preferences or privacy settings),
+    or a 403 unless privacy.profile_visibility is "public". Ids that
+    are neither accounts nor have saved a profile are a 404.
+    """
+    profile = await profile_service.get(user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if is_owner(claims, user_id):
+        body, etag = profile.body, profile.etag
+    elif profile.public:
+        body, etag = profile.public_body, profile.public_etag
+    else:
+        raise HTTPException(status_code=403, detail="This profile is private")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_bytes(body, etag)
 
-@app.put("/api/v1/profile/{user_id}", tags=["Profile"])
-async def update_user_profile(user_id: str, profile_data: dict):
-    """Update user profile information"""
-    # In a real app, validate and save to database
-    return {
-        "success": True,
-        "message": "Profile updated successfully",
-        "data": {
-            "user": {
-                "id": user_id,
-                **profile_data
-            }
-        }
-    }
+@app.patch("/api/v1/profile/{user_id}", tags=["Profile"])
+async def update_user_profile(profile_data: ProfileUpdate,
+                              user_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+                              claims: Optional[dict] = Depends(current_user)):
+    """Update the fields sent (nested preferences are merged); with `version`, 409 if the profile has changed since"""
+    await authorize_path_user(claims, user_id)
+    changes = profile_data.model_dump(exclude_unset=True, exclude_none=True)
+    version = changes.pop("version", None)
+    try:
+        profile = await profile_service.update(user_id, changes, version)
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Profile has changed since version {version} (now {e.current['version']}); reload and retry",
+        )
+    return json_bytes(profile.body, profile.etag)
+
+@app.put("/api/v1/profile/{user_id}", tags=["Profile"], deprecated=True)
+async def replace_user_profile(profile_data: ProfileUpdate,
+                               user_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+                               claims: Optional[dict] = Depends(current_user)):
+    """Same as PATCH (only the fields sent are applied); kept for older clients"""
+    return await update_user_profile(profile_data, user_id, claims)
 
 @app.post("/api/v1/profile/{user_id}/avatar", tags=["Profile"])
-async def update_user_avatar(user_id: str, avatar_data: dict):
+async def update_user_avatar(avatar_data: AvatarRequest,
+                             user_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+                             claims: Optional[dict] = Depends(current_user)):
     """Update user avatar"""
-    avatar_url = avatar_data.get("avatar_url", "")
-    
-    # In a real app, handle file upload or validate URL
+    await authorize_path_user(claims, user_id)
+    avatar_url = avatar_data.avatar_url or f"{DEMO_AVATAR_URL}{user_id}&background=random"
+    await profile_service.update(user_id, {"avatar": avatar_url})
     return {
         "success": True,
         "message": "Avatar updated successfully",
         "data": {
-            "avatar_url": avatar_url or f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}&background=random"
+            "avatar_url": avatar_url
         }
     }
 
 @app.get("/api/v1/profile/{user_id}/stats", tags=["Profile"])
-async def get_user_stats(user_id: str):
-    """Get user wellness statistics"""
+async def get_user_stats(request: Request, user_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+                         claims: Optional[dict] = Depends(current_user)):
+    """Get user wellness statistics (supports If-None-Match; 304 when unchanged)"""
+    await authorize_path_user(claims, user_id)
+    stats = await stats_engine.get(user_id)
+    body = orjson.dumps({"success": True, "data": {"stats": stats}})
+    etag = f'"stats-{digest(body)}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_bytes(body, etag)
+
+@app.post("/api/v1/profile/{user_id}/moods", tags=["Profile"])
+async def record_mood(checkin: MoodCheckIn,
+                      user_id: str = Path(max_length=MAX_ID_CHARS, pattern=ID_PATTERN),
+                      claims: Optional[dict] = Depends(current_user)):
+    """Record a mood check-in (1-10) for the user's stats"""
+    await authorize_path_user(claims, user_id)
+    timestamp = time.time()
+    stats_engine.record_mood(user_id, checkin.mood, checkin.notes, timestamp)
     return {
         "success": True,
-        "data": {
-            "stats": {
-                "total_sessions": 45,
-                "streak_days": 7,
-                "total_minutes": 1250,
-                "mood_average": 7.2,
-                "favorite_activity": "Breathing Exercises",
-                "achievements": [
-                    "First Session Complete",
-                    "7-Day Streak",
-                    "Meditation Master",
-                    "Mood Tracker Pro"
-                ],
-                "recent_moods": [
-                    {"date": "2024-09-17", "mood": 8, "notes": "Feeling great!"},
-                    {"date": "2024-09-16", "mood": 7, "notes": "Good day overall"},
-                    {"date": "2024-09-15", "mood": 6, "notes": "Average day"}
-                ]
-            }
-        }
+        "message": "Mood recorded",
+        "data": {"mood": checkin.mood, "notes": checkin.notes, "timestamp": timestamp}
     }
 
 # Helper functions
-def check_media_request(message: str) -> str:
-    """Check if user is requesting media content and return appropriate response with media suggestion"""
-    message_lower = message.lower()
-    
-    # Media keywords for detection
-    media_keywords = {
-        'relaxation': ['relax', 'relaxing', 'calm', 'peaceful', 'stress relief', 'unwind'],
-        'meditation': ['meditate', 'meditation', 'mindfulness', 'breathing', 'center'],
-        'nature': ['nature', 'forest', 'ocean', 'rain', 'birds', 'water', 'natural'],
-        'music': ['music', 'song', 'play music', 'melody', 'tune'],
-        'video': ['video', 'watch', 'show me', 'play video'],
-        'audio': ['audio', 'sound', 'listen', 'hear'],
-        'therapy': ['anxiety', 'depression', 'sleep', 'insomnia', 'therapy', 'therapeutic']
-    }
+
+# Profile of a user who hasn't saved one: their account details if they
+# have an account, and a generated avatar
+DEMO_AVATAR_URL = "https://api.dicebear.com/7.x/avataaars/svg?seed="
+
+def account_profile(user_id: str) -> Optional[dict]:
+    """Unsaved (version 0) profile of the account ``user_id``, or None if it isn't one; called from the thread pool"""
+    user = authenticator.store.get_user_by_id(user_id)
+    if user is None:
+        return None
+    return default_profile(user_id, username=user["username"], email=user["email"], name=user["name"],
+                           avatar=DEMO_AVATAR_URL + user_id, created_at=iso_timestamp(user["created_at"]))
+
+def profile_defaults(user_id: str) -> dict:
+    """What a first profile update starts from: the account's profile, or a guest's"""
+    return account_profile(user_id) or default_profile(user_id, username=user_id, avatar=DEMO_AVATAR_URL + user_id)
+
+# Word-level emotion scores for every emotion at once; negations (and other
+# cues, see detect_emotion) hand a text to the classifier
+emotion_scorer = EmotionScorer(EMOTION_LEXICON, cue_words=NEGATIONS)
+
+# Keyword tables - within each table, earlier categories take precedence
+MEDIA_KEYWORDS = {
+    'relaxation': ['relax', 'relaxing', 'calm', 'peaceful', 'stress relief', 'unwind'],
+    'meditation': ['meditate', 'meditation', 'mindfulness', 'breathing', 'center'],
+    'nature': ['nature', 'forest', 'ocean', 'rain', 'birds', 'water', 'natural'],
+    'music': ['music', 'song', 'play music', 'melody', 'tune'],
+    'video': ['video', 'watch', 'show me', 'play video'],
+    'audio': ['audio', 'sound', 'listen', 'hear'],
+    'therapy': ['anxiety', 'depression', 'sleep', 'insomnia', 'therapy', 'therapeutic']
+}
+
+MEDIA_VERBS = ['play', 'show', 'listen', 'watch', 'start']
+
+# Local replies for when the LLM is unavailable; FALLBACK_CATALOG_PATH
+# swaps the built-in table for a (larger) JSON catalog
+fallback_options = {"seed": settings.fallback_seed}
+if settings.fallback_catalog_path:
+    fallback_engine = load_fallback_catalog(settings.fallback_catalog_path, **fallback_options)
+else:
+    fallback_engine = FallbackEngine(FALLBACK_KEYWORDS, FALLBACK_RESPONSES, **fallback_options)
+
+# Hashed n-gram classifier (intent_classifier.py, trained by train_classifier.py)
+# for fallback intents and chat emotions; the keyword tables answer when it
+# isn't confident or the model can't be loaded
+intent_classifier = None
+if settings.intent_classifier_enabled:
+    try:
+        intent_classifier = load_classifier(settings.intent_model_path)
+    except (OSError, ValueError) as e:
+        logger.warning("Intent classifier unavailable (%s); using keyword tables", e)
+INTENT_MIN_CONFIDENCE = settings.intent_min_confidence
+classifier_decisions = metrics.counter(
+    "classifier_decisions_total", "Intent/emotion decisions by head and source (model or keywords)",
+    ("head", "source"))
+
+# Compiled once; classifies a message against the media and fallback tables in one pass
+message_matcher = KeywordMatcher({
+    'media': MEDIA_KEYWORDS,
+    'media_verb': {'verb': MEDIA_VERBS},
+    'fallback': fallback_engine.keywords
+})
+
+# Media items suggested in chat and served by /api/v1/media/search, indexed
+# once at startup; MEDIA_CATALOG_PATH swaps in a JSON catalog
+if settings.media_catalog_path:
+    media_catalog = load_media_catalog(settings.media_catalog_path)
+else:
+    media_catalog = MediaCatalog(MEDIA_LIBRARY)
+MEDIA_SUGGESTION_LIMIT = settings.media_suggestion_limit
+
+MEDIA_RESPONSES = {
+    'relaxation': "Of course! I have some wonderful relaxing content that might help you unwind. Let me suggest something perfect for you! 🎵",
+    'meditation': "That's a great idea! Meditation can be so helpful. I have some guided meditation content that you might enjoy. Let me share something calming with you! 🧘‍♀️",
+    'nature': "Nature sounds are so soothing! I have some beautiful nature content that can help you feel more connected and peaceful. Let me play something for you! 🌿",
+    'music': "Music is such a wonderful way to lift your spirits! I have some lovely, calming music that might be just what you need. Let me play something for you! 🎶",
+    'therapy': "I understand you're looking for something therapeutic. I have some specially selected content designed to help with relaxation and wellness. Let me suggest something that might help! 💙",
+}
+
+def check_media_request(message: str, matches=None) -> Optional[dict]:
+    """Check if user is requesting media content; returns the reply text and ranked catalog items, or None"""
+    if matches is None:
+        matches = message_matcher.match(message)
     
     # Check for media request verbs
-    media_verbs = ['play', 'show', 'listen', 'watch', 'start']
-    has_media_verb = any(verb in message_lower for verb in media_verbs)
+    has_media_verb = ('media_verb', 'verb') in matches
     
-    # Detect category
+    # Detect category (type keywords don't count as a category)
     detected_category = None
-    for category, keywords in media_keywords.items():
-        if category in ['video', 'audio']:  # Skip type keywords for category detection
-            continue
-        if any(keyword in message_lower for keyword in keywords):
+    for category in message_matcher.categories(matches, 'media'):
+        if category not in ['video', 'audio']:
             detected_category = category
             break
     
     # Detect type preference
-    wants_video = any(keyword in message_lower for keyword in media_keywords['video'])
-    wants_audio = any(keyword in message_lower for keyword in (media_keywords['audio'] + media_keywords['music']))
+    wants_video = ('media', 'video') in matches
+    wants_audio = ('media', 'audio') in matches or ('media', 'music') in matches
     
     # If it's a clear media request
     if has_media_verb or detected_category or wants_video or wants_audio:
-        # Return a response with media suggestion signal
         media_type = 'video' if wants_video else ('audio' if wants_audio else 'any')
+        category = detected_category or 'relaxation'
         
-        responses = {
-            'relaxation': f"Of course! I have some wonderful relaxing content that might help you unwind. Let me suggest something perfect for you! 🎵",
-            'meditation': f"That's a great idea! Meditation can be so helpful. I have some guided meditation content that you might enjoy. Let me share something calming with you! 🧘‍♀️",
-            'nature': f"Nature sounds are so soothing! I have some beautiful nature content that can help you feel more connected and peaceful. Let me play something for you! 🌿",
-            'music': f"Music is such a wonderful way to lift your spirits! I have some lovely, calming music that might be just what you need. Let me play something for you! 🎶",
-            'therapy': f"I understand you're looking for something therapeutic. I have some specially selected content designed to help with relaxation and wellness. Let me suggest something that might help! 💙",
-        }
-        
-        if detected_category and detected_category in responses:
-            base_response = responses[detected_category]
+        if detected_category and detected_category in MEDIA_RESPONSES:
+            base_response = MEDIA_RESPONSES[detected_category]
         else:
             base_response = "I'd love to help you with some wellness content! Let me suggest something that might be perfect for how you're feeling right now! ✨"
         
-        # Add media suggestion signal for frontend
-        return f"MEDIA_SUGGESTION:{detected_category or 'relaxation'}:{media_type}:{base_response}"
+        items = media_catalog.suggest(message, category, None if media_type == 'any' else media_type,
+                                      limit=MEDIA_SUGGESTION_LIMIT)
+        return {"message": base_response, "media": {"category": category, "type": media_type, "items": items}}
     
     return None  # No media request detected
 
-def generate_ai_response(message: str) -> str:
-    """Generate AI response using Google's Generative AI with warm personality and media suggestions"""
+# Completion parameters; part of the cache key along with the prompt version
+CHAT_COMPLETION_PARAMS = {"model": "gpt-4o-mini", "max_tokens": 200, "temperature": 0.7}
+def chat_cache_key(message: str) -> str:
+    """Completion cache key for a chat message"""
+    return cache_key(message, prompt=chat_prompt.version, **CHAT_COMPLETION_PARAMS)
+
+async def cached_completion(message: str, context: list, quota_key: Optional[str] = None) -> str:
+    """Completion for the message, served from the cache when possible
+    
+    Only conversation openers (no prior context) are cached; a reply that
+    depends on earlier turns can't be shared between conversations. Only
+    replies that actually went upstream are charged to ``quota_key``.
+    """
+    async def compute():
+        messages = build_chat_messages(message, context)
+        content = await openai_client.complete(messages, **CHAT_COMPLETION_PARAMS)
+        await charge_upstream_tokens(quota_key, messages, content)
+        return content
+    
+    if not completion_cache or context:
+        return await compute()
+    return await completion_cache.get_or_compute(chat_cache_key(message), compute)
+
+async def conversation_context(user_id: Optional[str], message_id: Optional[str],
+                               session: Optional[ChatSession] = None) -> list:
+    """Prior turns for the user's next completion (none for anonymous chats, which aren't stored)"""
+    if not user_id or user_id == ANONYMOUS_USER:
+        return []
+    if session is not None:
+        return context_builder.assemble(user_id, [m for m in reversed(session.recent) if m["id"] != message_id])
+    return await context_builder.build(user_id, exclude_id=message_id)
+
+async def within_token_budget(quota_key: Optional[str]) -> bool:
+    """False (and counted as an over_budget reply) once the caller's upstream token budget is spent"""
+    if not rate_limiter or not quota_key or await rate_limiter.has_token_budget(quota_key):
+        return True
+    chat_replies.inc("over_budget")
+    return False
+
+async def charge_upstream_tokens(quota_key: Optional[str], messages: list, reply: Optional[str]) -> None:
+    """Charge the estimated prompt and reply tokens of one upstream call to the caller's budget"""
+    if rate_limiter and quota_key:
+        tokens = sum(estimate_tokens(m["content"]) for m in messages) + estimate_tokens(reply or "")
+        await rate_limiter.charge_tokens(quota_key, tokens)
+
+def build_chat_messages(message: str, context: Optional[list] = None) -> list:
+    """Build the messages sent to the completion API and record their token counts"""
+    with chat_stage_latency.time("prompt"):
+        messages = chat_prompt.render(message, context)
+        report = prompt_stats.record(chat_prompt, messages)
+    logger.debug("Prompt tokens (%s): %s", chat_prompt.version, report)
+    return messages
+
+async def crisis_response(message: str, crisis, received: float, user_id: Optional[str] = None,
+                          message_id: Optional[str] = None, session: Optional[ChatSession] = None,
+                          upstream: bool = True) -> str:
+    """Reply to a crisis-flagged message within CRISIS_REPLY_TIMEOUT of ``received``
+    
+    The upstream is asked through its priority lane (ahead of queued chat
+    traffic, not charged to the token budget, never cached); if it is
+    unconfigured, down or can't answer in time, or ``upstream`` is off
+    (the caller is over the rate limits), the reply is local.
+    """
+    reply = None
+    source = "local"
+    if upstream and openai_client and openai_client.is_available():
+        try:
+            with chat_stage_latency.time("context"):
+                context = await conversation_context(user_id, message_id, session)
+            messages = build_chat_messages(message, context)
+            messages.insert(-1, CRISIS_GUIDANCE)
+            remaining = CRISIS_REPLY_TIMEOUT - (time.perf_counter() - received)
+            reply = await openai_client.complete(messages, priority=True, timeout=max(remaining, 0.001),
+                                                 **CHAT_COMPLETION_PARAMS)
+            source = "upstream"
+        except UpstreamUnavailableError as upstream_error:
+            logger.warning("OpenAI unavailable for a crisis reply: %s", upstream_error)
+        except Exception:
+            logger.exception("OpenAI API error")
+    if not reply:
+        reply = crisis_detector.reply(crisis, message)
+        source = "local"
+    chat_replies.inc("crisis")
+    crisis_lane_latency.observe(time.perf_counter() - received, source)
+    return reply.strip()
+
+async def generate_ai_response(message: str, matches=None, user_id: Optional[str] = None,
+                               message_id: Optional[str] = None, quota_key: Optional[str] = None) -> str:
+    """Generate AI response using Google's Generative AI with warm personality (media requests are answered before this)"""
     try:
-        # Check for media requests first
-        media_response = check_media_request(message)
-        if media_response:
-            return media_response
-        
-        # Enhanced system prompt for more human-like, contextual responses
-        system_prompt = f"""
-You are Alex, a warm and genuinely caring mental health companion. You're not just an AI - you're like talking to your most understanding friend who happens to be really good at helping people feel better.
-
-Core Personality (BE VERY HUMAN):
-• Talk like a real person - use "I think," "you know," "honestly," "I've noticed," etc.
-• Be conversational and natural - avoid formal or clinical language
-• Show genuine curiosity about the person and remember context from the conversation
-• Use contractions (I'm, you're, don't, can't) and casual language
-• Be empathetic but not overly dramatic - respond like a good friend would
-• Vary your responses - don't use the same phrases repeatedly
-• Sometimes share brief, relatable thoughts or gentle insights
-
-Response Style Guidelines:
-• For greetings: Be warm but not overly enthusiastic - "Hey! Good to see you. How's your day going?"
-• For emotional sharing: Acknowledge first, then explore - "That sounds really tough. Want to tell me more about what happened?"
-• For requests like jokes: Be natural and engaging - "Oh, I love a good joke request! Here's one that always makes me smile..."
-• For casual chat: Match their energy and be genuinely interested
-• Keep responses 1-3 sentences unless they need more support
-• Ask follow-up questions that show you're really listening
-
-IMPORTANT Context Awareness:
-• If someone asks for a joke, give them an actual good joke and maybe ask what kind of humor they like
-• If they want "something funny," share something genuinely amusing and relatable
-• If they seem down, be gentle and understanding without being preachy
-• If they're casual/chatty, match that energy
-• Remember what they've shared and reference it naturally
-
-Current conversation context: The user just asked: "{message}"
-
-Respond as Alex would - naturally, warmly, and with genuine interest in helping them feel good.
-"""
+        if matches is None:
+            matches = message_matcher.match(message)
         
-        # Use OpenAI API
-        if openai_client:
+        # Use OpenAI API, unless the circuit breaker says it's down or the
+        # user has spent their token budget
+        if openai_client and openai_client.is_available():
+            if not await within_token_budget(quota_key):
+                return generate_fallback_response(message, matches, user_id)
             try:
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": message}
-                    ],
-                    max_tokens=200,
-                    temperature=0.7
-                )
+                with chat_stage_latency.time("context"):
+                    context = await conversation_context(user_id, message_id)
+                with chat_stage_latency.time("upstream"):
+                    content = await cached_completion(message, context, quota_key)
                 
-                if response.choices and response.choices[0].message.content:
-                    return response.choices[0].message.content.strip()
+                chat_replies.inc("upstream")
+                if content:
+                    return content.strip()
                 else:
                     return "I'm here for you! Sometimes I get a bit tongue-tied, but I'm always ready to chat. What's on your mind today? 😊"
-            except Exception as api_error:
-                print(f"OpenAI API error: {api_error}")
-                if "insufficient_quota" in str(api_error) or "429" in str(api_error):
-                    # Use fallback response system when quota exceeded
-                    return generate_fallback_response(message)
-                else:
-                    return "I'm having a little trouble with my words right now, but I'm still here for you! 💕 What's going on with you today?"
+            except UpstreamUnavailableError as upstream_error:
+                # Saturated, slow, rate-limited or down - answer locally instead of waiting
+                logger.warning("OpenAI unavailable: %s", upstream_error)
+                chat_replies.inc("fallback")
+                return generate_fallback_response(message, matches, user_id)
+            except Exception:
+                logger.exception("OpenAI API error")
+                chat_replies.inc("error")
+                return "I'm having a little trouble with my words right now, but I'm still here for you! 💕 What's going on with you today?"
         else:
             # Fallback to intelligent pattern-based responses
-            return generate_fallback_response(message)
+            chat_replies.inc("fallback")
+            return generate_fallback_response(message, matches, user_id)
             
-    except Exception as e:
-        print(f"Error generating AI response: {e}")
+    except Exception:
+        logger.exception("Error generating AI response")
+        chat_replies.inc("error")
         # Fallback response with warm personality
         return "I'm having a little trouble with my words right now, but I'm still here for you! 💕 Sometimes technology gets a bit wonky, you know? But hey, that just makes me more human, right? What's going on with you today?"
 
-def generate_fallback_response(message: str) -> str:
-    """Fallback response generator with natural, human-like personality"""
-    text = message.lower()
-    
-    # Greetings
-    if any(k in text for k in ["hi", "hello", "hey", "good morning", "good afternoon"]):
-        greetings = [
-            "Hey there! Good to see you. How's your day treating you so far?",
-            "Hi! I'm glad you're here. What's on your mind today?",
-            "Hello! Nice to see you again. How are things going?"
-        ]
-        import random
-        return random.choice(greetings)
-    
-    # Joke requests
-    if any(k in text for k in ["joke", "funny", "laugh", "humor", "something funny"]):
-        jokes = [
-            "Oh, I love this! Here's one for you: Why don't scientists trust atoms? Because they make up everything! 😄 What kind of jokes do you usually like?",
-            "Alright, here's a good one: I told my wife she was drawing her eyebrows too high. She looked surprised! 😂 Want another one?",
-            "Here's something that always makes me chuckle: Why did the scarecrow win an award? He was outstanding in his field! 🌾 Do you like puns or prefer other kinds of humor?"
-        ]
-        import random
-        return random.choice(jokes)
-    
-    # Anxiety/stress
-    if any(k in text for k in ["anxious", "anxiety", "worried", "panic", "stressed", "overwhelming"]):
-        responses = [
-            "That sounds really tough right now. I'm here with you. Want to try some slow breathing together, or would you rather talk about what's weighing on you?",
-            "I can hear that you're going through something difficult. Sometimes when I feel overwhelmed, taking things one small step at a time helps. What feels most urgent right now?",
-            "That sounds like a lot to carry. You know what? Just taking a moment to reach out shows real strength. What's been the hardest part of today?"
-        ]
-        import random
-        return random.choice(responses)
-    
-    # Sadness
-    if any(k in text for k in ["sad", "down", "depressed", "heartbroken", "upset", "crying"]):
-        responses = [
-            "I'm really sorry you're hurting right now. That sounds genuinely hard. Do you want to tell me what's been going on?",
-            "That sounds painful, and I'm glad you felt comfortable sharing that with me. Sometimes it helps just to have someone listen. What's been the toughest part?",
-            "I hear you, and what you're feeling makes complete sense. You don't have to go through this alone. Want to talk about what happened?"
-        ]
-        import random
-        return random.choice(responses)
-    
-    # Anger/frustration
-    if any(k in text for k in ["angry", "mad", "furious", "frustrated", "annoyed"]):
-        responses = [
-            "That sounds incredibly frustrating. I can understand why you'd feel that way. Want to tell me what happened?",
-            "Wow, that would upset me too. It sounds like something really got to you today. What's been going on?",
-            "I hear the frustration in what you're saying, and honestly, it sounds justified. Do you want to vent about it?"
-        ]
-        import random
-        return random.choice(responses)
-    
-    # Happy/positive
-    if any(k in text for k in ["happy", "excited", "good news", "great", "amazing", "wonderful"]):
-        responses = [
-            "That's fantastic! I love hearing good news. What's got you feeling so positive today?",
-            "Oh wow, that sounds wonderful! I'm genuinely happy for you. Tell me more about what's going well!",
-            "That's so great to hear! Your excitement is contagious. What made this such a good moment for you?"
-        ]
-        import random
-        return random.choice(responses)
-    
-    # Default responses
-    defaults = [
-        "I'm here and really listening. What's going on with you today?",
-        "You know, I'm genuinely curious about what's on your mind. Want to share what you're thinking about?",
-        "I'm glad you're here. Tell me what's happening in your world right now.",
-        "Hey, I'm here for whatever you want to talk about. What's been on your mind lately?"
-    ]
-    import random
-    return random.choice(defaults)
+def analyze_emotion_chunk(items: list) -> str:
+    """Score a chunk of (index, item) pairs in one pass and return their NDJSON result lines"""
+    results = {}
+    valid = []
+    for index, item in items:
+        text = item.get("text") if isinstance(item, dict) else item
+        if isinstance(item, Exception):
+            results[index] = {"index": index, "success": False, "error": f"Invalid JSON: {item}"}
+        elif not isinstance(text, str):
+            results[index] = {"index": index, "success": False, "error": "text must be a string"}
+        elif len(text) > MAX_TEXT_CHARS:
+            results[index] = {"index": index, "success": False, "error": f"text longer than {MAX_TEXT_CHARS} characters"}
+        else:
+            valid.append((index, text))
+    
+    analyses = analyze_emotions([text for _, text in valid])
+    for (index, _), analysis in zip(valid, analyses):
+        results[index] = {"index": index, "success": True, **analysis}
+    
+    return "".join(json.dumps(results[index]) + "\n" for index, _ in items)
 
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request body is still being read.
 
-def detect_emotion(text: str) -> str:
-    """Simple emotion detection based on keywords"""
-    text_lower = text.lower()
-    
-    if any(word in text_lower for word in ['sad', 'depressed', 'down', 'upset', 'cry']):
-        return 'sadness'
-    elif any(word in text_lower for word in ['anxious', 'anxiety', 'worried', 'stress', 'nervous']):
-        return 'anxiety'
-    elif any(word in text_lower for word in ['angry', 'mad', 'furious', 'irritated']):
-        return 'anger'
-    elif any(word in text_lower for word in ['happy', 'joy', 'excited', 'great', 'wonderful']):
-        return 'joy'
-    elif any(word in text_lower for word in ['scared', 'afraid', 'fear', 'terrified']):
-        return 'fear'
+    StreamingResponse listens on the receive channel for a disconnect,
+    which would take the request body's messages; this one doesn't, and the
+    body reader sees a disconnect as ClientDisconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def emotion_batch_ndjson_results(request: Request):
+    """Parse NDJSON texts as they arrive and yield results one scored chunk at a time
+    
+    A task reads the body and scores each chunk in the thread pool, queueing
+    the results, so reading never waits for the client to take them: a
+    client that sends its whole body before reading the response would
+    otherwise deadlock with the server once the socket buffers filled.
+    """
+    scored: asyncio.Queue = asyncio.Queue()
+    done = object()
+    
+    async def read():
+        chunk = []
+        index = 0
+        buffer = b""
+        
+        async def parsed_lines():
+            nonlocal buffer
+            async for data in request.stream():
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line
+            yield buffer
+        
+        try:
+            async for line in parsed_lines():
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append((index, json.loads(line)))
+                except ValueError as e:
+                    chunk.append((index, e))
+                index += 1
+                if len(chunk) >= EMOTION_BATCH_MAX_SIZE:
+                    await scored.put(await run_in_threadpool(analyze_emotion_chunk, chunk))
+                    chunk = []
+            if chunk:
+                await scored.put(await run_in_threadpool(analyze_emotion_chunk, chunk))
+        except BodyTooLarge as e:
+            # Results have already gone out, so it's too late for a 413
+            if chunk:
+                await scored.put(await run_in_threadpool(analyze_emotion_chunk, chunk))
+            await scored.put(json.dumps({"success": False, "error": e.detail}) + "\n")
+        except ClientDisconnect:
+            pass
+        finally:
+            await scored.put(done)
+    
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            results = await scored.get()
+            if results is done:
+                break
+            yield results
+        await reader
+    finally:
+        reader.cancel()
+
+def record_chat_message(user_id: str, sender: str, message: str, emotion: str, media: Optional[dict] = None) -> dict:
+    """Queue a chat message for storage and return it in the API message shape
+    
+    Anonymous messages are returned but not stored: every token-less caller
+    shares the one id, so a stored history would be readable by all of them.
+    """
+    record = {
+        "id": f"msg-{uuid.uuid4().hex}",
+        "message": message,
+        "timestamp": time.time(),
+        "sender": sender,
+        "emotion_detected": emotion,
+        "media": media
+    }
+    if user_id != ANONYMOUS_USER:
+        chat_history.record({**record, "user_id": user_id})
+        stats_engine.record_message(user_id, sender, record["timestamp"], media)
+    return record
+
+def sse_event(event: str, data: dict) -> str:
+    """Frame one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def chat_events(message: str, user_id: str, crisis: Optional[CrisisSignal] = None,
+                      quota_key: Optional[str] = None, session: Optional[ChatSession] = None, upstream: bool = True):
+    """Yield the (event, data) pairs of one streamed chat turn.
+    
+    ``crisis`` is the message's crisis signal (screen_chat_message). A
+    flagged message gets a `crisis` event (level and resources) right after
+    `emotion`, then its reply as a single delta; without ``upstream`` (the
+    caller is over the rate limits) the reply is the local one.
+    
+    With a WebSocket ``session`` the turn's messages are also kept in the
+    session, whose recent turns then stand in for a history read when
+    building context.
+    """
+    received = time.perf_counter()
+    if session is not None:
+        await seed_session(session)
+    with chat_stage_latency.time("emotion"):
+        emotion = message_emotion(message, crisis)
+    user_record = record_chat_message(user_id, "user", message, emotion)
+    if session is not None:
+        session.remember(user_record)
+        session.note_emotion(emotion)
+    yield "emotion", {"emotion_detected": emotion}
+    
+    media = None
+    if crisis:
+        # Resources go out before the reply is even asked for
+        yield "crisis", crisis.payload()
+        full_message = await crisis_response(message, crisis, received, user_id, user_record["id"], session,
+                                             upstream)
+        yield "delta", {"content": full_message}
     else:
-        return 'neutral'
+        with chat_stage_latency.time("classify"):
+            matches = message_matcher.match(message)
+        with chat_stage_latency.time("media_check"):
+            media_reply = check_media_request(message, matches)
+        if media_reply:
+            chat_replies.inc("media")
+            media = media_reply["media"]
+            yield "media", {**media, "message": media_reply["message"]}
+            full_message = media_reply["message"]
+        else:
+            parts = []
+            async for delta in stream_ai_response(message, matches, user_id, user_record["id"], quota_key, session):
+                parts.append(delta)
+                yield "delta", {"content": delta}
+            full_message = "".join(parts).strip()
+    
+    reply_record = record_chat_message(user_id, "assistant", full_message, emotion, media)
+    if session is not None:
+        session.remember(reply_record)
+    yield "done", {**reply_record, "crisis": crisis.payload()} if crisis else reply_record
+
+async def chat_event_stream(message: str, user_id: str, crisis: Optional[CrisisSignal] = None,
+                            quota_key: Optional[str] = None, upstream: bool = True):
+    """Yield the SSE frames for one streamed chat turn"""
+    async for event, data in chat_events(message, user_id, crisis, quota_key, upstream=upstream):
+        yield sse_event(event, data)
+
+async def seed_session(session: ChatSession) -> None:
+    """Load a WebSocket session's recent turns from stored history on its first turn"""
+    if session.seeded:
+        return
+    session.seeded = True
+    if session.user_id != ANONYMOUS_USER:
+        page = await chat_history.history(session.user_id, limit=context_builder.window)
+        session.recent.extend(reversed(page["messages"]))
+
+async def stream_ai_response(message: str, matches=None, user_id: Optional[str] = None,
+                             message_id: Optional[str] = None, quota_key: Optional[str] = None,
+                             session: Optional[ChatSession] = None):
+    """Stream AI response deltas, falling back to a single local reply if the upstream fails before the first token"""
+    if not openai_client or not openai_client.is_available():
+        chat_replies.inc("fallback")
+        yield generate_fallback_response(message, matches, user_id)
+        return
+    if not await within_token_budget(quota_key):
+        yield generate_fallback_response(message, matches, user_id)
+        return
+    
+    with chat_stage_latency.time("context"):
+        context = await conversation_context(user_id, message_id, session)
+    key = chat_cache_key(message) if completion_cache and not context else None
+    if key:
+        cached = await completion_cache.get(key)
+        if cached:
+            chat_replies.inc("upstream")
+            yield cached
+            return
+    
+    started = False
+    parts = []
+    messages = build_chat_messages(message, context)
+    call_started = time.perf_counter()
+    try:
+        async for delta in openai_client.stream(messages, **CHAT_COMPLETION_PARAMS):
+            if not started:
+                chat_stage_latency.observe(time.perf_counter() - call_started, "upstream_first_token")
+                started = True
+            parts.append(delta)
+            yield delta
+    except UpstreamUnavailableError as upstream_error:
+        logger.warning("OpenAI unavailable: %s", upstream_error)
+        if not started:
+            chat_replies.inc("fallback")
+            yield generate_fallback_response(message, matches, user_id)
+        else:
+            chat_replies.inc("error")
+        return
+    except Exception:
+        logger.exception("OpenAI API error")
+        chat_replies.inc("error")
+        if not started:
+            yield "I'm having a little trouble with my words right now, but I'm still here for you! 💕 What's going on with you today?"
+        return
+    
+    chat_stage_latency.observe(time.perf_counter() - call_started, "upstream")
+    chat_replies.inc("upstream")
+    await charge_upstream_tokens(quota_key, messages, "".join(parts))
+    if not started:
+        yield "I'm here for you! Sometimes I get a bit tongue-tied, but I'm always ready to chat. What's on your mind today? 😊"
+    elif key:
+        await completion_cache.set(key, "".join(parts))
+
+def generate_fallback_response(message: str, matches=None, conversation: Optional[str] = None) -> str:
+    """Fallback response generator with natural, human-like personality
+    
+    Replies don't repeat within a conversation until its intent's responses
+    run out (see fallback_engine.py).
+    """
+    if matches is None:
+        matches = message_matcher.match(message)
+    return fallback_engine.respond(matches, conversation, intent=classifier_label(message, "intent"))
+
+
+def detect_emotion(text: str) -> str:
+    """Most likely emotion for the text: the word-level scorer's, or the classifier's (when confident)
+    for texts with cues word scores misread: negations, mixed feelings, misspelt feeling words"""
+    emotion, unclear = emotion_scorer.screen(text)
+    if unclear:
+        return classifier_label(text, "emotion") or emotion
+    return emotion
+
+
+def message_emotion(message: str, crisis: Optional[CrisisSignal]) -> str:
+    """Emotion recorded for a chat message: ``detect_emotion``'s, but never neutral or joy for a crisis-flagged one"""
+    emotion = detect_emotion(message)
+    if crisis and emotion in (NEUTRAL, "joy"):
+        return CRISIS_EMOTION
+    return emotion
+
+
+def analyze_emotions(texts: list) -> list:
+    """Emotion, confidence and ranked distribution per text, labelled as in chat (``detect_emotion``)
+
+    Word-level scores come from one vectorized pass; the texts they can't
+    read go through the classifier together, and its probabilities replace
+    the word scores where it is confident.
+    """
+    analyses = emotion_scorer.analyze_batch(texts)
+    if intent_classifier is None:
+        return analyses
+    unclear = [i for i, text in enumerate(texts) if emotion_scorer.screen(text)[1]]
+    for i, emotions in zip(unclear, intent_classifier.probabilities_batch([texts[i] for i in unclear], "emotion")):
+        emotion, confidence = next(iter(emotions.items()))
+        if confidence < INTENT_MIN_CONFIDENCE:
+            classifier_decisions.inc("emotion", "keywords")
+            continue
+        classifier_decisions.inc("emotion", "model")
+        analyses[i].update(emotion=emotion, confidence=confidence, emotions=emotions)
+    return analyses
+
+
+@lru_cache(maxsize=1024)
+def classify_text(text: str) -> dict:
+    """Both classifier heads for a message in one feature pass (cached: a chat turn asks twice)"""
+    return intent_classifier.predict_all(text)
+
+
+def classifier_label(text: str, head: str) -> Optional[str]:
+    """The classifier's label for ``head``, or None without a model or below INTENT_MIN_CONFIDENCE"""
+    if intent_classifier is None:
+        return None
+    label, probability = classify_text(text)[head]
+    if probability < INTENT_MIN_CONFIDENCE:
+        classifier_decisions.inc(head, "keywords")
+        return None
+    classifier_decisions.inc(head, "model")
+    return label
+
+
+# Warm-up steps run in the background after startup (warmup.py); a sample
+# message goes through each local stage so first requests don't pay for it
+WARMUP_MESSAGE = "I feel anxious today, can you play some calming rain sounds?"
+warmup = Warmup()
+if openai_client:
+    warmup.step("upstream_client", lambda: openai_client.client, in_thread=True)
+warmup.step("matchers", lambda: (check_media_request(WARMUP_MESSAGE),
+                                 fallback_engine.classify(message_matcher.match(WARMUP_MESSAGE)),
+                                 emotion_scorer.analyze(WARMUP_MESSAGE)))
+if intent_classifier:
+    # One prediction through the loaded weights
+    warmup.step("intent_classifier", lambda: intent_classifier.scores_batch([WARMUP_MESSAGE]))
+warmup.step("prompt", lambda: chat_prompt.render(WARMUP_MESSAGE, []))
+warmup.step("chat_history", lambda: chat_history.history(ANONYMOUS_USER, limit=1))
+warmup.step("user_stats", lambda: stats_engine.get(ANONYMOUS_USER))
+warmup.step("profiles", lambda: profile_service.store.load(ANONYMOUS_USER), in_thread=True)
 
 # Global exception handler
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """422 with the failing fields, without echoing (possibly huge) input values back"""
+    return ORJSONResponse(
+        status_code=422,
+        content={"detail": [{"loc": e["loc"], "msg": e["msg"], "type": e["type"]} for e in exc.errors()]}
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unexpected errors"""
@@ -495,12 +1394,14 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
-# Run the application
+# Development server with auto-reload (production: python serve.py)
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8001,
+        host=settings.host,
+        port=settings.port,
         reload=True,
         log_level="info"
     )
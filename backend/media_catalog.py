@@ -0,0 +1,298 @@
+"""
+Media catalog with an inverted index
+Wellness media items (the frontend's media library by default, or a JSON
+catalog) are indexed once at startup: every term from an item's tags and
+title, its category and its type maps to a sorted array of item positions.
+Chat media suggestions and the search endpoint rank items by how many query
+terms they match (ties in catalog order), with category/type filters applied
+to the posting lists, so a lookup touches only the postings of the query's
+terms rather than the whole catalog. Results for repeated queries come from
+a small LRU cache.
+"""
+
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+MEDIA_TYPES = ("audio", "video")
+
+# Built-in catalog; ids match frontend/src/data/mediaLibrary.ts
+MEDIA_LIBRARY = [
+    {
+        "id": "relaxing-music-1",
+        "title": "Peaceful Piano Meditation",
+        "description": "Gentle piano melodies to help you relax and unwind",
+        "type": "audio",
+        "url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",
+        "category": "relaxation",
+        "duration": 600,
+        "tags": ["piano", "calm", "unwind", "relax", "music", "stress relief"],
+    },
+    {
+        "id": "relaxing-music-2",
+        "title": "Nature Sounds & Rain",
+        "description": "Soothing rain sounds with gentle nature ambiance",
+        "type": "audio",
+        "url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",
+        "category": "nature",
+        "duration": 900,
+        "tags": ["rain", "nature", "ambient", "sleep", "calm"],
+    },
+    {
+        "id": "relaxing-music-3",
+        "title": "Ocean Waves Meditation",
+        "description": "Calming ocean waves to wash away stress and anxiety",
+        "type": "audio",
+        "url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",
+        "category": "meditation",
+        "duration": 1200,
+        "tags": ["ocean", "water", "waves", "anxiety", "stress", "calm"],
+    },
+    {
+        "id": "relaxing-music-4",
+        "title": "Soft Ambient Music",
+        "description": "Gentle ambient sounds perfect for focus and relaxation",
+        "type": "audio",
+        "url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",
+        "category": "music",
+        "duration": 720,
+        "tags": ["ambient", "focus", "melody", "song", "relax"],
+    },
+    {
+        "id": "meditation-video-1",
+        "title": "5-Minute Breathing Meditation",
+        "description": "Quick guided breathing exercise to center yourself",
+        "type": "video",
+        "url": "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4",
+        "thumbnail": "https://via.placeholder.com/400x225/4299e1/ffffff?text=Breathing+Meditation",
+        "category": "meditation",
+        "duration": 300,
+        "tags": ["breathing", "guided", "quick", "center", "anxiety"],
+    },
+    {
+        "id": "meditation-video-2",
+        "title": "10-Minute Mindfulness Practice",
+        "description": "Gentle mindfulness meditation for mental clarity",
+        "type": "video",
+        "url": "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/ElephantsDream.mp4",
+        "thumbnail": "https://via.placeholder.com/400x225/48bb78/ffffff?text=Mindfulness+Practice",
+        "category": "meditation",
+        "duration": 600,
+        "tags": ["mindfulness", "guided", "clarity", "focus"],
+    },
+    {
+        "id": "meditation-video-3",
+        "title": "Progressive Muscle Relaxation",
+        "description": "Full body relaxation technique to release tension",
+        "type": "video",
+        "url": "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/ForBiggerBlazes.mp4",
+        "thumbnail": "https://via.placeholder.com/400x225/9f7aea/ffffff?text=Muscle+Relaxation",
+        "category": "relaxation",
+        "duration": 900,
+        "tags": ["body", "tension", "relax", "sleep", "stress relief"],
+    },
+    {
+        "id": "nature-video-1",
+        "title": "Forest Walk Visualization",
+        "description": "Immersive forest experience for stress relief",
+        "type": "video",
+        "url": "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/ForBiggerEscapes.mp4",
+        "thumbnail": "https://via.placeholder.com/400x225/38a169/ffffff?text=Forest+Walk",
+        "category": "nature",
+        "duration": 1200,
+        "tags": ["forest", "birds", "visualization", "stress relief", "natural"],
+    },
+    {
+        "id": "nature-video-2",
+        "title": "Sunrise Over Mountains",
+        "description": "Peaceful mountain sunrise for morning meditation",
+        "type": "video",
+        "url": "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/Sintel.mp4",
+        "thumbnail": "https://via.placeholder.com/400x225/ed8936/ffffff?text=Mountain+Sunrise",
+        "category": "nature",
+        "duration": 600,
+        "tags": ["sunrise", "mountains", "morning", "peaceful"],
+    },
+    {
+        "id": "therapy-audio-1",
+        "title": "Anxiety Relief Meditation",
+        "description": "Guided meditation specifically designed for anxiety management",
+        "type": "audio",
+        "url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",
+        "category": "therapy",
+        "duration": 900,
+        "tags": ["anxiety", "guided", "therapeutic", "stress"],
+    },
+    {
+        "id": "therapy-audio-2",
+        "title": "Sleep Stories for Rest",
+        "description": "Calming bedtime stories to help with insomnia",
+        "type": "audio",
+        "url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",
+        "category": "therapy",
+        "duration": 1800,
+        "tags": ["sleep", "insomnia", "bedtime", "stories", "rest"],
+    },
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Too common to rank by
+STOPWORDS = frozenset("and for the with you your some over".split())
+
+
+def terms(text: str) -> List[str]:
+    """Index terms of ``text``: lowercase words of three or more characters"""
+    return [word for word in TOKEN_PATTERN.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS]
+
+
+class MediaCatalog:
+    """Static media catalog searchable by free-text terms, category and type.
+
+    ``items`` are dicts with at least ``id``, ``title``, ``type`` and
+    ``category`` (plus optional ``tags`` and any display fields, which are
+    returned as-is). Catalog order is the tie-break rank, so list the
+    preferred items first.
+    """
+
+    EMPTY = np.empty(0, dtype=np.int32)
+
+    def __init__(self, items: Iterable[Dict[str, Any]], cache_size: int = 4096):
+        self.items = [dict(item) for item in items]
+        self.positions = {item["id"]: i for i, item in enumerate(self.items)}
+        if len(self.positions) != len(self.items):
+            raise ValueError("Duplicate media item ids")
+        self.categories = sorted({item["category"] for item in self.items})
+        # Item JSON serialized once; responses splice these together
+        self.item_json = [orjson.dumps(item) for item in self.items]
+
+        category_codes = {category: code for code, category in enumerate(self.categories)}
+        type_codes = {media_type: code for code, media_type in enumerate(MEDIA_TYPES)}
+        self._category = np.array([category_codes[item["category"]] for item in self.items], dtype=np.int16)
+        self._type = np.array([type_codes.get(item["type"], -1) for item in self.items], dtype=np.int16)
+        self._category_codes = category_codes
+        self._type_codes = type_codes
+
+        postings: Dict[str, List[int]] = {}
+        for position, item in enumerate(self.items):
+            text = " ".join([item["title"], item["category"], item["type"], *item.get("tags", ())])
+            for term in set(terms(text)):
+                postings.setdefault(term, []).append(position)
+        self.postings = {term: np.array(p, dtype=np.int32) for term, p in postings.items()}
+
+        # Filter-only results: every (category, type) combination, in catalog order
+        self._filtered: Dict[Tuple[Optional[str], Optional[str]], np.ndarray] = {}
+        for category in [None, *self.categories]:
+            for media_type in [None, *MEDIA_TYPES]:
+                mask = self._filter_mask(np.arange(len(self.items)), category, media_type)
+                self._filtered[(category, media_type)] = np.flatnonzero(mask).astype(np.int32)
+
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, Tuple[Tuple[int, ...], int]]" = OrderedDict()
+        self.searches = 0
+        self.cache_hits = 0
+
+    def _filter_mask(self, positions: np.ndarray, category: Optional[str], media_type: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(positions), dtype=bool)
+        if category is not None:
+            mask &= self._category[positions] == self._category_codes.get(category, -1)
+        if media_type is not None:
+            mask &= self._type[positions] == self._type_codes.get(media_type, -1)
+        return mask
+
+    def _rank(self, query_terms: Tuple[str, ...], category: Optional[str], media_type: Optional[str],
+              limit: int, fill: bool) -> Tuple[Tuple[int, ...], int]:
+        filtered = self._filtered.get((category, media_type), self.EMPTY)
+        if not query_terms:
+            return tuple(filtered[:limit].tolist()), len(filtered)
+        hits = [self.postings[term] for term in query_terms if term in self.postings]
+        hits = np.concatenate(hits) if hits else self.EMPTY
+        if category is not None or media_type is not None:
+            hits = hits[self._filter_mask(hits, category, media_type)]
+        matched, counts = np.unique(hits, return_counts=True)
+        ranked = matched[np.lexsort((matched, -counts))][:limit].tolist()
+        if not fill:
+            return tuple(ranked), len(matched)
+        # Top up with unmatched items that pass the filters, in catalog order
+        if len(ranked) < limit:
+            seen = set(ranked)
+            for position in filtered[:limit + len(ranked)].tolist():
+                if position not in seen:
+                    ranked.append(position)
+                    if len(ranked) == limit:
+                        break
+        return tuple(ranked), len(filtered)
+
+    def search(self, query: str = "", category: Optional[str] = None, media_type: Optional[str] = None,
+               limit: int = 10, fill: bool = False) -> Tuple[Tuple[int, ...], int]:
+        """Positions of the top ``limit`` items and the number of matches.
+
+        Items match when they share at least one term with ``query`` (any
+        item when the query has no terms) and pass the filters. With
+        ``fill`` the ranking is topped up with non-matching items that pass
+        the filters, and the total counts those too.
+        """
+        self.searches += 1
+        query_terms = tuple(sorted(set(terms(query))))
+        return self._cached((query_terms, category, media_type, limit, fill),
+                            lambda: self._rank(query_terms, category, media_type, limit, fill))
+
+    def _cached(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+        result = compute()
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def suggest(self, message: str, category: Optional[str], media_type: Optional[str],
+                limit: int = 3) -> List[str]:
+        """Ranked item ids for a chat media request.
+
+        Items of the requested category and type come first (ranked by terms
+        shared with the message), then the requested type in other
+        categories, then the category's other types, then anything.
+        """
+        # Tokenized once; the whole fallback chain is cached per query terms
+        self.searches += 1
+        query_terms = tuple(sorted(set(terms(message))))
+        return list(self._cached(("suggest", query_terms, category, media_type, limit),
+                                 lambda: self._suggest(query_terms, category, media_type, limit)))
+
+    def _suggest(self, query_terms: Tuple[str, ...], category: Optional[str], media_type: Optional[str],
+                 limit: int) -> Tuple[str, ...]:
+        ranked: List[int] = []
+        for filters in ((category, media_type), (None, media_type), (category, None), (None, None)):
+            positions, _ = self._rank(query_terms, *filters, limit=limit, fill=True)
+            ranked.extend(p for p in positions if p not in ranked)
+            if len(ranked) >= limit:
+                break
+        return tuple(self.items[p]["id"] for p in ranked[:limit])
+
+    def items_json(self, positions: Sequence[int]) -> bytes:
+        """JSON array of the items at ``positions``"""
+        return b"[" + b",".join(self.item_json[p] for p in positions) + b"]"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self.items),
+            "terms": len(self.postings),
+            "categories": self.categories,
+            "searches": self.searches,
+            "cache_hits": self.cache_hits,
+            "cached_queries": len(self._cache),
+        }
+
+
+def load_media_catalog(path: str, **options) -> MediaCatalog:
+    """Load a JSON catalog: a list of items or ``{"items": [...]}``"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return MediaCatalog(data["items"] if isinstance(data, dict) else data, **options)
@@ -0,0 +1,313 @@
+"""
+User profiles: SQLite store with a read-through in-process cache
+Profiles are read on every dashboard load and written rarely, so reads are
+served from a per-worker cache of ready-to-send response bodies (with their
+ETags); a miss loads the row in the thread pool and fills the cache. Entries
+expire after a TTL, which bounds how stale another worker's cache can be
+after a write, and this worker replaces its entry as soon as it writes.
+
+Updates are partial (PATCH): only the fields sent are applied, nested
+preferences are merged, and only the columns whose values actually change
+are written. Each profile has a version number that every write bumps;
+a write that names the version it was based on fails with
+``VersionConflictError`` if another write got there first. A user without
+a stored profile gets a default one (version 0) that is written on their
+first update.
+
+Only the owner sees the whole profile. Anyone else gets ``PUBLIC_FIELDS``
+(no email, phone, birthday, preferences or privacy settings), and only
+while ``privacy.profile_visibility`` is "public"; both views are cached.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from json_payloads import digest
+
+# Plain text columns, then the nested settings stored as JSON text
+TEXT_FIELDS = ("username", "email", "name", "bio", "avatar", "location", "birthday", "occupation", "phone")
+JSON_FIELDS = ("preferences", "privacy")
+
+DEFAULT_PREFERENCES = {
+    "theme": "dark",
+    "language": "en",
+    "timezone": "America/Los_Angeles",
+    "notifications": {"email": True, "push": True, "sms": False, "weekly_summary": True},
+}
+DEFAULT_PRIVACY = {"profile_visibility": "public", "show_online_status": True, "allow_messages": True}
+# What callers other than the owner see of a public profile
+PUBLIC_FIELDS = ("id", "version", "username", "name", "bio", "avatar", "location", "occupation", "created_at")
+
+RESPONSE_PREFIX = b'{"success":true,"data":{"user":'
+RESPONSE_SUFFIX = b"}}"
+
+
+class VersionConflictError(Exception):
+    """Raised when an update names a version that is no longer the current one"""
+
+    def __init__(self, current: Dict[str, Any]):
+        super().__init__(f"Profile is at version {current['version']}")
+        self.current = current
+
+
+def iso_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def default_profile(user_id: str, **fields: Any) -> Dict[str, Any]:
+    """Unsaved (version 0) profile; ``fields`` (e.g. from the user's account) override the blanks"""
+    profile = {"id": user_id, "version": 0, **{field: "" for field in TEXT_FIELDS},
+               "preferences": DEFAULT_PREFERENCES, "privacy": DEFAULT_PRIVACY, "created_at": None, "updated_at": None}
+    profile.update(fields)
+    return profile
+
+
+def merge(current: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """``current`` with ``changes`` applied, merging nested dicts key by key"""
+    merged = dict(current)
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class SQLiteProfileStore:
+    """Profiles in SQLite (WAL), one connection per thread.
+
+    Methods are synchronous and are called from the thread pool. An update
+    reads and writes its row inside one BEGIN IMMEDIATE transaction, so the
+    version check holds across worker processes sharing the database.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            email TEXT NOT NULL,
+            name TEXT NOT NULL,
+            bio TEXT NOT NULL,
+            avatar TEXT NOT NULL,
+            location TEXT NOT NULL,
+            birthday TEXT NOT NULL,
+            occupation TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            preferences TEXT NOT NULL,
+            privacy TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+    """
+    COLUMNS = ("user_id", "version", *TEXT_FIELDS, *JSON_FIELDS, "created_at", "updated_at")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # Throwaway connection, so nothing is inherited by forked workers
+        with closing(sqlite3.connect(self.path)) as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _profile(row: sqlite3.Row) -> Dict[str, Any]:
+        profile = {"id": row["user_id"], "version": row["version"]}
+        profile.update((field, row[field]) for field in TEXT_FIELDS)
+        profile.update((field, json.loads(row[field])) for field in JSON_FIELDS)
+        profile.update(created_at=row["created_at"], updated_at=row["updated_at"])
+        return profile
+
+    @staticmethod
+    def _column(field: str, value: Any) -> Any:
+        return json.dumps(value, separators=(",", ":")) if field in JSON_FIELDS else value
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return self._profile(row) if row else None
+
+    def update(self, user_id: str, changes: Dict[str, Any], expected_version: Optional[int],
+               defaults: Callable[[str], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Apply ``changes``; returns the profile and whether anything was written.
+
+        Values equal to the stored ones write nothing and keep the version.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT * FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+            current = self._profile(row) if row else defaults(user_id)
+            if expected_version is not None and expected_version != current["version"]:
+                raise VersionConflictError(current)
+            updated = merge(current, changes)
+            changed = [field for field in (*TEXT_FIELDS, *JSON_FIELDS) if updated[field] != current[field]]
+            if not changed:
+                connection.execute("COMMIT")
+                return current, False
+
+            now = iso_timestamp(time.time())
+            updated.update(version=current["version"] + 1, updated_at=now)
+            if row is None:
+                updated["created_at"] = updated["created_at"] or now
+                values = {field: self._column(field, updated[field]) for field in (*TEXT_FIELDS, *JSON_FIELDS)}
+                connection.execute(
+                    f"INSERT INTO profiles ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    (user_id, updated["version"], *values.values(), updated["created_at"], now),
+                )
+            else:
+                # Only the changed columns (field names come from TEXT_FIELDS/JSON_FIELDS, not the request)
+                assignments = ", ".join(f"{field} = ?" for field in changed)
+                connection.execute(
+                    f"UPDATE profiles SET {assignments}, version = version + 1, updated_at = ? WHERE user_id = ?",
+                    (*(self._column(field, updated[field]) for field in changed), now, user_id),
+                )
+            connection.execute("COMMIT")
+            return updated, True
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+class CachedProfile(NamedTuple):
+    profile: Dict[str, Any]
+    body: bytes  # {"success": true, "data": {"user": ...}}, for the owner
+    etag: str
+    public_body: bytes  # the same with PUBLIC_FIELDS only
+    public_etag: str
+
+    @property
+    def public(self) -> bool:
+        """Whether callers other than the owner may see the profile"""
+        return self.profile["privacy"].get("profile_visibility") == "public"
+
+
+def cached_profile(profile: Dict[str, Any]) -> CachedProfile:
+    body = RESPONSE_PREFIX + orjson.dumps(profile) + RESPONSE_SUFFIX
+    public_body = RESPONSE_PREFIX + orjson.dumps({field: profile[field] for field in PUBLIC_FIELDS}) + RESPONSE_SUFFIX
+    return CachedProfile(profile, body, f'"profile-{digest(body)}"', public_body, f'"profile-{digest(public_body)}"')
+
+
+class ProfileService:
+    """Profile reads through an LRU cache with a TTL, and versioned partial updates.
+
+    ``defaults(user_id)`` builds the profile a user's first update starts
+    from. ``unsaved(user_id)`` is what reading a user with none stored
+    gets (``defaults`` unless given); when it returns None there is no such
+    profile, ``get`` returns None and nothing is cached. Both are called
+    from the thread pool.
+    """
+
+    def __init__(self, store: SQLiteProfileStore, defaults: Callable[[str], Dict[str, Any]] = default_profile,
+                 cache_ttl: float = 30.0, cache_size: int = 10000,
+                 unsaved: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None):
+        self.store = store
+        self.defaults = defaults
+        self.unsaved = unsaved or defaults
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped by every write, so a read that raced one doesn't cache what it loaded
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.unchanged = 0
+        self.conflicts = 0
+
+    def cached(self, user_id: str) -> Optional[CachedProfile]:
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._cache[user_id]
+            return None
+        self._cache.move_to_end(user_id)
+        return entry[0]
+
+    def _put(self, user_id: str, entry: CachedProfile) -> None:
+        self._cache[user_id] = (entry, time.monotonic() + self.cache_ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self._generation += 1
+        self._cache.pop(user_id, None)
+
+    def _load(self, user_id: str) -> Optional[CachedProfile]:
+        profile = self.store.load(user_id) or self.unsaved(user_id)
+        return cached_profile(profile) if profile is not None else None
+
+    async def get(self, user_id: str) -> Optional[CachedProfile]:
+        """``user_id``'s profile, or None if it has none (see ``unsaved``)"""
+        entry = self.cached(user_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        generation = self._generation
+        entry = await run_in_threadpool(self._load, user_id)
+        if entry is not None and generation == self._generation:
+            self._put(user_id, entry)
+        return entry
+
+    async def update(self, user_id: str, changes: Dict[str, Any],
+                     expected_version: Optional[int] = None) -> CachedProfile:
+        """Apply a partial update; raises VersionConflictError if ``expected_version`` is stale"""
+        try:
+            profile, written = await run_in_threadpool(
+                self.store.update, user_id, changes, expected_version, self.defaults)
+        except VersionConflictError:
+            self.conflicts += 1
+            self.invalidate(user_id)
+            raise
+        entry = cached_profile(profile)
+        self.invalidate(user_id)
+        self._put(user_id, entry)
+        if written:
+            self.writes += 1
+        else:
+            self.unchanged += 1
+        return entry
+
+    def close(self) -> None:
+        self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._cache),
+            "cache_ttl_seconds": self.cache_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "unchanged": self.unchanged,
+            "conflicts": self.conflicts,
+        }
@@ -0,0 +1,128 @@
+"""
+Versioned system-prompt templates for chat completions
+Each variant's persona text is built once at import and sent byte-identical
+on every request, so providers can cache the prompt prefix. Anything that
+changes per request (summaries, prior turns, the user's message) goes in
+the trailing messages only.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from context_builder import estimate_tokens
+
+ALEX_PERSONA = """\
+You are Alex, a warm and genuinely caring mental health companion. You're not just an AI - you're like talking to your most understanding friend who happens to be really good at helping people feel better.
+
+Core Personality (BE VERY HUMAN):
+• Talk like a real person - use "I think," "you know," "honestly," "I've noticed," etc.
+• Be conversational and natural - avoid formal or clinical language
+• Show genuine curiosity about the person and remember context from the conversation
+• Use contractions (I'm, you're, don't, can't) and casual language
+• Be empathetic but not overly dramatic - respond like a good friend would
+• Vary your responses - don't use the same phrases repeatedly
+• Sometimes share brief, relatable thoughts or gentle insights
+
+Response Style Guidelines:
+• For greetings: Be warm but not overly enthusiastic - "Hey! Good to see you. How's your day going?"
+• For emotional sharing: Acknowledge first, then explore - "That sounds really tough. Want to tell me more about what happened?"
+• For requests like jokes: Be natural and engaging - "Oh, I love a good joke request! Here's one that always makes me smile..."
+• For casual chat: Match their energy and be genuinely interested
+• Keep responses 1-3 sentences unless they need more support
+• Ask follow-up questions that show you're really listening
+
+IMPORTANT Context Awareness:
+• If someone asks for a joke, give them an actual good joke and maybe ask what kind of humor they like
+• If they want "something funny," share something genuinely amusing and relatable
+• If they seem down, be gentle and understanding without being preachy
+• If they're casual/chatty, match that energy
+• Remember what they've shared and reference it naturally
+
+Respond as Alex would - naturally, warmly, and with genuine interest in helping them feel good."""
+
+ALEX_BRIEF_PERSONA = """\
+You are Alex, a warm, caring mental health companion who talks like an understanding friend.
+• Use natural, casual language with contractions; avoid clinical phrasing
+• Acknowledge feelings first, then gently explore with a follow-up question
+• Match the person's energy; tell a real joke when they ask for one
+• Keep responses to 1-3 sentences unless they need more support
+• Remember what they've shared and reference it naturally"""
+
+
+class PromptTemplate:
+    """One immutable prompt variant.
+
+    The system message dict is created once and reused for every request, so
+    the serialized prefix is identical byte for byte.
+    """
+
+    def __init__(self, version: str, system: str):
+        self.version = version
+        self.system_message = {"role": "system", "content": system}
+        self.system_tokens = estimate_tokens(system)
+        self.fingerprint = hashlib.sha256(system.encode("utf-8")).hexdigest()[:12]
+
+    def render(self, message: str, context: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """Static system prefix, then prior turns, then the user's message"""
+        return [self.system_message, *(context or []), {"role": "user", "content": message}]
+
+
+class PromptStats:
+    """Running per-request prompt token counts (estimated) for /health"""
+
+    def __init__(self):
+        self.requests = 0
+        self.system_tokens = 0
+        self.context_tokens = 0
+        self.message_tokens = 0
+        self.max_total_tokens = 0
+        self.last: Optional[Dict[str, int]] = None
+
+    def record(self, template: PromptTemplate, messages: List[Dict[str, str]]) -> Dict[str, int]:
+        """Count one rendered prompt and return its breakdown"""
+        context_tokens = sum(estimate_tokens(m["content"]) for m in messages[1:-1])
+        message_tokens = estimate_tokens(messages[-1]["content"])
+        report = {
+            "system": template.system_tokens,
+            "context": context_tokens,
+            "message": message_tokens,
+            "total": template.system_tokens + context_tokens + message_tokens,
+        }
+        self.requests += 1
+        self.system_tokens += report["system"]
+        self.context_tokens += report["context"]
+        self.message_tokens += report["message"]
+        self.max_total_tokens = max(self.max_total_tokens, report["total"])
+        self.last = report
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "avg_system_tokens": round(self.system_tokens / requests, 1),
+            "avg_context_tokens": round(self.context_tokens / requests, 1),
+            "avg_message_tokens": round(self.message_tokens / requests, 1),
+            "avg_total_tokens": round((self.system_tokens + self.context_tokens + self.message_tokens) / requests, 1),
+            "max_total_tokens": self.max_total_tokens,
+            "last": self.last,
+        }
+
+
+PROMPT_TEMPLATES: Dict[str, PromptTemplate] = {
+    template.version: template
+    for template in (
+        PromptTemplate("alex-2", ALEX_PERSONA),
+        PromptTemplate("alex-2-brief", ALEX_BRIEF_PERSONA),
+    )
+}
+DEFAULT_PROMPT_VERSION = "alex-2"
+
+
+def get_prompt_template(version: Optional[str] = None) -> PromptTemplate:
+    """Template for ``version`` (default when empty); raises ValueError for unknown versions"""
+    version = version or DEFAULT_PROMPT_VERSION
+    try:
+        return PROMPT_TEMPLATES[version]
+    except KeyError:
+        raise ValueError(f"Unknown prompt version {version!r}; expected one of {sorted(PROMPT_TEMPLATES)}")
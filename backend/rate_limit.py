@@ -0,0 +1,245 @@
+"""
+Request rate limits and upstream token budgets
+Request rates are capped per user and per client IP with a sliding-window
+counter (the current and previous fixed windows, weighted by overlap), and
+upstream token spend per user is metered with a token bucket. Both are O(1)
+per check. State lives in-process by default; the Redis backend shares it
+between workers.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+# Added to every retry delay so a retry at exactly that time isn't refused
+# by float rounding on large timestamps
+RETRY_MARGIN = 0.001
+
+
+def window_retry_after(current: int, previous: int, limit: int, window: float, elapsed: float) -> float:
+    """Seconds until one more hit fits under ``limit`` in the sliding window"""
+    if current >= limit:
+        # Wait for the next window, then for enough of this window's hits
+        # (the previous window's by then) to age out
+        wait = window - elapsed + window * (1 - (limit - 1) / current)
+    else:
+        # previous * (1 - t / window) + current + 1 <= limit, solved for t
+        needed = window * (1 - (limit - 1 - current) / previous) if previous else 0.0
+        wait = max(needed - elapsed, 0.0)
+    return wait + RETRY_MARGIN
+
+
+class MemoryLimiterBackend:
+    """In-process limiter state, bounded to the ``max_keys`` most recently seen keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [window index, hits in that window, hits in the window before]
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+        # key -> [tokens, updated at]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def _touch(self, entries: OrderedDict, key: str, default: list) -> list:
+        state = entries.get(key)
+        if state is None:
+            state = entries[key] = default
+            if len(entries) > self.max_keys:
+                entries.popitem(last=False)
+        else:
+            entries.move_to_end(key)
+        return state
+
+    async def hit(self, limits: Sequence[Tuple[str, int]], window: float, now: float) -> Tuple[Optional[int], float]:
+        """Count a hit against every ``(key, limit)`` unless one of them would exceed its limit.
+
+        Returns (None, 0.0) when counted, otherwise the position of the first
+        limit that refused and its retry_after; a refused hit counts nowhere.
+        """
+        index = int(now // window)
+        elapsed = now - index * window
+        states = []
+        for position, (key, limit) in enumerate(limits):
+            state = self._touch(self._windows, key, [index, 0, 0])
+            if state[0] != index:
+                state[2] = state[1] if state[0] == index - 1 else 0
+                state[0], state[1] = index, 0
+            if state[2] * (1 - elapsed / window) + state[1] + 1 > limit:
+                return position, window_retry_after(state[1], state[2], limit, window, elapsed)
+            states.append(state)
+        for state in states:
+            state[1] += 1
+        return None, 0.0
+
+    async def spend(self, key: str, amount: float, capacity: float, refill_rate: float, now: float) -> float:
+        """Take ``amount`` from the bucket (it may go negative) and return what's left"""
+        state = self._touch(self._buckets, key, [capacity, now])
+        tokens = min(capacity, state[0] + max(now - state[1], 0.0) * refill_rate) - amount
+        state[0], state[1] = tokens, now
+        return tokens
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "windows": len(self._windows), "buckets": len(self._buckets)}
+
+
+class RedisLimiterBackend:
+    """Limiter state shared by every worker (requires the optional ``redis`` package).
+
+    Each check is one Lua script call over all of a request's limits, so
+    it's atomic across workers and a refused hit counts nowhere. If
+    Redis is unreachable requests are allowed through (and counted in
+    ``errors``) rather than failing chat.
+    """
+
+    # KEYS: current and previous window of each limit; ARGV: previous
+    # window weight, TTL, then each limit. Returns the 1-based position of
+    # the limit that refused (0 when counted) with its window counts.
+    WINDOW_SCRIPT = """
+        local weight = tonumber(ARGV[1])
+        local count = #KEYS / 2
+        for i = 1, count do
+            local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+            local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+            if previous * weight + current + 1 > tonumber(ARGV[2 + i]) then
+                return {i, current, previous}
+            end
+        end
+        for i = 1, count do
+            redis.call('INCR', KEYS[2 * i - 1])
+            redis.call('EXPIRE', KEYS[2 * i - 1], ARGV[2])
+        end
+        return {0, 0, 0}
+    """
+
+    BUCKET_SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or capacity
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate) - tonumber(ARGV[4])
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+        redis.call('EXPIRE', KEYS[1], ARGV[5])
+        return tostring(tokens)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self._window = self.client.register_script(self.WINDOW_SCRIPT)
+        self._bucket = self.client.register_script(self.BUCKET_SCRIPT)
+        self.errors = 0
+
+    async def hit(self, limits: Sequence[Tuple[str, int]], window: float, now: float) -> Tuple[Optional[int], float]:
+        index = int(now // window)
+        elapsed = now - index * window
+        keys = [f"{self.prefix}{key}:{i}" for key, _ in limits for i in (index, index - 1)]
+        try:
+            refused, current, previous = await self._window(
+                keys=keys, args=[1 - elapsed / window, math.ceil(window * 2), *(limit for _, limit in limits)])
+        except Exception:
+            self.errors += 1
+            return None, 0.0
+        if not refused:
+            return None, 0.0
+        position = int(refused) - 1
+        return position, window_retry_after(int(current), int(previous), limits[position][1], window, elapsed)
+
+    async def spend(self, key: str, amount: float, capacity: float, refill_rate: float, now: float) -> float:
+        ttl = math.ceil(capacity / refill_rate) + 1 if refill_rate > 0 else 86400
+        try:
+            return float(await self._bucket(
+                keys=[f"{self.prefix}bucket:{key}"], args=[capacity, refill_rate, now, amount, ttl]))
+        except Exception:
+            self.errors += 1
+            return capacity
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "errors": self.errors}
+
+
+class RateLimiter:
+    """Per-scope request limits plus a per-user upstream token budget.
+
+    ``limits`` maps a scope (``"chat"``, ``"emotion"``) to ``(per_user,
+    per_ip)`` requests per ``window`` seconds; 0 disables that limit. The
+    token budget holds up to ``token_capacity`` tokens and refills at
+    ``token_refill_per_second``; a capacity of 0 disables it.
+    """
+
+    def __init__(self, backend, limits: Dict[str, Tuple[int, int]], window: float = 60.0,
+                 token_capacity: float = 0, token_refill_per_second: float = 0):
+        self.backend = backend
+        self.limits = limits
+        self.window = window
+        self.token_capacity = token_capacity
+        self.token_refill_per_second = token_refill_per_second
+        self.limited: Dict[str, int] = {}
+        self.over_budget = 0
+        self.tokens_charged = 0
+
+    async def check(self, scope: str, user_id: Optional[str], ip: str) -> Optional[float]:
+        """None if the request may proceed, otherwise seconds to wait before retrying
+
+        The IP and user limits are checked together, so a request one of
+        them refuses doesn't use up the other's quota.
+        """
+        per_user, per_ip = self.limits.get(scope, (0, 0))
+        checks = [(kind, f"{scope}:{kind}:{key}", limit)
+                  for kind, key, limit in (("ip", ip, per_ip), ("user", user_id, per_user)) if limit and key]
+        if not checks:
+            return None
+        refused, retry_after = await self.backend.hit([(key, limit) for _, key, limit in checks],
+                                                      self.window, time.time())
+        if refused is None:
+            return None
+        label = f"{scope}_{checks[refused][0]}"
+        self.limited[label] = self.limited.get(label, 0) + 1
+        return retry_after
+
+    async def has_token_budget(self, key: str) -> bool:
+        """True while ``key`` has upstream tokens left"""
+        if not self.token_capacity:
+            return True
+        remaining = await self.backend.spend(key, 0, self.token_capacity, self.token_refill_per_second, time.time())
+        if remaining <= 0:
+            self.over_budget += 1
+            return False
+        return True
+
+    async def charge_tokens(self, key: str, tokens: int) -> None:
+        """Record upstream tokens spent on behalf of ``key``"""
+        self.tokens_charged += tokens
+        if self.token_capacity:
+            await self.backend.spend(key, tokens, self.token_capacity, self.token_refill_per_second, time.time())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window,
+            "limits": {scope: {"per_user": user, "per_ip": ip} for scope, (user, ip) in self.limits.items()},
+            "limited": dict(self.limited),
+            "token_capacity": self.token_capacity,
+            "token_refill_per_second": self.token_refill_per_second,
+            "over_budget": self.over_budget,
+            "tokens_charged": self.tokens_charged,
+            **self.backend.stats(),
+        }
+
+
+def build_rate_limiter(backend: str, limits: Dict[str, Tuple[int, int]], window: float,
+                       token_capacity: float, token_refill_per_second: float,
+                       redis_url: Optional[str] = None, max_keys: int = 100000) -> Optional[RateLimiter]:
+    """Build the configured limiter, or None when rate limiting is turned off"""
+    if backend == "off":
+        return None
+    if backend == "redis":
+        store = RedisLimiterBackend(redis_url or "redis://localhost:6379/0")
+    else:
+        store = MemoryLimiterBackend(max_keys)
+    return RateLimiter(store, limits, window, token_capacity, token_refill_per_second)
@@ -0,0 +1,86 @@
+"""
+Request body size limits enforced before the body is read
+A declared Content-Length over the limit is answered with 413 straight
+away; chunked bodies are counted as they arrive and cut off at the limit.
+"""
+
+import json
+from typing import Dict, Optional
+
+from starlette.exceptions import HTTPException
+
+
+class BodyTooLarge(HTTPException):
+    """Raised from ``receive`` once a streamed body passes the limit.
+
+    An HTTPException, so FastAPI's body parsing re-raises it (rather than
+    turning it into a 400) and it is rendered as a 413.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body too large (max {limit} bytes)")
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware capping request bodies at ``max_bytes``.
+
+    ``path_limits`` overrides the cap for specific paths (e.g. streamed batch
+    uploads).
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    await self._reject(send, limit)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            if not response_started:
+                await self._reject(send, limit)
+
+    async def _reject(self, send, limit: int) -> None:
+        self.rejected += 1
+        body = json.dumps({"detail": f"Request body too large (max {limit} bytes)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,204 @@
+"""
+Typed request and response schemas for the API
+Request models forbid unknown fields and cap every string, so malformed or
+oversized input is rejected during decoding, before it reaches the keyword
+matcher, the emotion scorer or the LLM. Response models document the
+payloads in OpenAPI; handlers keep returning plain dicts or pre-serialized
+bytes, so responses aren't re-validated on the hot path.
+"""
+
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from settings import get_settings
+
+# Hard limits (characters); the request body size limit is enforced separately
+MAX_MESSAGE_CHARS = get_settings().max_message_chars
+MAX_TEXT_CHARS = get_settings().max_text_chars
+MAX_ID_CHARS = 64
+ID_PATTERN = r"^[A-Za-z0-9_.:@-]+$"
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+class Schema(BaseModel):
+    """Base for request bodies: unknown fields are errors, not silently carried along"""
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Requests
+
+class LoginRequest(Schema):
+    username: str = Field(min_length=1, max_length=64)
+    password: str = Field(min_length=1, max_length=128)
+
+
+class RegisterRequest(Schema):
+    username: str = Field(min_length=1, max_length=64)
+    email: str = Field(max_length=254, pattern=EMAIL_PATTERN)
+    password: str = Field(min_length=8, max_length=128)
+    name: str = Field("", max_length=100)
+
+
+class RefreshRequest(Schema):
+    refresh_token: str = Field(min_length=1, max_length=1024)
+
+
+class ChatRequest(Schema):
+    message: str = Field(min_length=1, max_length=MAX_MESSAGE_CHARS)
+    user_id: Optional[str] = Field(None, max_length=MAX_ID_CHARS, pattern=ID_PATTERN)
+
+
+class ChatSocketFrame(Schema):
+    """A client frame on the chat WebSocket"""
+    type: Literal["chat", "ping", "pong", "state"]
+    message: str = Field("", max_length=MAX_MESSAGE_CHARS)
+    ref: Optional[str] = Field(None, max_length=64)
+
+
+class EmotionRequest(Schema):
+    text: str = Field("", max_length=MAX_TEXT_CHARS)
+
+
+class MoodCheckIn(Schema):
+    mood: int = Field(ge=1, le=10)
+    notes: str = Field("", max_length=500)
+
+
+class AvatarRequest(Schema):
+    avatar_url: str = Field("", max_length=2048)
+
+
+class NotificationPreferences(Schema):
+    email: Optional[bool] = None
+    push: Optional[bool] = None
+    sms: Optional[bool] = None
+    weekly_summary: Optional[bool] = None
+
+
+class Preferences(Schema):
+    theme: Optional[str] = Field(None, max_length=20)
+    language: Optional[str] = Field(None, max_length=20)
+    timezone: Optional[str] = Field(None, max_length=64)
+    notifications: Optional[NotificationPreferences] = None
+
+
+class Privacy(Schema):
+    profile_visibility: Optional[Literal["public", "friends", "private"]] = None
+    show_online_status: Optional[bool] = None
+    allow_messages: Optional[bool] = None
+
+
+class ProfileUpdate(Schema):
+    """Editable profile fields; only the fields sent are applied.
+
+    ``version`` is the profile version the edit was made from; when sent,
+    the update is refused (409) if the profile has been changed since.
+    Username and email belong to the account, so sending them is a 422.
+    """
+
+    version: Optional[int] = Field(None, ge=0)
+
+    name: Optional[str] = Field(None, max_length=100)
+    bio: Optional[str] = Field(None, max_length=500)
+    avatar: Optional[str] = Field(None, max_length=2048)
+    location: Optional[str] = Field(None, max_length=100)
+    birthday: Optional[str] = Field(None, max_length=10, pattern=r"^\d{4}-\d{2}-\d{2}$")
+    occupation: Optional[str] = Field(None, max_length=100)
+    phone: Optional[str] = Field(None, max_length=32)
+    preferences: Optional[Preferences] = None
+    privacy: Optional[Privacy] = None
+
+
+# Responses (OpenAPI documentation only)
+
+class UserSummary(BaseModel):
+    id: str
+    username: str
+    email: str
+    name: str
+
+
+class AuthData(BaseModel):
+    user: UserSummary
+    access_token: str
+    refresh_token: str
+    token_type: str
+    expires_in: int
+
+
+class AuthResponse(BaseModel):
+    success: bool
+    message: str
+    data: AuthData
+
+
+class MediaSuggestion(BaseModel):
+    category: str
+    type: str
+    items: List[str]
+
+
+class CrisisResource(BaseModel):
+    name: str
+    contact: str
+
+
+class CrisisInfo(BaseModel):
+    level: str
+    resources: List[CrisisResource]
+
+
+class ChatMessage(BaseModel):
+    id: str
+    message: str
+    timestamp: float
+    sender: str
+    emotion_detected: Optional[str]
+    media: Optional[MediaSuggestion] = None
+    # Only on the reply to a crisis-flagged message (not stored in history)
+    crisis: Optional[CrisisInfo] = None
+
+
+class ChatResponse(BaseModel):
+    success: bool
+    data: ChatMessage
+
+
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatMessage]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+class ChatHistoryResponse(BaseModel):
+    success: bool
+    data: ChatHistoryPage
+
+
+class MediaSearchResults(BaseModel):
+    total: int
+    items: List[Dict[str, Any]]
+
+
+class MediaSearchResponse(BaseModel):
+    success: bool
+    data: MediaSearchResults
+
+
+class EmotionAnalysis(BaseModel):
+    emotion: str
+    confidence: float
+    emotions: Dict[str, float]
+    text: str
+
+
+class EmotionResponse(BaseModel):
+    success: bool
+    data: EmotionAnalysis
+
+
+def documented(model) -> dict:
+    """``responses=`` argument documenting a 200 body without validating it at runtime"""
+    return {200: {"model": model}}
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the backend
+Runs one worker process per available CPU core (override with --workers or
+WEB_CONCURRENCY; every option's default comes from settings.py), using uvloop and httptools when installed. With gunicorn
+installed the app is preloaded in the master so forked workers share its
+memory; otherwise uvicorn's own process manager is used. SIGTERM/SIGINT stop
+accepting connections and give in-flight requests up to --graceful-timeout
+seconds to finish (the app's lifespan then flushes queued chat history).
+WebSocket chat connections skip the server's own per-connection ping timers
+and compression (the app runs one shared heartbeat and frames are small), so
+idle sessions stay cheap.
+
+    python serve.py                 # production
+    python serve.py --reload        # development: one process, auto-reload
+"""
+
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+from settings import LOG_LEVELS, SERVERS, get_settings
+
+APP = "main:app"
+
+
+def is_installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def default_workers() -> int:
+    """Cores this process may run on (respects CPU affinity / container cpusets)"""
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def event_loop() -> str:
+    return "uvloop" if is_installed("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if is_installed("httptools") else "h11"
+
+
+def websocket_options() -> dict:
+    """uvicorn WebSocket settings: no per-connection pings or deflate state, frames capped like request bodies"""
+    return {
+        "ws_ping_interval": None,
+        "ws_ping_timeout": None,
+        "ws_per_message_deflate": False,
+        "ws_max_size": get_settings().max_request_bytes,
+    }
+
+
+def run_dev(args) -> None:
+    """Single process with auto-reload on code changes; never use in production"""
+    uvicorn.run(APP, host=args.host, port=args.port, reload=True, log_level=args.log_level, **websocket_options())
+
+
+def run_uvicorn(args) -> None:
+    if args.preload and args.workers > 1:
+        print("Note: preloading needs gunicorn; uvicorn workers each import the app")
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keepalive,
+        proxy_headers=True,
+        access_log=args.access_log,
+        log_level=args.log_level,
+        **websocket_options(),
+    )
+
+
+def run_gunicorn(args) -> None:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, **websocket_options()}
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                # UvicornWorker picks uvloop/httptools automatically when installed
+                "worker_class": Worker,
+                "preload_app": args.preload,
+                "graceful_timeout": args.graceful_timeout,
+                "timeout": max(args.graceful_timeout * 2, 60),
+                "keepalive": args.keepalive,
+                "max_requests": args.max_requests,
+                "max_requests_jitter": args.max_requests // 10,
+                "accesslog": "-" if args.access_log else None,
+                "loglevel": args.log_level,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    Application().run()
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency or default_workers(),
+                        help="worker processes (default: WEB_CONCURRENCY or one per core)")
+    parser.add_argument("--server", choices=SERVERS, default=settings.server,
+                        help="process manager (auto: gunicorn when installed)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="import the app in each worker instead of once in the master")
+    parser.add_argument("--graceful-timeout", type=int, default=settings.graceful_timeout_seconds,
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--keepalive", type=int, default=settings.keepalive_seconds)
+    parser.add_argument("--max-requests", type=int, default=settings.max_requests_per_worker,
+                        help="recycle a worker after this many requests (gunicorn only, 0 = never)")
+    parser.add_argument("--access-log", action="store_true", default=settings.access_log)
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default=settings.log_level)
+    parser.add_argument("--reload", action="store_true", help="development mode: one process, auto-reload")
+    args = parser.parse_args()
+
+    if args.reload:
+        run_dev(args)
+        return
+
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if is_installed("gunicorn") else "uvicorn"
+    print(f"Starting {args.workers} {server} worker(s) on {args.host}:{args.port} "
+          f"(loop={event_loop()}, http={http_protocol()}, preload={args.preload and server == 'gunicorn'})")
+    if server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
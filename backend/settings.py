@@ -0,0 +1,171 @@
+"""
+Application settings
+Every setting the backend reads from the environment (or backend/.env),
+parsed once into a frozen Settings object. Modules call get_settings()
+instead of reading os.environ themselves, so .env is loaded exactly once,
+before anything reads it, and a typo'd number fails at startup rather than
+on the first request that needs it.
+"""
+
+import os
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from typing import Mapping, Optional
+
+from dotenv import load_dotenv
+
+
+# Accepted by both uvicorn and gunicorn
+LOG_LEVELS = ("critical", "error", "warning", "info", "debug", "trace")
+SERVERS = ("auto", "gunicorn", "uvicorn")
+
+
+def env(name: str, default, secret: bool = False):
+    """Dataclass field read from the environment variable ``name``"""
+    return field(default=default, repr=not secret, metadata={"env": name})
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Upstream completions (llm_client.py)
+    openai_api_key: Optional[str] = env("OPENAI_API_KEY", None, secret=True)
+    openai_base_url: Optional[str] = env("OPENAI_BASE_URL", None)
+    openai_max_concurrency: int = env("OPENAI_MAX_CONCURRENCY", 16)
+    openai_max_queue: int = env("OPENAI_MAX_QUEUE", 256)
+    openai_priority_slots: int = env("OPENAI_PRIORITY_SLOTS", 2)
+    openai_timeout_seconds: float = env("OPENAI_TIMEOUT_SECONDS", 20.0)
+    openai_max_retries: int = env("OPENAI_MAX_RETRIES", 2)
+    openai_retry_backoff_seconds: float = env("OPENAI_RETRY_BACKOFF_SECONDS", 0.2)
+    openai_retry_backoff_max_seconds: float = env("OPENAI_RETRY_BACKOFF_MAX_SECONDS", 2.0)
+    openai_circuit_failure_threshold: int = env("OPENAI_CIRCUIT_FAILURE_THRESHOLD", 5)
+    openai_circuit_reset_seconds: float = env("OPENAI_CIRCUIT_RESET_SECONDS", 30.0)
+
+    # Completion cache
+    completion_cache_backend: str = env("COMPLETION_CACHE_BACKEND", "memory")
+    completion_cache_max_entries: int = env("COMPLETION_CACHE_MAX_ENTRIES", 2048)
+    completion_cache_ttl_seconds: float = env("COMPLETION_CACHE_TTL_SECONDS", 600.0)
+    completion_cache_max_entry_bytes: int = env("COMPLETION_CACHE_MAX_ENTRY_BYTES", 4096)
+    redis_url: Optional[str] = env("REDIS_URL", None)
+
+    # Chat history and stats
+    chat_db_path: str = env("CHAT_DB_PATH", "chat_history.db")
+    chat_write_batch_size: int = env("CHAT_WRITE_BATCH_SIZE", 256)
+    chat_write_flush_seconds: float = env("CHAT_WRITE_FLUSH_SECONDS", 0.05)
+    stats_session_gap_seconds: float = env("STATS_SESSION_GAP_SECONDS", 1800.0)
+    stats_rolling_days: int = env("STATS_ROLLING_DAYS", 7)
+
+    # User profiles (stored in the chat database, cached per worker)
+    profile_cache_ttl_seconds: float = env("PROFILE_CACHE_TTL_SECONDS", 30.0)
+    profile_cache_max_entries: int = env("PROFILE_CACHE_MAX_ENTRIES", 10000)
+
+    # Conversation context and prompt
+    chat_context_max_turns: int = env("CHAT_CONTEXT_MAX_TURNS", 12)
+    chat_context_token_budget: int = env("CHAT_CONTEXT_TOKEN_BUDGET", 1000)
+    chat_context_summary_tokens: int = env("CHAT_CONTEXT_SUMMARY_TOKENS", 200)
+    chat_prompt_version: Optional[str] = env("CHAT_PROMPT_VERSION", None)
+
+    # Authentication
+    secret_key: Optional[str] = env("SECRET_KEY", None, secret=True)
+    auth_db_path: Optional[str] = env("AUTH_DB_PATH", None)
+    access_token_ttl_seconds: float = env("ACCESS_TOKEN_TTL_SECONDS", 3600.0)
+    refresh_token_ttl_seconds: float = env("REFRESH_TOKEN_TTL_SECONDS", 1209600.0)
+    auth_claims_cache_size: int = env("AUTH_CLAIMS_CACHE_SIZE", 10000)
+    auth_hash_concurrency: int = env("AUTH_HASH_CONCURRENCY", 2)
+    auth_required: bool = env("AUTH_REQUIRED", False)
+    demo_user_enabled: bool = env("DEMO_USER_ENABLED", False)
+
+    # Rate limits and upstream token budget
+    rate_limit_backend: str = env("RATE_LIMIT_BACKEND", "memory")
+    rate_limit_window_seconds: float = env("RATE_LIMIT_WINDOW_SECONDS", 60.0)
+    rate_limit_chat_per_user: int = env("RATE_LIMIT_CHAT_PER_USER", 30)
+    rate_limit_chat_per_ip: int = env("RATE_LIMIT_CHAT_PER_IP", 120)
+    rate_limit_emotion_per_user: int = env("RATE_LIMIT_EMOTION_PER_USER", 120)
+    rate_limit_emotion_per_ip: int = env("RATE_LIMIT_EMOTION_PER_IP", 600)
+    upstream_token_budget: float = env("UPSTREAM_TOKEN_BUDGET", 30000.0)
+    upstream_tokens_per_minute: float = env("UPSTREAM_TOKENS_PER_MINUTE", 1000.0)
+
+    # Input limits
+    max_request_bytes: int = env("MAX_REQUEST_BYTES", 65536)
+    emotion_batch_max_bytes: int = env("EMOTION_BATCH_MAX_BYTES", 16777216)
+    emotion_batch_max_size: int = env("EMOTION_BATCH_MAX_SIZE", 1000)
+    max_message_chars: int = env("MAX_MESSAGE_CHARS", 4000)
+    max_text_chars: int = env("MAX_TEXT_CHARS", 10000)
+
+    # WebSocket chat
+    ws_max_connections: int = env("WS_MAX_CONNECTIONS", 10000)
+    ws_heartbeat_seconds: float = env("WS_HEARTBEAT_SECONDS", 30.0)
+    ws_send_timeout_seconds: float = env("WS_SEND_TIMEOUT_SECONDS", 10.0)
+
+    # Crisis messages: bound on the priority-lane upstream reply before answering locally
+    crisis_reply_timeout_seconds: float = env("CRISIS_REPLY_TIMEOUT_SECONDS", 3.0)
+
+    # Hashed n-gram classifier for fallback intents and chat emotions
+    intent_classifier_enabled: bool = env("INTENT_CLASSIFIER_ENABLED", True)
+    intent_model_path: str = env(
+        "INTENT_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "intent_classifier-v1.bin"))
+    intent_min_confidence: float = env("INTENT_MIN_CONFIDENCE", 0.6)
+
+    # Local fallback replies and media suggestions
+    fallback_catalog_path: Optional[str] = env("FALLBACK_CATALOG_PATH", None)
+    fallback_seed: int = env("FALLBACK_SEED", 0)
+    media_catalog_path: Optional[str] = env("MEDIA_CATALOG_PATH", None)
+    media_suggestion_limit: int = env("MEDIA_SUGGESTION_LIMIT", 3)
+
+    # Server (serve.py; python main.py uses the host and port)
+    host: str = env("HOST", "0.0.0.0")
+    port: int = env("PORT", 8001)
+    server: str = env("SERVER", "auto")
+    web_concurrency: int = env("WEB_CONCURRENCY", 0)  # worker processes, 0 = one per core
+    graceful_timeout_seconds: int = env("GRACEFUL_TIMEOUT_SECONDS", 30)
+    keepalive_seconds: int = env("KEEPALIVE_SECONDS", 5)
+    max_requests_per_worker: int = env("MAX_REQUESTS_PER_WORKER", 0)
+    access_log: bool = env("ACCESS_LOG", False)
+    log_level: str = env("LOG_LEVEL", "info")
+
+    def __post_init__(self):
+        """Reject server settings out of range, naming the variable"""
+        checks = [
+            ("PORT", self.port, 1 <= self.port <= 65535, "between 1 and 65535"),
+            ("SERVER", self.server, self.server in SERVERS, f"one of {', '.join(SERVERS)}"),
+            ("WEB_CONCURRENCY", self.web_concurrency, self.web_concurrency >= 0, "0 or more"),
+            ("GRACEFUL_TIMEOUT_SECONDS", self.graceful_timeout_seconds, self.graceful_timeout_seconds >= 0,
+             "0 or more"),
+            ("KEEPALIVE_SECONDS", self.keepalive_seconds, self.keepalive_seconds >= 0, "0 or more"),
+            ("MAX_REQUESTS_PER_WORKER", self.max_requests_per_worker, self.max_requests_per_worker >= 0, "0 or more"),
+            ("LOG_LEVEL", self.log_level, self.log_level in LOG_LEVELS, f"one of {', '.join(LOG_LEVELS)}"),
+        ]
+        for name, value, valid, expected in checks:
+            if not valid:
+                raise ValueError(f"{name} must be {expected}, got {value!r}")
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str]) -> "Settings":
+        """Parse settings from ``environ``; unset or empty variables keep their defaults.
+
+        Booleans are true only for "true" (any case). Raises ValueError
+        naming the variable when a number doesn't parse or a server
+        setting is out of range.
+        """
+        values = {}
+        for f in fields(cls):
+            name = f.metadata["env"]
+            raw = environ.get(name)
+            if raw is None or raw == "":
+                continue
+            if f.type is bool:
+                values[f.name] = raw.strip().lower() == "true"
+            elif f.type in (int, float):
+                try:
+                    values[f.name] = f.type(raw)
+                except ValueError:
+                    raise ValueError(f"{name} must be a number, got {raw!r}") from None
+            else:
+                values[f.name] = raw
+        return cls(**values)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings for this process: backend/.env (if any) under the real environment, read once"""
+    load_dotenv()
+    return Settings.from_env(os.environ)
@@ -0,0 +1,433 @@
+"""
+Per-user wellness stats maintained incrementally
+Chat messages, media suggestions and mood check-ins update a small per-user
+aggregate (running sums, session and streak counters, a rolling window of
+daily mood buckets) as they are written, so reading a user's stats is one
+primary-key lookup instead of a scan of their history. ``backfill`` rebuilds
+every aggregate from the raw events with NumPy and yields the same numbers.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from chat_store import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+# Media replies stored before suggestions had their own column
+LEGACY_MEDIA_PREFIX = "MEDIA_SUGGESTION:"
+
+# Display names for media categories (favorite_activity)
+ACTIVITY_LABELS = {
+    'relaxation': "Relaxation",
+    'meditation': "Meditation",
+    'nature': "Nature Sounds",
+    'music': "Music",
+    'therapy': "Guided Therapy",
+}
+
+# (achievement, aggregate field or media category, threshold)
+ACHIEVEMENTS = [
+    ("First Session Complete", "sessions", 1),
+    ("7-Day Streak", "best_streak", 7),
+    ("30-Day Streak", "best_streak", 30),
+    ("Mood Tracker Pro", "mood_count", 10),
+    ("Meditation Master", "meditation", 10),
+]
+
+
+def day_of(timestamp: float) -> int:
+    """UTC day number"""
+    return int(timestamp // DAY)
+
+
+def iso_date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+class UserStats:
+    """One user's aggregate; every update is O(1)"""
+
+    __slots__ = ("sessions", "active_seconds", "last_activity", "last_day", "streak", "best_streak",
+                 "mood_sum", "mood_count", "daily_moods", "recent_moods", "activities")
+
+    def __init__(self):
+        self.sessions = 0
+        self.active_seconds = 0.0
+        self.last_activity: Optional[float] = None
+        self.last_day: Optional[int] = None
+        self.streak = 0
+        self.best_streak = 0
+        self.mood_sum = 0.0
+        self.mood_count = 0
+        # day -> [mood sum, check-ins], only the last rolling_days days
+        self.daily_moods: Dict[int, list] = {}
+        # [timestamp, mood, notes], oldest first
+        self.recent_moods: List[list] = []
+        # media category -> suggestions
+        self.activities: Dict[str, int] = {}
+
+    def mark_day(self, day: int) -> None:
+        if self.last_day is None or day > self.last_day + 1:
+            self.streak = 1
+        elif day == self.last_day + 1:
+            self.streak += 1
+        else:
+            return
+        self.last_day = day
+        self.best_streak = max(self.best_streak, self.streak)
+
+    def add_message(self, timestamp: float, session_gap: float) -> None:
+        """A user chat message: extends the current session or starts a new one"""
+        if self.last_activity is None or timestamp - self.last_activity > session_gap:
+            self.sessions += 1
+        elif timestamp >= self.last_activity:
+            self.active_seconds += timestamp - self.last_activity
+        else:
+            # Out of order (another worker's earlier message): counts for the day only
+            self.mark_day(day_of(timestamp))
+            return
+        self.last_activity = timestamp
+        self.mark_day(day_of(timestamp))
+
+    def add_mood(self, timestamp: float, mood: float, notes: str, rolling_days: int, recent: int) -> None:
+        day = day_of(timestamp)
+        self.mood_sum += mood
+        self.mood_count += 1
+        bucket = self.daily_moods.setdefault(day, [0.0, 0])
+        bucket[0] += mood
+        bucket[1] += 1
+        newest = max(self.daily_moods)
+        if min(self.daily_moods) <= newest - rolling_days:
+            self.daily_moods = {d: b for d, b in self.daily_moods.items() if d > newest - rolling_days}
+        self.recent_moods.append([timestamp, mood, notes])
+        if len(self.recent_moods) > recent:
+            self.recent_moods.sort(key=lambda entry: entry[0])
+            del self.recent_moods[:-recent]
+        self.mark_day(day)
+
+    def add_media(self, category: str) -> None:
+        self.activities[category] = self.activities.get(category, 0) + 1
+
+    def to_json(self) -> str:
+        return json.dumps({name: getattr(self, name) for name in self.__slots__}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "UserStats":
+        stats = cls()
+        for name, value in json.loads(data).items():
+            setattr(stats, name, value)
+        # JSON object keys are strings
+        stats.daily_moods = {int(day): bucket for day, bucket in stats.daily_moods.items()}
+        return stats
+
+    def snapshot(self, now: float, rolling_days: int) -> Dict[str, Any]:
+        """The stats payload served by /api/v1/profile/{user_id}/stats"""
+        today = day_of(now)
+        current_streak = self.streak if self.last_day is not None and self.last_day >= today - 1 else 0
+        window = [bucket for day, bucket in self.daily_moods.items() if day > today - rolling_days]
+        window_count = sum(count for _, count in window)
+        favorite = max(self.activities, key=self.activities.get) if self.activities else None
+        counters = {"sessions": self.sessions, "best_streak": self.best_streak, "mood_count": self.mood_count,
+                    **self.activities}
+        return {
+            "total_sessions": self.sessions,
+            "streak_days": current_streak,
+            "best_streak": self.best_streak,
+            "total_minutes": round(self.active_seconds / 60),
+            "mood_average": round(self.mood_sum / self.mood_count, 1) if self.mood_count else None,
+            f"mood_average_{rolling_days}d":
+                round(sum(total for total, _ in window) / window_count, 1) if window_count else None,
+            "mood_checkins": self.mood_count,
+            "favorite_activity": ACTIVITY_LABELS.get(favorite, favorite.title()) if favorite else None,
+            "achievements": [name for name, counter, threshold in ACHIEVEMENTS
+                             if counters.get(counter, 0) >= threshold],
+            "recent_moods": [{"date": iso_date(ts), "mood": mood, "notes": notes}
+                             for ts, mood, notes in reversed(self.recent_moods)],
+        }
+
+
+class SQLiteStatsStore:
+    """Mood check-ins and per-user aggregates in SQLite (WAL), one connection per thread.
+
+    Shares the chat history database, whose ``messages`` table (with the
+    ``mood_checkins`` table here) holds the raw events ``backfill`` reads.
+    Each batch is applied inside one BEGIN IMMEDIATE transaction, so
+    read-modify-write of an aggregate is safe across worker processes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mood_checkins (
+            seq INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            mood INTEGER NOT NULL,
+            notes TEXT NOT NULL,
+            timestamp REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_mood_checkins_user_timestamp
+            ON mood_checkins (user_id, timestamp, seq);
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # Throwaway connection, so nothing is inherited by forked workers
+        with closing(sqlite3.connect(self.path)) as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def load(self, user_id: str) -> Optional[UserStats]:
+        row = self._connection().execute("SELECT data FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+        return UserStats.from_json(row[0]) if row else None
+
+    def apply_batch(self, events: List[Dict[str, Any]], apply) -> None:
+        """Store mood check-ins and fold ``events`` into their users' aggregates"""
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_user.setdefault(event["user_id"], []).append(event)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO mood_checkins (user_id, mood, notes, timestamp) VALUES (:user_id, :mood, :notes, :timestamp)",
+                [event for event in events if event["kind"] == "mood"],
+            )
+            now = time.time()
+            rows = []
+            for user_id, user_events in by_user.items():
+                row = connection.execute("SELECT data FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+                stats = UserStats.from_json(row[0]) if row else UserStats()
+                for event in user_events:
+                    apply(stats, event)
+                rows.append((user_id, stats.to_json(), now))
+            connection.executemany(
+                "INSERT INTO user_stats (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                rows,
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def read_events(self, anonymous: str):
+        """Raw events for a backfill: (message rows, media rows, mood rows)"""
+        connection = self._connection()
+        messages = connection.execute(
+            "SELECT user_id, timestamp FROM messages WHERE sender = 'user' AND user_id != ?", (anonymous,)).fetchall()
+        media = [
+            (user_id, json.loads(suggestion)["category"] if suggestion else
+             message[len(LEGACY_MEDIA_PREFIX):].split(":", 1)[0])
+            for user_id, message, suggestion in connection.execute(
+                "SELECT user_id, message, media FROM messages WHERE sender = 'assistant' AND user_id != ? "
+                "AND (media IS NOT NULL OR message LIKE ?)", (anonymous, LEGACY_MEDIA_PREFIX + "%"))
+        ]
+        moods = connection.execute(
+            "SELECT user_id, timestamp, mood, notes FROM mood_checkins ORDER BY user_id, timestamp, seq").fetchall()
+        return messages, media, moods
+
+    def replace_all(self, aggregates: Dict[str, UserStats]) -> None:
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM user_stats")
+            connection.executemany(
+                "INSERT INTO user_stats (user_id, data, updated_at) VALUES (?, ?, ?)",
+                [(user_id, stats.to_json(), now) for user_id, stats in aggregates.items()],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+def _group_bounds(codes: np.ndarray) -> np.ndarray:
+    """Start index of each run of equal values in sorted ``codes``"""
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+def build_aggregates(messages: Iterable, media: Iterable, moods: Iterable, session_gap: float,
+                     rolling_days: int, recent: int) -> Dict[str, UserStats]:
+    """Aggregates for every user from raw events, computed column-wise.
+
+    ``messages`` are (user_id, timestamp) rows for user chat messages,
+    ``media`` (user_id, category) rows for media suggestions and ``moods``
+    (user_id, timestamp, mood, notes) rows for check-ins. Matches applying
+    the events one by one in timestamp order.
+    """
+    messages, moods = list(messages), list(moods)
+    users = sorted({row[0] for row in messages} | {row[0] for row in moods} | {row[0] for row in media})
+    aggregates = {user_id: UserStats() for user_id in users}
+    index = {user_id: i for i, user_id in enumerate(users)}
+
+    # Sessions: per-user gaps between consecutive messages
+    if messages:
+        m_user = np.fromiter((index[row[0]] for row in messages), dtype=np.int64, count=len(messages))
+        m_ts = np.fromiter((row[1] for row in messages), dtype=np.float64, count=len(messages))
+        order = np.lexsort((m_ts, m_user))
+        m_user, m_ts = m_user[order], m_ts[order]
+        gaps = np.diff(m_ts, prepend=m_ts[0])
+        new_session = np.r_[True, m_user[1:] != m_user[:-1]] | (gaps > session_gap)
+        sessions = np.bincount(m_user[new_session], minlength=len(users))
+        active = np.bincount(m_user[~new_session], weights=gaps[~new_session], minlength=len(users))
+        last_activity = m_ts[np.r_[_group_bounds(m_user)[1:], len(m_user)] - 1]
+        for position, user in enumerate(m_user[_group_bounds(m_user)]):
+            stats = aggregates[users[user]]
+            stats.last_activity = float(last_activity[position])
+        for user in np.flatnonzero(sessions):
+            aggregates[users[user]].sessions = int(sessions[user])
+            aggregates[users[user]].active_seconds = float(active[user])
+
+    # Streaks: runs of consecutive active days (messages or check-ins)
+    day_rows = [(index[row[0]], day_of(row[1])) for row in messages] + [(index[row[0]], day_of(row[1])) for row in moods]
+    if day_rows:
+        pairs = np.unique(np.array(day_rows, dtype=np.int64), axis=0)
+        d_user, d_day = pairs[:, 0], pairs[:, 1]
+        breaks = np.r_[True, (d_user[1:] != d_user[:-1]) | (d_day[1:] != d_day[:-1] + 1)]
+        run_starts = np.flatnonzero(breaks)
+        run_lengths = np.diff(np.r_[run_starts, len(d_day)])
+        run_users = d_user[run_starts]
+        user_runs = _group_bounds(run_users)
+        best = np.maximum.reduceat(run_lengths, user_runs)
+        last_run = np.r_[user_runs[1:], len(run_users)] - 1
+        last_day = d_day[np.r_[_group_bounds(d_user)[1:], len(d_user)] - 1]
+        for position, user in enumerate(run_users[user_runs]):
+            stats = aggregates[users[user]]
+            stats.best_streak = int(best[position])
+            stats.streak = int(run_lengths[last_run[position]])
+            stats.last_day = int(last_day[position])
+
+    # Moods: running sums, a rolling window of daily buckets, the latest few entries
+    if moods:
+        o_user = np.fromiter((index[row[0]] for row in moods), dtype=np.int64, count=len(moods))
+        o_ts = np.fromiter((row[1] for row in moods), dtype=np.float64, count=len(moods))
+        o_mood = np.fromiter((row[2] for row in moods), dtype=np.float64, count=len(moods))
+        order = np.lexsort((o_ts, o_user))
+        o_user, o_ts, o_mood = o_user[order], o_ts[order], o_mood[order]
+        o_day = (o_ts // DAY).astype(np.int64)
+        sums = np.bincount(o_user, weights=o_mood, minlength=len(users))
+        counts = np.bincount(o_user, minlength=len(users))
+        starts = _group_bounds(o_user)
+        ends = np.r_[starts[1:], len(o_user)]
+        newest_day = np.maximum.reduceat(o_day, starts)
+        for position, user in enumerate(o_user[starts]):
+            stats = aggregates[users[user]]
+            stats.mood_sum = float(sums[user])
+            stats.mood_count = int(counts[user])
+            start, end = starts[position], ends[position]
+            in_window = np.flatnonzero(o_day[start:end] > newest_day[position] - rolling_days) + start
+            for day, mood in zip(o_day[in_window].tolist(), o_mood[in_window].tolist()):
+                bucket = stats.daily_moods.setdefault(day, [0.0, 0])
+                bucket[0] += mood
+                bucket[1] += 1
+            stats.recent_moods = [[float(o_ts[i]), moods[order[i]][2], moods[order[i]][3]]
+                                  for i in range(max(start, end - recent), end)]
+
+    for user_id, category in media:
+        aggregates[user_id].add_media(category)
+    return aggregates
+
+
+class StatsEngine(WriteBehindQueue):
+    """Incremental per-user stats with a write-behind queue.
+
+    Events are folded into the stored aggregates in batches; reading a
+    user's stats flushes that user's queued events first, then loads one row.
+    ``session_gap`` seconds of silence end a chat session, and the rolling
+    mood average covers the last ``rolling_days`` days.
+    """
+
+    label = "stats events"
+
+    def __init__(self, store: SQLiteStatsStore, session_gap: float = 1800, rolling_days: int = 7,
+                 recent_moods: int = 3, batch_size: int = 256, flush_interval: float = 0.05):
+        super().__init__(batch_size, flush_interval)
+        self.store = store
+        self.session_gap = session_gap
+        self.rolling_days = rolling_days
+        self.recent_moods = recent_moods
+        self.reads = 0
+
+    def apply(self, stats: UserStats, event: Dict[str, Any]) -> None:
+        kind = event["kind"]
+        if kind == "message":
+            stats.add_message(event["timestamp"], self.session_gap)
+        elif kind == "mood":
+            stats.add_mood(event["timestamp"], event["mood"], event["notes"], self.rolling_days, self.recent_moods)
+        elif kind == "media":
+            stats.add_media(event["category"])
+
+    def _write(self, events: List[Dict[str, Any]]) -> None:
+        self.store.apply_batch(events, self.apply)
+
+    def record_message(self, user_id: str, sender: str, timestamp: float, media: Optional[Dict[str, Any]] = None) -> None:
+        """Fold a stored chat message (and its media suggestion, if any) into the user's stats"""
+        if sender == "user":
+            self.record({"kind": "message", "user_id": user_id, "timestamp": timestamp})
+        elif media:
+            self.record({"kind": "media", "user_id": user_id, "category": media["category"]})
+
+    def record_mood(self, user_id: str, mood: float, notes: str, timestamp: float) -> None:
+        self.record({"kind": "mood", "user_id": user_id, "mood": mood, "notes": notes, "timestamp": timestamp})
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        """The user's stats payload (zeros for users without any events)"""
+        if self._pending_users.get(user_id):
+            await self.flush()
+        stats = await run_in_threadpool(self.store.load, user_id)
+        self.reads += 1
+        return (stats or UserStats()).snapshot(time.time(), self.rolling_days)
+
+    def backfill(self, anonymous: str = "anonymous") -> int:
+        """Rebuild every aggregate from the raw events; returns the number of users.
+
+        Run it with the app stopped: events written while it runs may be
+        counted twice (once in the rebuild, once by the incremental writer).
+        """
+        messages, media, moods = self.store.read_events(anonymous)
+        aggregates = build_aggregates(messages, media, moods, self.session_gap, self.rolling_days, self.recent_moods)
+        self.store.replace_all(aggregates)
+        logger.info("Rebuilt stats for %d users from %d messages and %d check-ins",
+                    len(aggregates), len(messages), len(moods))
+        return len(aggregates)
+
+    async def close(self) -> None:
+        await super().close()
+        self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "reads": self.reads}
@@ -1,16 +1,25 @@
 #!/usr/bin/env python3
 """
 Simple test script for AI Mental Health Assistant backend
-Run this to verify all endpoints are working properly
+Run this to verify all endpoints are working properly (start the server
+with DEMO_USER_ENABLED=true; the auth tests log in as demo/password)
 """
 
 import requests
+import asyncio
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 BASE_URL = "http://localhost:8001"
-TEST_USER_ID = "demo-user-id"
+
+def guest_session():
+    """Token pair and user of a new guest"""
+    return requests.post(f"{BASE_URL}/api/v1/auth/guest").json()['data']
+
+def bearer(session):
+    return {"Authorization": f"Bearer {session['access_token']}"}
 
 def test_health_check():
     """Test health check endpoint"""
@@ -28,6 +37,25 @@ def test_health_check():
         print(f"❌ Health check error: {e}")
         return False
 
+def test_readiness():
+    """Test readiness endpoint (ready once the worker's warm-up has finished)"""
+    print("\n🚦 Testing readiness...")
+    try:
+        for _ in range(50):
+            response = requests.get(f"{BASE_URL}/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(0.1)
+        data = response.json()
+        if response.status_code == 200 and data['ready'] and not data['errors']:
+            print(f"✅ Ready after {data['seconds']}s warm-up: {data['steps_ms']}")
+            return True
+        print(f"❌ Not ready: {response.status_code} {data}")
+        return False
+    except Exception as e:
+        print(f"❌ Readiness error: {e}")
+        return False
+
 def test_authentication():
     """Test authentication endpoints"""
     print("\n🔐 Testing authentication...")
@@ -48,6 +76,78 @@ def test_authentication():
         print(f"❌ Login error: {e}")
         return False
 
+def test_token_auth():
+    """Test bearer tokens, refresh rotation and refresh reuse detection"""
+    print("\n🔑 Testing token auth...")
+    try:
+        login = requests.post(f"{BASE_URL}/api/v1/auth/login", json={"username": "demo", "password": "password"})
+        session = login.json()['data']
+        headers = {"Authorization": f"Bearer {session['access_token']}"}
+        
+        authed = requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "Hi"}, headers=headers)
+        forged = requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "Hi"},
+                               headers={"Authorization": f"Bearer {session['access_token']}x"})
+        other = requests.get(f"{BASE_URL}/api/v1/chat/history", params={"user_id": "someone-else"}, headers=headers)
+        # An account's data needs its token, even when the id is known
+        account_id = session['user']['id']
+        anonymous = [
+            requests.get(f"{BASE_URL}/api/v1/chat/history", params={"user_id": account_id}).status_code,
+            requests.get(f"{BASE_URL}/api/v1/profile/{account_id}/stats").status_code,
+            requests.patch(f"{BASE_URL}/api/v1/profile/{account_id}", json={"bio": "hacked"}).status_code,
+        ]
+        # ...and a signed-in user can't act on the shared anonymous profile
+        shared = [
+            requests.patch(f"{BASE_URL}/api/v1/profile/anonymous", json={"bio": "hacked"}, headers=headers).status_code,
+            requests.post(f"{BASE_URL}/api/v1/profile/anonymous/moods", json={"mood": 1}, headers=headers).status_code,
+        ]
+        rotated = requests.post(f"{BASE_URL}/api/v1/auth/refresh", json={"refresh_token": session['refresh_token']})
+        reused = requests.post(f"{BASE_URL}/api/v1/auth/refresh", json={"refresh_token": session['refresh_token']})
+        
+        print(f"   Authed: {authed.status_code}, forged: {forged.status_code}, other user: {other.status_code}, "
+              f"refresh: {rotated.status_code}, reuse: {reused.status_code}, anonymous as account: {anonymous}, "
+              f"account as anonymous: {shared}")
+        if (authed.status_code, forged.status_code, other.status_code, rotated.status_code,
+                reused.status_code) == (200, 401, 403, 200, 401) and anonymous == [401, 401, 401] and shared == [403, 403]:
+            print("✅ Tokens verified and refresh tokens rotated")
+            return True
+        print("❌ Unexpected token auth behaviour")
+        return False
+    except Exception as e:
+        print(f"❌ Token auth error: {e}")
+        return False
+
+def test_guest_sessions():
+    """Test that a guest id is usable only with the guest's token"""
+    print("\n🎫 Testing guest sessions...")
+    try:
+        guest, other = guest_session(), guest_session()
+        guest_id = guest['user']['id']
+        profile_url = f"{BASE_URL}/api/v1/profile/{guest_id}"
+        own = requests.patch(profile_url, json={"bio": "mine"}, headers=bearer(guest)).status_code
+        # Knowing a guest's id is not enough, and nobody can write the shared anonymous profile
+        tokenless = [
+            requests.get(f"{BASE_URL}/api/v1/chat/history", params={"user_id": guest_id}).status_code,
+            requests.patch(profile_url, json={"bio": "hacked"}).status_code,
+            requests.post(f"{profile_url}/moods", json={"mood": 1}).status_code,
+            requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "Hi", "user_id": guest_id}).status_code,
+            requests.patch(f"{BASE_URL}/api/v1/profile/anonymous", json={"bio": "hacked"}).status_code,
+        ]
+        other_guest = requests.patch(profile_url, json={"bio": "hacked"}, headers=bearer(other)).status_code
+        refreshed = requests.post(f"{BASE_URL}/api/v1/auth/refresh", json={"refresh_token": guest['refresh_token']})
+        
+        print(f"   Guest: {guest_id}, own update: {own}, without token: {tokenless}, other guest: {other_guest}, "
+              f"refresh: {refreshed.status_code}")
+        if (guest_id.startswith("guest-") and guest_id != other['user']['id'] and own == 200
+                and tokenless == [401] * 5 and other_guest == 403 and refreshed.status_code == 200
+                and refreshed.json()['data']['user']['id'] == guest_id):
+            print("✅ Guest ids need their guest token")
+            return True
+        print("❌ Guest ids usable without their token")
+        return False
+    except Exception as e:
+        print(f"❌ Guest session error: {e}")
+        return False
+
 def test_chat():
     """Test chat functionality"""
     print("\n💬 Testing chat...")
@@ -70,12 +170,186 @@ def test_chat():
         print(f"❌ Chat error: {e}")
         return False
 
+def test_negated_emotion():
+    """Test that a negated feeling isn't read as the feeling itself"""
+    print("\n🙃 Testing negated emotion...")
+    try:
+        response = requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "I'm not happy"})
+        if response.status_code != 200:
+            print(f"❌ Chat failed: {response.status_code}")
+            return False
+        emotion = response.json()['data']['emotion_detected']
+        if emotion != "sadness":
+            print(f"❌ 'I'm not happy' detected as {emotion}")
+            return False
+        print(f"✅ Negated emotion detected as {emotion}")
+        return True
+    except Exception as e:
+        print(f"❌ Negated emotion error: {e}")
+        return False
+
+def test_crisis_response():
+    """Test that crisis messages come back flagged, with resources"""
+    print("\n🆘 Testing crisis response...")
+    try:
+        response = requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "I want to end my life"})
+        if response.status_code != 200:
+            print(f"❌ Chat failed: {response.status_code}")
+            return False
+        crisis = response.json()['data'].get('crisis')
+        emotion = response.json()['data']['emotion_detected']
+        if not crisis or crisis['level'] != "high" or not crisis['resources']:
+            print(f"❌ Crisis message not flagged: {crisis}")
+            return False
+        if emotion in ("neutral", "joy"):
+            print(f"❌ Crisis message recorded as {emotion}")
+            return False
+        print(f"✅ Crisis flagged ({crisis['level']}, {emotion}) with {len(crisis['resources'])} resources")
+        return True
+    except Exception as e:
+        print(f"❌ Crisis response error: {e}")
+        return False
+
+def test_websocket_chat():
+    """Test chat over a persistent WebSocket"""
+    print("\n🔌 Testing WebSocket chat...")
+    try:
+        from websockets.sync.client import connect
+        
+        url = BASE_URL.replace("http", "ws", 1) + f"/api/v1/chat/ws?token={guest_session()['access_token']}"
+        with connect(url) as ws:
+            ready = json.loads(ws.recv(timeout=10))
+            events = []
+            for n in range(2):
+                ws.send(json.dumps({"type": "chat", "message": "I've been feeling stressed lately", "ref": str(n)}))
+                while True:
+                    frame = json.loads(ws.recv(timeout=30))
+                    events.append(frame['event'])
+                    if frame['event'] in ('done', 'error'):
+                        break
+            ws.send(json.dumps({"type": "state"}))
+            state = json.loads(ws.recv(timeout=10))['data']
+            ws.send(json.dumps({"type": "bogus"}))
+            invalid = json.loads(ws.recv(timeout=10))
+        
+        print(f"   Ready: {ready['data']}, events: {events}, turns: {state['turns']}")
+        if (ready['event'] == 'ready' and events.count('done') == 2 and 'delta' in events
+                and state['turns'] == 2 and invalid['event'] == 'error'):
+            print("✅ WebSocket chat turns streamed over one connection")
+            return True
+        print("❌ Unexpected WebSocket frames")
+        return False
+    except Exception as e:
+        print(f"❌ WebSocket chat error: {e}")
+        return False
+
+def test_chat_history():
+    """Test that sent messages show up in paginated chat history"""
+    print("\n🗂️  Testing chat history...")
+    try:
+        headers = bearer(guest_session())
+        for text in ["First message", "Second message"]:
+            requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": text}, headers=headers)
+        
+        response = requests.get(f"{BASE_URL}/api/v1/chat/history", params={"limit": 2}, headers=headers)
+        if response.status_code != 200:
+            print(f"❌ Chat history failed: {response.status_code}")
+            return False
+        
+        page = response.json()['data']
+        older = requests.get(
+            f"{BASE_URL}/api/v1/chat/history",
+            params={"limit": 2, "cursor": page['next_cursor']}, headers=headers
+        ).json()['data']
+        total = len(page['messages']) + len(older['messages'])
+        
+        # Anonymous chats aren't stored, and there is no history without a token
+        requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "Anonymous message"})
+        anonymous = requests.get(f"{BASE_URL}/api/v1/chat/history")
+        if anonymous.status_code != 401:
+            print(f"❌ Token-less chat history returned {anonymous.status_code}")
+            return False
+        
+        if total == 4 and older['messages'][-1]['message'] == "First message":
+            print(f"✅ Chat history returned {total} messages across 2 pages (token-less read: 401)")
+            return True
+        else:
+            print(f"❌ Unexpected chat history: {total} messages")
+            return False
+    except Exception as e:
+        print(f"❌ Chat history error: {e}")
+        return False
+
+def test_chat_stream():
+    """Test streaming chat endpoint"""
+    print("\n📡 Testing streaming chat...")
+    try:
+        chat_data = {"message": "Hello! How are you today?"}
+        start = time.time()
+        first_event = None
+        events = []
+        with requests.post(f"{BASE_URL}/api/v1/chat/stream", json=chat_data, stream=True) as response:
+            if response.status_code != 200:
+                print(f"❌ Streaming chat failed: {response.status_code}")
+                return False
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("event: "):
+                    if first_event is None:
+                        first_event = time.time() - start
+                    events.append(line[len("event: "):])
+        
+        if events and events[0] == "emotion" and events[-1] == "done":
+            print(f"✅ Stream received: {len(events)} events")
+            print(f"   First event after: {first_event * 1000:.0f}ms")
+            return True
+        else:
+            print(f"❌ Unexpected event sequence: {events}")
+            return False
+    except Exception as e:
+        print(f"❌ Streaming chat error: {e}")
+        return False
+
+def test_concurrent_chat():
+    """Test that concurrent chats don't stall other requests"""
+    print("\n⚡ Testing concurrent chat...")
+    try:
+        chat_data = {"message": "I had a long day at work today"}
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            chats = [pool.submit(requests.post, f"{BASE_URL}/api/v1/chat/send", json=chat_data) for _ in range(8)]
+            
+            # Health must stay responsive while the chats are in flight
+            start = time.time()
+            health = requests.get(f"{BASE_URL}/health")
+            health_latency = time.time() - start
+            responses = [chat.result() for chat in chats]
+        
+        if health.status_code == 200 and all(r.status_code == 200 for r in responses):
+            upstream = health.json().get('upstream') or {}
+            print(f"✅ {len(responses)} concurrent chats succeeded")
+            print(f"   Health latency during chats: {health_latency * 1000:.0f}ms")
+            print(f"   Upstream in flight: {upstream.get('in_flight', 'n/a')}, queued: {upstream.get('queued', 'n/a')}")
+            return True
+        else:
+            print(f"❌ Concurrent chat failed: {[r.status_code for r in responses]}")
+            return False
+    except Exception as e:
+        print(f"❌ Concurrent chat error: {e}")
+        return False
+
 def test_profile_management():
     """Test profile management endpoints"""
     print("\n👤 Testing profile management...")
     try:
+        # Ids that are neither accounts nor saved profiles have no profile;
+        # a guest's exists once saved
+        guest = guest_session()
+        url = f"{BASE_URL}/api/v1/profile/{guest['user']['id']}"
+        headers = bearer(guest)
+        missing = requests.get(url).status_code
+        requests.patch(url, json={"location": "Test City"}, headers=headers)
+        
         # Test get profile
-        response = requests.get(f"{BASE_URL}/api/v1/profile/{TEST_USER_ID}")
+        response = requests.get(url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -84,19 +358,31 @@ def test_profile_management():
             print(f"   Bio: {user['bio']}")
             print(f"   Location: {user['location']}")
             
-            # Test update profile
+            # Test partial update, based on the version just read
             update_data = {
+                "version": user['version'],
                 "name": "Updated Demo User",
                 "bio": "Updated bio for testing",
                 "location": "Updated Location"
             }
-            response = requests.put(f"{BASE_URL}/api/v1/profile/{TEST_USER_ID}", json=update_data)
+            response = requests.patch(url, json=update_data, headers=headers)
             
-            if response.status_code == 200:
+            if response.status_code != 200:
+                print(f"❌ Profile update failed: {response.status_code}")
+                return False
+            updated = requests.get(url, headers=headers).json()['data']['user']
+            stale = requests.patch(url, json={"version": user['version'], "bio": "Edit from a stale copy"},
+                                   headers=headers)
+            # Account fields aren't profile fields
+            renamed = requests.patch(url, json={"username": "demo"}, headers=headers)
+            print(f"   Version {user['version']} -> {updated['version']}, stale update: {stale.status_code}, "
+                  f"unknown id: {missing}, username change: {renamed.status_code}")
+            if (updated['bio'] == update_data['bio'] and updated['version'] == user['version'] + 1
+                    and stale.status_code == 409 and missing == 404 and renamed.status_code == 422):
                 print("✅ Profile update successful")
                 return True
             else:
-                print(f"❌ Profile update failed: {response.status_code}")
+                print("❌ Profile update not persisted or stale update accepted")
                 return False
         else:
             print(f"❌ Profile retrieval failed: {response.status_code}")
@@ -105,12 +391,42 @@ def test_profile_management():
         print(f"❌ Profile management error: {e}")
         return False
 
+def test_profile_privacy():
+    """Test that only the owner sees private profile fields and that private profiles are hidden"""
+    print("\n🙈 Testing profile privacy...")
+    try:
+        login = requests.post(f"{BASE_URL}/api/v1/auth/login", json={"username": "demo", "password": "password"})
+        session = login.json()['data']
+        headers = {"Authorization": f"Bearer {session['access_token']}"}
+        url = f"{BASE_URL}/api/v1/profile/{session['user']['id']}"
+        
+        own = requests.get(url, headers=headers).json()['data']['user']
+        public = requests.get(url).json()['data']['user']
+        requests.patch(url, json={"privacy": {"profile_visibility": "private"}}, headers=headers)
+        hidden = requests.get(url).status_code
+        still_own = requests.get(url, headers=headers).status_code
+        requests.patch(url, json={"privacy": {"profile_visibility": "public"}}, headers=headers)
+        
+        print(f"   Owner sees: {sorted(own)}\n   Others see: {sorted(public)}\n"
+              f"   Private profile: {hidden} for others, {still_own} for the owner")
+        if ('email' in own and 'privacy' in own and not {'email', 'phone', 'birthday', 'privacy'} & set(public)
+                and hidden == 403 and still_own == 200):
+            print("✅ Private fields and private profiles hidden from others")
+            return True
+        print("❌ Profile privacy not enforced")
+        return False
+    except Exception as e:
+        print(f"❌ Profile privacy error: {e}")
+        return False
+
 def test_avatar_update():
     """Test avatar update"""
     print("\n🎨 Testing avatar update...")
     try:
         avatar_data = {"avatar_url": "https://api.dicebear.com/7.x/avataaars/svg?seed=test"}
-        response = requests.post(f"{BASE_URL}/api/v1/profile/{TEST_USER_ID}/avatar", json=avatar_data)
+        guest = guest_session()
+        response = requests.post(f"{BASE_URL}/api/v1/profile/{guest['user']['id']}/avatar", json=avatar_data,
+                                 headers=bearer(guest))
         
         if response.status_code == 200:
             data = response.json()
@@ -127,7 +443,8 @@ def test_user_stats():
     """Test user stats endpoint"""
     print("\n📊 Testing user stats...")
     try:
-        response = requests.get(f"{BASE_URL}/api/v1/profile/{TEST_USER_ID}/stats")
+        guest = guest_session()
+        response = requests.get(f"{BASE_URL}/api/v1/profile/{guest['user']['id']}/stats", headers=bearer(guest))
         
         if response.status_code == 200:
             data = response.json()
@@ -145,6 +462,55 @@ def test_user_stats():
         print(f"❌ Stats error: {e}")
         return False
 
+def test_mood_checkin():
+    """Test that mood check-ins and chat messages update the user's stats"""
+    print("\n🙂 Testing mood check-ins...")
+    try:
+        guest = guest_session()
+        url = f"{BASE_URL}/api/v1/profile/{guest['user']['id']}"
+        headers = bearer(guest)
+        for mood in (6, 8):
+            requests.post(f"{url}/moods", json={"mood": mood, "notes": "test"}, headers=headers)
+        requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "Hello"}, headers=headers)
+        invalid = requests.post(f"{url}/moods", json={"mood": 11}, headers=headers)
+        stats = requests.get(f"{url}/stats", headers=headers).json()['data']['stats']
+        
+        print(f"   Check-ins: {stats['mood_checkins']}, average: {stats['mood_average']}, "
+              f"sessions: {stats['total_sessions']}, streak: {stats['streak_days']}, invalid mood: {invalid.status_code}")
+        if (stats['mood_checkins'], stats['mood_average'], stats['total_sessions'], stats['streak_days'],
+                invalid.status_code) == (2, 7.0, 1, 1, 422):
+            print("✅ Stats updated from check-ins and messages")
+            return True
+        print("❌ Unexpected stats")
+        return False
+    except Exception as e:
+        print(f"❌ Mood check-in error: {e}")
+        return False
+
+def test_media_suggestions():
+    """Test media search and structured media suggestions in chat replies"""
+    print("\n🎵 Testing media suggestions...")
+    try:
+        search = requests.get(f"{BASE_URL}/api/v1/media/search",
+                              params={"q": "rain sleep", "type": "audio", "limit": 3}).json()['data']
+        reply = requests.post(f"{BASE_URL}/api/v1/chat/send",
+                              json={"message": "Can you play some rain sounds?"}).json()['data']
+        media = reply.get('media') or {}
+        item = requests.get(f"{BASE_URL}/api/v1/media/{media['items'][0]}") if media.get('items') else None
+        
+        print(f"   Search: {[i['id'] for i in search['items']]} of {search['total']}, "
+              f"chat suggestion: {media.get('category')}/{media.get('type')} {media.get('items')}")
+        if (search['items'] and all(i['type'] == 'audio' for i in search['items'])
+                and not reply['message'].startswith('MEDIA_SUGGESTION:') and item is not None
+                and item.status_code == 200 and item.json()['data']['item']['type'] == media.get('type')):
+            print("✅ Media search and suggestions returned catalog items")
+            return True
+        print("❌ Unexpected media results")
+        return False
+    except Exception as e:
+        print(f"❌ Media error: {e}")
+        return False
+
 def test_emotion_analysis():
     """Test emotion analysis"""
     print("\n😊 Testing emotion analysis...")
@@ -165,6 +531,179 @@ def test_emotion_analysis():
         print(f"❌ Emotion analysis error: {e}")
         return False
 
+def test_emotion_batch():
+    """Test batch emotion analysis"""
+    print("\n📚 Testing batch emotion analysis...")
+    try:
+        batch_data = {"texts": ["I'm so happy today!", "I feel anxious about tomorrow", "I'm not happy", 42]}
+        response = requests.post(f"{BASE_URL}/api/v1/emotions/analyze/batch", json=batch_data)
+        # The single endpoint and the batch label a text the same way
+        single = requests.post(f"{BASE_URL}/api/v1/emotions/analyze", json={"text": "I'm not happy"}).json()['data']
+        # NDJSON, uploaded chunked; results stream back as each chunk is scored
+        lines = [b'"I\'m so happy today!"\n', b'{"text": "I feel anxious about tomorrow"}\n', b'not json\n']
+        streamed = requests.post(f"{BASE_URL}/api/v1/emotions/analyze/batch", data=iter(lines),
+                                 headers={"Content-Type": "application/x-ndjson"})
+        streamed_results = [json.loads(line) for line in streamed.text.splitlines() if line]
+        print(f"   NDJSON upload: {streamed.status_code}, "
+              f"{[(r['index'], r.get('emotion') or r['error']) for r in streamed_results]}")
+        
+        if response.status_code == 200:
+            results = [json.loads(line) for line in response.text.splitlines() if line]
+            succeeded = [r for r in results if r['success']]
+            print(f"✅ Batch analysis: {len(succeeded)}/{len(results)} items scored")
+            for result in succeeded:
+                print(f"   #{result['index']}: {result['emotion']} (confidence: {result['confidence']})")
+            return (len(results) == 4 and not results[3]['success']
+                    and results[2]['emotion'] == single['emotion'] and streamed.status_code == 200
+                    and [r['success'] for r in streamed_results] == [True, True, False]
+                    and [r['index'] for r in streamed_results] == [0, 1, 2])
+        else:
+            print(f"❌ Batch emotion analysis failed: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Batch emotion analysis error: {e}")
+        return False
+
+def test_input_limits():
+    """Test request validation and size limits"""
+    print("\n🛡️ Testing input limits...")
+    try:
+        empty = requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": ""})
+        guest = guest_session()
+        unknown = requests.patch(f"{BASE_URL}/api/v1/profile/{guest['user']['id']}", json={"is_admin": True},
+                                 headers=bearer(guest))
+        oversized = requests.post(f"{BASE_URL}/api/v1/chat/send", json={"message": "x" * 200000})
+        
+        print(f"   Empty message: {empty.status_code}, unknown profile field: {unknown.status_code}, "
+              f"oversized body: {oversized.status_code}")
+        if empty.status_code == 422 and unknown.status_code == 422 and oversized.status_code == 413:
+            print("✅ Invalid and oversized requests rejected")
+            return True
+        print("❌ Input limits not enforced")
+        return False
+    except Exception as e:
+        print(f"❌ Input limits error: {e}")
+        return False
+
+def test_metrics():
+    """Test Prometheus metrics endpoint"""
+    print("\n📈 Testing metrics...")
+    try:
+        response = requests.get(f"{BASE_URL}/metrics")
+        
+        if response.status_code == 200:
+            text = response.text
+            expected = ["http_request_duration_seconds_bucket", "chat_stage_duration_seconds_count", "chat_replies_total"]
+            missing = [name for name in expected if name not in text]
+            if missing:
+                print(f"❌ Metrics missing: {', '.join(missing)}")
+                return False
+            print(f"✅ Metrics exposed: {text.count(chr(10))} lines")
+            return True
+        else:
+            print(f"❌ Metrics failed: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Metrics error: {e}")
+        return False
+
+def test_rate_limit_retry_after():
+    """Test that a retry at exactly the sliding window's Retry-After delay is accepted"""
+    print("\n⏳ Testing rate limit retry delays...")
+    try:
+        from rate_limit import MemoryLimiterBackend
+        
+        async def retry_at_delay(earlier):
+            limiter = MemoryLimiterBackend()
+            window, limit = 60.0, 10
+            now = 28_000_000 * window + 50  # 50 s into a window
+            for _ in range(limit):
+                await limiter.hit([("user", limit)], window, now)
+            refused, retry_after = await limiter.hit([("user", limit)], window, now)
+            # The window's hits still count after it rolls over, so this is
+            # longer than the 10 s left in it
+            accepted = await limiter.hit([("user", limit)], window, now + retry_after - earlier)
+            return refused, retry_after, accepted[0] is None
+        
+        refused, retry_after, on_time = asyncio.run(retry_at_delay(0.0))
+        _, _, early = asyncio.run(retry_at_delay(1.0))
+        if refused == 0 and on_time and not early:
+            print(f"✅ Retry accepted after {retry_after:.3f}s, refused 1s earlier")
+            return True
+        print(f"❌ Retry after {retry_after:.3f}s: accepted={on_time}, accepted 1s early={early}")
+        return False
+    except Exception as e:
+        print(f"❌ Rate limit retry error: {e}")
+        return False
+
+def test_context_summary_overlap():
+    """Test that no turn is sent both in the context summary and verbatim"""
+    print("\n🧵 Testing conversation context...")
+    try:
+        from context_builder import ContextBuilder
+        
+        builder = ContextBuilder(history=None, token_budget=400, summary_budget=100)
+        turns = [
+            {"id": f"msg-{i}", "timestamp": float(i), "sender": "user" if i % 2 else "ai",
+             "message": f"Turn {i} happened.", "emotion_detected": "neutral"}
+            for i in range(1, 7)
+        ]
+        long_turn = {"id": "msg-7", "timestamp": 7.0, "sender": "user",
+                     "message": "A very long message. " * 50, "emotion_detected": "neutral"}
+        newest_first = list(reversed(turns))
+        # The long turn crowds the rest into the summary; without it (say it
+        # is the message being answered) they would fit verbatim again
+        builder.assemble("context-test", [long_turn] + newest_first)
+        context = builder.assemble("context-test", newest_first)
+        
+        summary = context[0]["content"] if context and context[0]["role"] == "system" else ""
+        verbatim = [message["content"] for message in context if message["role"] != "system"]
+        repeated = [text for text in verbatim if text in summary]
+        if repeated:
+            print(f"❌ Turns both summarized and sent verbatim: {repeated}")
+            return False
+        if len(verbatim) + summary.count("\n- ") != len(turns):
+            print(f"❌ Context lost turns: {context}")
+            return False
+        print(f"✅ Context has {summary.count(chr(10) + '- ')} summarized and {len(verbatim)} verbatim turns, none twice")
+        return True
+    except Exception as e:
+        print(f"❌ Conversation context error: {e}")
+        return False
+
+def test_completion_cache_cancellation():
+    """Test that cancelling the caller that started a shared completion doesn't fail the others"""
+    print("\n🗃️  Testing completion cache coalescing...")
+    try:
+        from completion_cache import CompletionCache, MemoryCacheBackend
+        
+        async def cancel_first_caller():
+            cache = CompletionCache(MemoryCacheBackend())
+            calls = []
+            
+            async def compute():
+                calls.append(1)
+                await asyncio.sleep(0.05)
+                return "shared reply"
+            
+            first = asyncio.create_task(cache.get_or_compute("key", compute))
+            await asyncio.sleep(0.01)
+            others = [asyncio.create_task(cache.get_or_compute("key", compute)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            first.cancel()
+            replies = await asyncio.gather(*others, return_exceptions=True)
+            return replies, len(calls), await cache.backend.get("key")
+        
+        replies, calls, cached = asyncio.run(cancel_first_caller())
+        if replies == ["shared reply"] * 3 and calls == 1 and cached == "shared reply":
+            print("✅ Waiting callers got the shared reply after the first caller was cancelled")
+            return True
+        print(f"❌ Waiting callers got {replies} ({calls} computations, cached {cached!r})")
+        return False
+    except Exception as e:
+        print(f"❌ Completion cache error: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("🚀 Starting AI Mental Health Assistant Backend Tests")
@@ -172,12 +711,30 @@ def main():
     
     tests = [
         test_health_check,
+        test_readiness,
         test_authentication,
+        test_token_auth,
+        test_guest_sessions,
         test_chat,
+        test_negated_emotion,
+        test_crisis_response,
+        test_chat_stream,
+        test_websocket_chat,
+        test_chat_history,
+        test_concurrent_chat,
         test_profile_management,
+        test_profile_privacy,
         test_avatar_update,
         test_user_stats,
-        test_emotion_analysis
+        test_mood_checkin,
+        test_media_suggestions,
+        test_emotion_analysis,
+        test_emotion_batch,
+        test_input_limits,
+        test_rate_limit_retry_after,
+        test_context_summary_overlap,
+        test_completion_cache_cancellation,
+        test_metrics
     ]
     
     passed = 0
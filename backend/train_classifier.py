@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Train the hashed n-gram intent/emotion classifier
+Builds a labelled corpus from templates over the fallback keywords and the
+emotion lexicon (including negated phrasings, greetings that carry a
+feeling, jokes and small talk), optionally adds real labelled messages
+(--data, JSON lines of {"text", "intent", "emotion"}), fits a softmax
+model per head with mini-batch Adam in NumPy, reports held-out accuracy
+and writes a versioned model file (intent_classifier.py). Training is
+seeded, so the same inputs give the same file.
+
+    python train_classifier.py
+    python train_classifier.py --data labelled.jsonl --out models/intent_classifier-v2.bin --version 2
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from emotion_engine import EMOTION_LEXICON, NEUTRAL
+from fallback_engine import DEFAULT_INTENT, FALLBACK_KEYWORDS
+from intent_classifier import Featurizer, IntentClassifier
+
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "intent_classifier-v1.bin")
+
+INTENTS = list(FALLBACK_KEYWORDS) + [DEFAULT_INTENT]
+EMOTIONS = list(EMOTION_LEXICON) + [NEUTRAL]
+# Fallback intent answering each emotion
+EMOTION_INTENTS = {"sadness": "sadness", "anxiety": "anxiety", "anger": "anger", "joy": "positive", "fear": "anxiety"}
+
+FEELING_TEMPLATES = [
+    "i feel {w}", "i'm {w}", "i am {w}", "i'm so {w}", "i feel so {w} today", "feeling {w}",
+    "feeling really {w} right now", "i've been {w} lately", "i have been feeling {w} all week",
+    "why am i always so {w}", "{w}", "so {w}", "honestly i'm kind of {w}", "i'm a bit {w} about tomorrow",
+    "work makes me {w}", "my family makes me feel {w}", "i was {w} all day", "i get {w} when i think about it",
+    "today i felt {w}", "i just feel {w} and i don't know why", "i'm {w} about my exams",
+    "i'm feeling pretty {w} tonight", "been {w} since this morning", "everything makes me {w}",
+    "i woke up {w}", "it's been a {w} day", "i can't stop feeling {w}", "still {w} about what happened",
+]
+NEGATED_TEMPLATES = [
+    "i'm not {w}", "i am not {w}", "i'm not very {w}", "i don't feel {w}", "i don't feel very {w}",
+    "not feeling {w} at all", "i'm not {w} today", "i'm really not {w}", "i haven't been {w} lately",
+    "i'm not feeling {w}", "i wasn't {w} today", "i can't remember the last time i felt {w}",
+    "i never feel {w} anymore", "nothing makes me {w} anymore", "i'm not {w} with my life",
+    "i'm not {w} at all today", "not {w} at all", "i don't feel {w} at all", "i'm just not {w}",
+]
+# Negated mild words the lexicon doesn't list
+NOT_OKAY = ["good", "well", "great", "okay", "ok", "fine", "alright", "myself", "like myself"]
+# Negated unpleasant feelings read as calm rather than as the feeling itself
+RELIEF_TEMPLATES = [
+    "i'm not {w} anymore", "i don't feel {w} today", "i'm not really {w}, just checking in",
+    "i'm not {w} at all", "no longer {w}", "i'm not {w} now", "i'm not {w} anymore, it worked out",
+    "i feel better, i'm not {w} anymore", "{r}, i'm not {w} now", "{r}, no longer {w}", "{r}",
+]
+RELIEF = ["i'm relieved", "i was so relieved", "what a relief", "i feel calmer now", "it all worked out",
+          "i feel better now", "i finally calmed down", "my tests came back okay"]
+# Situations that carry a feeling without naming it
+EVENTS = {
+    "sadness": ["my dog died", "i lost my job", "my grandma passed away", "we broke up", "my best friend moved away",
+                "i keep crying at night", "i can't stop crying", "nobody came to my birthday", "i miss my dad",
+                "everyone ignores me", "i failed my exam", "i feel like nobody cares about me",
+                "my marriage is falling apart", "i have no one to talk to", "i don't see the point anymore"],
+    "anxiety": ["i can't sleep, my mind keeps racing", "i have a big presentation tomorrow", "my heart is pounding",
+                "i keep overthinking everything", "i have so much to do and no time", "what if i fail",
+                "i have a job interview tomorrow", "i can't stop thinking about the deadline",
+                "my chest feels tight", "i'm freaking out about money", "i'm losing sleep over this"],
+    "anger": ["my coworker took credit for my work", "my roommate never cleans up", "he lied to me again",
+              "they cancelled on me for the third time", "i'm sick of being treated like this",
+              "my boss yelled at me in front of everyone", "people keep interrupting me", "this is so unfair",
+              "i want to scream", "i can't stand my neighbor"],
+    "joy": ["i got promoted", "i passed my exam", "we're having a baby", "i got the job", "my team won",
+            "i finally finished my project", "i had the best day", "i'm going on vacation tomorrow",
+            "my friends threw me a surprise party", "i got engaged", "i aced my interview", "today was perfect"],
+    "fear": ["someone is following me", "i heard a noise downstairs", "i'm scared to go outside",
+             "i think something bad is going to happen", "i'm afraid to be alone tonight",
+             "the storm outside is terrifying", "i'm scared of what the doctor will say"],
+}
+EVENT_TEMPLATES = ["{e}", "{e}.", "{e} and i don't know what to do", "i just found out {e}", "so {e}",
+                   "{e}, can we talk", "i need to tell you something, {e}", "guess what, {e}", "{e} today"]
+GREETINGS = ["hi", "hello", "hey", "hey there", "hi there", "hello alex", "hey alex", "good morning",
+             "good afternoon", "good evening", "morning", "hiya", "yo", "howdy", "greetings"]
+GREETING_TEMPLATES = ["{g}", "{g}!", "{g}, how are you", "{g}, how's it going", "{g} :)", "{g}, are you there",
+                      "{g}, nice to see you", "{g}, what's up", "oh {g}", "{g} friend"]
+JOKE_MESSAGES = [
+    "tell me a joke", "tell me something funny", "make me laugh", "i need a laugh", "do you know any jokes",
+    "say something funny", "cheer me up with a joke", "got any good jokes", "i want to hear a joke",
+    "can you tell me a funny story", "tell me a pun", "i could use some humor", "know any funny jokes",
+    "give me a joke please", "share a joke with me", "what's the funniest joke you know",
+]
+SMALL_TALK = [
+    "what should i cook for dinner", "i went to the store today", "can we talk for a bit", "what's the weather like",
+    "i have a meeting tomorrow", "tell me about yourself", "what do you do", "i'm thinking about my day",
+    "i watched a movie last night", "how does this app work", "what time is it", "i'm at work right now",
+    "can you help me plan my week", "i walked the dog this morning", "my sister is visiting this weekend",
+    "i'm reading a book about history", "what's your favorite color", "i need to clean my room",
+    "i started a new job", "what are you up to", "i'm going to the gym later", "where should i travel",
+    "do you like music", "i had pasta for lunch", "i'm trying to drink more water", "the train was late today",
+    "i bought new shoes", "what should i do this weekend", "tell me something interesting", "i'm studying for a test",
+    "can you remind me to call my mom", "i moved to a new apartment", "i'm learning to play guitar",
+    "what do you think about coffee", "i'm just sitting at home", "i need to do laundry", "let's chat",
+    "i got a haircut", "my phone battery died", "what's a good book to read",
+]
+# Everyday words that contain a feeling word ("made" has "mad", "thanks" has "thank", "garage" has "rage"),
+# and plain acknowledgements, so the character n-grams alone don't read them as feelings
+SOUNDALIKES = [
+    "this is made of wood", "the table is made of oak", "i made pasta for dinner", "we made it home",
+    "she made a cake", "i moved to madrid", "my cat maddie is asleep", "the nomad camp", "i parked in the garage",
+    "the average temperature is mild", "i need more storage", "the beverage menu", "it takes courage to start",
+    "we visited a chateau", "i need to download the file", "we went downtown", "the crystal vase broke",
+    "i read about crypto", "i bought new gloves", "there's a clover in the yard", "we watched gladiator",
+    "the glade behind the house", "my joystick is broken", "the scarecrow in the field", "my dog sadie",
+    "the horse needs a new saddle", "she got dreadlocks", "the content of the email", "the tire pressure is low",
+    "thanks", "thank you", "thanks a lot", "ok thanks", "okay, thank you", "got it, thanks", "thanks for the tip",
+    "i'm fine thanks", "sounds good", "alright", "ok", "okay", "cool", "sure", "noted", "makes sense", "i see",
+]
+PREFIXES = ["", "", "", "honestly ", "so ", "ugh ", "well ", "lol ", "okay so ", "hey, ", "hmm ", "you know, "]
+SUFFIXES = ["", "", "", " today", " right now", " lately", "...", "!", "!!", " :(", " tbh", " again", ".", "?"]
+INTENSIFIERS = ["", "", "really ", "very ", "super ", "a bit ", "kind of ", "extremely ", "pretty "]
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """Drop, double or swap one letter"""
+    if len(text) < 5:
+        return text
+    i = rng.randrange(1, len(text) - 2)
+    return rng.choice([text[:i] + text[i + 1:], text[:i] + text[i] + text[i:],
+                       text[:i] + text[i + 1] + text[i] + text[i + 2:]])
+
+
+def decorate(text: str, rng: random.Random) -> str:
+    text = rng.choice(PREFIXES) + text + rng.choice(SUFFIXES)
+    if rng.random() < 0.1:
+        text = typo(text, rng)
+    if rng.random() < 0.2:
+        text = text.capitalize()
+    return text
+
+
+def feeling_words(emotion: str):
+    """Lexicon words plus the fallback keywords of the emotion's intent"""
+    words = [w for w, weight in EMOTION_LEXICON[emotion].items() if weight >= 0.6]
+    words += [w for w in FALLBACK_KEYWORDS.get(EMOTION_INTENTS[emotion], []) if " " not in w]
+    return sorted(set(words))
+
+
+def synthetic_corpus(per_class: int, seed: int):
+    """(text, intent, emotion) examples"""
+    rng = random.Random(seed)
+    examples = []
+    for emotion in EMOTION_INTENTS:
+        words = feeling_words(emotion)
+        for _ in range(per_class):
+            word = rng.choice(INTENSIFIERS) + rng.choice(words)
+            text = rng.choice(FEELING_TEMPLATES).format(w=word)
+            if rng.random() < 0.15:
+                # A greeting in front doesn't change what the message is about
+                text = f"{rng.choice(GREETINGS)}, {text}"
+            examples.append((decorate(text, rng), EMOTION_INTENTS[emotion], emotion))
+        for _ in range(per_class // 2):
+            text = rng.choice(EVENT_TEMPLATES).format(e=rng.choice(EVENTS[emotion]))
+            examples.append((decorate(text, rng), EMOTION_INTENTS[emotion], emotion))
+
+    positive_words = feeling_words("joy")
+    for _ in range(per_class):
+        text = rng.choice(NEGATED_TEMPLATES).format(w=rng.choice(positive_words))
+        examples.append((decorate(text, rng), "sadness", "sadness"))
+    for _ in range(per_class // 2):
+        text = rng.choice(NEGATED_TEMPLATES).format(w=rng.choice(NOT_OKAY))
+        examples.append((decorate(text, rng), "sadness", "sadness"))
+    unpleasant = [w for emotion in ("sadness", "anxiety", "anger", "fear") for w in feeling_words(emotion)]
+    for _ in range(per_class // 2):
+        text = rng.choice(RELIEF_TEMPLATES).format(w=rng.choice(unpleasant), r=rng.choice(RELIEF))
+        examples.append((decorate(text, rng), DEFAULT_INTENT, NEUTRAL))
+
+    for _ in range(per_class):
+        text = rng.choice(GREETING_TEMPLATES).format(g=rng.choice(GREETINGS))
+        examples.append((decorate(text, rng), "greeting", NEUTRAL))
+    for _ in range(per_class):
+        examples.append((decorate(rng.choice(JOKE_MESSAGES), rng), "joke", NEUTRAL))
+    for _ in range(per_class * 2):
+        examples.append((decorate(rng.choice(SMALL_TALK), rng), DEFAULT_INTENT, NEUTRAL))
+    for _ in range(per_class):
+        examples.append((decorate(rng.choice(SOUNDALIKES), rng), DEFAULT_INTENT, NEUTRAL))
+    rng.shuffle(examples)
+    return examples
+
+
+def load_examples(path: str):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["intent"], row["emotion"]) for row in rows]
+
+
+def encode(featurizer: Featurizer, examples):
+    buckets, starts = featurizer.buckets_batch([text for text, _, _ in examples])
+    intents = np.array([INTENTS.index(intent) for _, intent, _ in examples], dtype=np.intp)
+    emotions = np.array([EMOTIONS.index(emotion) for _, _, emotion in examples], dtype=np.intp)
+    return buckets, starts, intents, emotions
+
+
+def batch_slices(buckets, starts, rows):
+    """Buckets, per-bucket row ids and bucket counts for a subset of examples"""
+    ends = np.append(starts[1:], len(buckets))
+    parts = [buckets[starts[r]:ends[r]] for r in rows]
+    counts = np.array([len(p) for p in parts], dtype=np.intp)
+    return np.concatenate(parts), np.repeat(np.arange(len(rows)), counts), counts
+
+
+def forward(weights, bias, flat, row_ids, counts):
+    scores = np.zeros((len(counts), weights.shape[1]), dtype=np.float32)
+    gathered = weights[flat]
+    for column in range(weights.shape[1]):
+        scores[:, column] = np.bincount(row_ids, weights=gathered[:, column], minlength=len(counts))
+    scale = 1.0 / np.sqrt(np.maximum(counts, 1)).astype(np.float32)
+    return scores * scale[:, None] + bias, scale
+
+
+def head_softmax(scores, split):
+    out = np.empty_like(scores)
+    for columns in (slice(0, split), slice(split, scores.shape[1])):
+        part = scores[:, columns] - scores[:, columns].max(axis=1, keepdims=True)
+        exp = np.exp(part)
+        out[:, columns] = exp / exp.sum(axis=1, keepdims=True)
+    return out
+
+
+def train(featurizer: Featurizer, examples, epochs: int, batch_size: int, learning_rate: float, l2: float, seed: int):
+    buckets, starts, intents, emotions = encode(featurizer, examples)
+    split = len(INTENTS)
+    columns = split + len(EMOTIONS)
+    weights = np.zeros((2 ** featurizer.bits, columns), dtype=np.float32)
+    bias = np.zeros(columns, dtype=np.float32)
+    m_w, v_w = np.zeros_like(weights), np.zeros_like(weights)
+    m_b, v_b = np.zeros_like(bias), np.zeros_like(bias)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(examples))
+        for begin in range(0, len(order), batch_size):
+            rows = order[begin:begin + batch_size]
+            flat, row_ids, counts = batch_slices(buckets, starts, rows)
+            scores, scale = forward(weights, bias, flat, row_ids, counts)
+            error = head_softmax(scores, split)
+            error[np.arange(len(rows)), intents[rows]] -= 1
+            error[np.arange(len(rows)), split + emotions[rows]] -= 1
+            error /= len(rows)
+
+            grad_w = np.zeros_like(weights)
+            per_bucket = error[row_ids] * scale[row_ids, None]
+            for column in range(columns):
+                grad_w[:, column] = np.bincount(flat, weights=per_bucket[:, column], minlength=len(weights))
+            grad_w += l2 * weights
+            grad_b = error.sum(axis=0)
+
+            step += 1
+            for param, grad, m, v in ((weights, grad_w, m_w, v_w), (bias, grad_b, m_b, v_b)):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+    return weights, bias
+
+
+def accuracy(classifier: IntentClassifier, examples):
+    texts = [text for text, _, _ in examples]
+    intents = classifier.predict_batch(texts, "intent")
+    emotions = classifier.predict_batch(texts, "emotion")
+    return (sum(p[0] == e[1] for p, e in zip(intents, examples)) / len(examples),
+            sum(p[0] == e[2] for p, e in zip(emotions, examples)) / len(examples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="extra labelled examples (JSON lines: text, intent, emotion)")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--version", default="1", help="model version recorded in the file")
+    parser.add_argument("--per-class", type=int, default=1500, help="synthetic examples per class")
+    parser.add_argument("--bits", type=int, default=15, help="log2 of the number of feature buckets")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--learning-rate", type=float, default=0.02)
+    parser.add_argument("--l2", type=float, default=1e-5)
+    parser.add_argument("--holdout", type=float, default=0.1, help="share of examples held out for evaluation")
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    examples = synthetic_corpus(args.per_class, args.seed)
+    if args.data:
+        examples += load_examples(args.data)
+        random.Random(args.seed).shuffle(examples)
+    held_out = int(len(examples) * args.holdout)
+    test, training = examples[:held_out], examples[held_out:]
+
+    featurizer = Featurizer(bits=args.bits)
+    started = time.perf_counter()
+    weights, bias = train(featurizer, training, args.epochs, args.batch_size, args.learning_rate, args.l2, args.seed)
+    elapsed = time.perf_counter() - started
+    heads = {"intent": INTENTS, "emotion": EMOTIONS}
+    classifier = IntentClassifier(featurizer, heads, weights.astype(np.float16), bias)
+    intent_accuracy, emotion_accuracy = accuracy(classifier, test)
+    print(f"Trained on {len(training)} examples in {elapsed:.1f}s; held-out accuracy: "
+          f"intent {intent_accuracy:.3f}, emotion {emotion_accuracy:.3f} ({len(test)} examples)")
+
+    classifier.version = args.version
+    classifier.metadata = {
+        "examples": len(training),
+        "extra_data": os.path.basename(args.data) if args.data else None,
+        "epochs": args.epochs,
+        "seed": args.seed,
+        "holdout_accuracy": {"intent": round(intent_accuracy, 4), "emotion": round(emotion_accuracy, 4)},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    classifier.save(args.out)
+    print(f"Wrote {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Worker warm-up and readiness
+The app starts serving as soon as it is imported; anything that is slow the
+first time (importing the OpenAI SDK and building its HTTP client, the first
+pass through the matchers, the prompt and the databases) runs as named
+warm-up steps in the background right after startup. /ready reports 503
+until every step has run, so a load balancer only sends traffic to warm
+workers, while /health keeps answering throughout.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Ordered warm-up steps run once per worker process.
+
+    A step that raises is logged and reported but doesn't hold readiness
+    back: steps only pay first-use costs early, and whatever failed will
+    fail (and be retried) on first use anyway.
+    """
+
+    def __init__(self):
+        self.steps: List[Tuple[str, Callable[[], Any], bool]] = []
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.ready = False
+        self.seconds: Optional[float] = None
+
+    def step(self, name: str, fn: Callable[[], Any], in_thread: bool = False) -> None:
+        """Add a step: a plain or async callable; ``in_thread`` runs a blocking one off the event loop"""
+        self.steps.append((name, fn, in_thread))
+
+    async def run(self) -> None:
+        started = time.perf_counter()
+        for name, fn, in_thread in self.steps:
+            step_started = time.perf_counter()
+            try:
+                if in_thread:
+                    await asyncio.to_thread(fn)
+                else:
+                    result = fn()
+                    if inspect.isawaitable(result):
+                        await result
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+                self.errors[name] = str(e)
+            self.timings[name] = time.perf_counter() - step_started
+        self.seconds = time.perf_counter() - started
+        self.ready = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "seconds": round(self.seconds, 4) if self.seconds is not None else None,
+            "steps_ms": {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()},
+            "errors": self.errors,
+        }
@@ -0,0 +1,174 @@
+"""
+WebSocket chat sessions
+Each connection holds a small session object: who the user is, their recent
+turns (so follow-up messages build context without re-reading history) and
+the emotions seen so far. A single heartbeat task per worker pings idle
+sessions and drops ones that stopped answering, instead of a timer per
+connection, so an idle session costs its socket and a few hundred bytes.
+Sends are bounded by a timeout, so a client that stops reading is
+disconnected rather than buffering replies without limit.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+import orjson
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+logger = logging.getLogger(__name__)
+
+# Close codes (RFC 6455)
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TOO_BIG = 1009
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class SendTimeout(Exception):
+    """The client didn't read a frame within the session's send timeout"""
+
+
+class ChatSession:
+    """State for one chat connection"""
+
+    __slots__ = ("websocket", "user_id", "claims", "quota_key", "ip", "recent", "seeded", "emotions",
+                 "emotion", "busy", "last_seen", "pinged", "turns", "send_timeout")
+
+    def __init__(self, websocket: WebSocket, user_id: str, claims: Optional[dict], quota_key: str, ip: str,
+                 recent_turns: int, send_timeout: float):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.claims = claims
+        self.quota_key = quota_key
+        self.ip = ip
+        # Newest last; seeded from stored history on the first turn
+        self.recent: deque = deque(maxlen=recent_turns)
+        self.seeded = False
+        self.emotions: Counter = Counter()
+        self.emotion: Optional[str] = None
+        self.busy = False
+        self.last_seen = time.monotonic()
+        self.pinged = False
+        self.turns = 0
+        self.send_timeout = send_timeout
+
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+        self.pinged = False
+
+    def remember(self, record: Dict[str, Any]) -> None:
+        """Add a stored message (API message shape) to the session's recent turns"""
+        self.recent.append(record)
+
+    def note_emotion(self, emotion: str) -> None:
+        self.emotion = emotion
+        self.emotions[emotion] += 1
+
+    async def send(self, event: str, data: Any = None, ref: Optional[str] = None) -> None:
+        """Send one ``{"event", "data"}`` frame (echoing the client's ``ref``, if any).
+
+        Raises SendTimeout if the client isn't reading and WebSocketDisconnect
+        if it has gone away.
+        """
+        frame = {"event": event, "data": data}
+        if ref is not None:
+            frame["ref"] = ref
+        frame = orjson.dumps(frame).decode()
+        try:
+            await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+        except asyncio.TimeoutError:
+            raise SendTimeout(f"client did not read within {self.send_timeout}s")
+        except (OSError, RuntimeError) as e:
+            # The server's own "connection closed" error, which Starlette doesn't translate
+            raise WebSocketDisconnect(1006) from e
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        if self.websocket.application_state != WebSocketState.DISCONNECTED:
+            try:
+                await self.websocket.close(code, reason)
+            except Exception:
+                # Already gone (RuntimeError after a disconnect, or a transport error)
+                pass
+
+
+class SessionRegistry:
+    """Open chat sessions of one worker, with a connection cap and a shared heartbeat.
+
+    Every ``heartbeat_interval`` seconds sessions that have been quiet that
+    long get a ``ping`` event; a session still silent one interval after its
+    ping is closed. Sessions with a turn in progress are skipped.
+    """
+
+    def __init__(self, max_connections: int = 10000, heartbeat_interval: float = 30.0,
+                 send_timeout: float = 10.0, ping_batch: int = 500):
+        self.max_connections = max_connections
+        self.heartbeat_interval = heartbeat_interval
+        self.send_timeout = send_timeout
+        self.ping_batch = ping_batch
+        self.sessions: Dict[int, ChatSession] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+        self.opened = 0
+        self.refused = 0
+        self.timed_out = 0
+        self.slow_clients = 0
+
+    def add(self, session: ChatSession) -> bool:
+        """Register a session; False when the worker is at its connection cap"""
+        if len(self.sessions) >= self.max_connections:
+            self.refused += 1
+            return False
+        self.sessions[id(session)] = session
+        self.opened += 1
+        self._ensure_heartbeat()
+        return True
+
+    def remove(self, session: ChatSession) -> None:
+        self.sessions.pop(id(session), None)
+
+    def _ensure_heartbeat(self) -> None:
+        if self.heartbeat_interval > 0 and (self._heartbeat is None or self._heartbeat.done()):
+            self._heartbeat = asyncio.get_running_loop().create_task(self._heartbeat_loop())
+
+    async def _ping(self, session: ChatSession, now: float) -> None:
+        if session.pinged:
+            self.timed_out += 1
+            await session.close(CLOSE_POLICY_VIOLATION, "Heartbeat timeout")
+            self.remove(session)
+            return
+        try:
+            await session.send("ping", {"t": time.time()})
+            session.pinged = True
+            session.last_seen = now
+        except Exception:
+            await session.close(CLOSE_TRY_AGAIN_LATER, "Client too slow")
+            self.remove(session)
+
+    async def _heartbeat_loop(self) -> None:
+        while self.sessions:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            due = [s for s in list(self.sessions.values())
+                   if not s.busy and now - s.last_seen >= self.heartbeat_interval]
+            for start in range(0, len(due), self.ping_batch):
+                await asyncio.gather(*(self._ping(s, now) for s in due[start:start + self.ping_batch]))
+
+    async def close(self) -> None:
+        """Close every session (server shutdown) and stop the heartbeat"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*(s.close(1001, "Server shutting down") for s in sessions))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": len(self.sessions),
+            "max_connections": self.max_connections,
+            "opened": self.opened,
+            "refused": self.refused,
+            "heartbeat_timeouts": self.timed_out,
+            "slow_clients": self.slow_clients,
+        }
@@ -7,9 +7,10 @@ import MediaPlayer, { MediaItem } from '../Media/MediaPlayer';
 import BreathingExercise from '../Common/BreathingExercise';
 import { ChatMessage as ChatMessageType, EmotionAnalysis } from '../../types';
 import apiService from '../../services/api';
-import { detectCrisis, generateCrisisResponse } from '../../utils/crisisDetection';
+import chatSocket, { ChatSocketUnavailableError } from '../../services/chatSocket';
+import { generateCrisisResponse } from '../../utils/crisisDetection';
 import { getDailyQuote } from '../../utils/quotes';
-import { detectMediaRequest, getRandomMedia, getMediaByCategory } from '../../data/mediaLibrary';
+import { detectMediaRequest, getRandomMedia, mediaLibrary } from '../../data/mediaLibrary';
 import { useTheme } from '../../contexts/ThemeContext';
 
 const ChatContainer = styled.div<{ theme: any }>`
@@ -231,6 +232,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ user }) => {
   const [messages, setMessages] = useState<ChatMessageType[]>([]);
   const [inputText, setInputText] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [replyStarted, setReplyStarted] = useState(false);
   const [error, setError] = useState('');
   const [showCrisisSupport, setShowCrisisSupport] = useState(false);
   const [crisisLevel, setCrisisLevel] = useState<'low' | 'medium' | 'high'>('medium');
@@ -312,6 +314,38 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ user }) => {
     return emotionResponses[Math.floor(Math.random() * emotionResponses.length)];
   };
 
+  // Save the exchange to localStorage for the dashboard
+  const saveChatSession = (userMessage: ChatMessageType, aiMessage: ChatMessageType) => {
+    const chatTitle = userMessage.content.length > 30
+      ? userMessage.content.substring(0, 30) + '...'
+      : userMessage.content;
+
+    const existingHistory = localStorage.getItem('chatHistory');
+    const chatHistory = existingHistory ? JSON.parse(existingHistory) : [];
+
+    // Check if this is a new session or continuation
+    const lastSession = chatHistory[chatHistory.length - 1];
+    const isNewSession = !lastSession ||
+      (new Date().getTime() - new Date(lastSession.updated_at).getTime()) > 300000; // 5 minutes gap = new session
+
+    if (isNewSession) {
+      // Create new session
+      chatHistory.push({
+        id: Date.now().toString(),
+        title: chatTitle,
+        created_at: new Date().toISOString(),
+        updated_at: new Date().toISOString(),
+        messages: [userMessage, aiMessage]
+      });
+    } else {
+      // Update existing session
+      lastSession.updated_at = new Date().toISOString();
+      lastSession.messages.push(userMessage, aiMessage);
+    }
+
+    localStorage.setItem('chatHistory', JSON.stringify(chatHistory));
+  };
+
   const handleSendMessage = async () => {
     if (!inputText.trim() || isLoading) return;
 
@@ -327,106 +361,57 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ user }) => {
     setIsLoading(true);
     setError('');
 
+    // The reply is shown as it streams in: the first delta adds the
+    // assistant message and later ones extend it
+    const replyId = (Date.now() + 1).toString();
+    const showReply = (update: (content: string) => string) => {
+      setReplyStarted(true);
+      setMessages(prev => prev.some(message => message.id === replyId)
+        ? prev.map(message => message.id === replyId ? { ...message, content: update(message.content) } : message)
+        : [...prev, { id: replyId, content: update(''), sender: 'assistant', timestamp: new Date() }]);
+    };
+
     try {
-      // Send message to chat endpoint
-      const chatResponse = await apiService.sendMessage(userMessage.content);
-      
-      // Add natural typing delay to make it feel more human-like
-      const typingDelay = Math.random() * 2000 + 1000; // 1-3 seconds delay
-      
-      setTimeout(() => {
-        // Check if the response contains a media suggestion
-        let messageContent = chatResponse.data.message;
-        let suggestedMedia: MediaItem | null = null;
-        
-        if (messageContent.startsWith('MEDIA_SUGGESTION:')) {
-          // Parse media suggestion from backend
-          const parts = messageContent.split(':');
-          const category = parts[1] as MediaItem['category'];
-          const type = parts[2] as 'audio' | 'video' | 'any';
-          const actualMessage = parts.slice(3).join(':');
-          
-          // Get appropriate media
-          if (type === 'any') {
-            suggestedMedia = getRandomMedia(category);
-          } else {
-            const categoryMedia = getMediaByCategory(category).filter(m => m.type === type);
-            suggestedMedia = categoryMedia.length > 0 ? 
-              categoryMedia[Math.floor(Math.random() * categoryMedia.length)] : 
-              getRandomMedia(category);
-          }
-          
-          messageContent = actualMessage;
-          setCurrentMedia(suggestedMedia);
-        }
-        
-        // Create AI response message
-        const aiMessage: ChatMessageType = {
-          id: (Date.now() + 1).toString(),
-          content: messageContent,
-          sender: 'assistant',
-          timestamp: new Date()
-        };
-
-        // Add AI response to messages
-        setMessages(prev => {
-          const newMessages = [...prev, aiMessage];
-          
-          // Save chat session to localStorage for dashboard
-          if (newMessages.length >= 2) { // At least one user message and one AI response
-            const chatTitle = userMessage.content.length > 30 
-              ? userMessage.content.substring(0, 30) + '...' 
-              : userMessage.content;
-            
-            const existingHistory = localStorage.getItem('chatHistory');
-            const chatHistory = existingHistory ? JSON.parse(existingHistory) : [];
-            
-            // Check if this is a new session or continuation
-            const lastSession = chatHistory[chatHistory.length - 1];
-            const isNewSession = !lastSession || 
-              (new Date().getTime() - new Date(lastSession.updated_at).getTime()) > 300000; // 5 minutes gap = new session
-            
-            if (isNewSession) {
-              // Create new session
-              const newSession = {
-                id: Date.now().toString(),
-                title: chatTitle,
-                created_at: new Date().toISOString(),
-                updated_at: new Date().toISOString(),
-                messages: newMessages.slice(-2) // Last user message + AI response
-              };
-              chatHistory.push(newSession);
-            } else {
-              // Update existing session
-              lastSession.updated_at = new Date().toISOString();
-              lastSession.messages.push(...newMessages.slice(-2));
-            }
-            
-            localStorage.setItem('chatHistory', JSON.stringify(chatHistory));
-          }
-          
-          return newMessages;
-        });
-        
-        // Remove loading state after response is added
-        setIsLoading(false);
-      }, typingDelay);
-      
-      // Check for crisis keywords in a simple way
-      const crisisKeywords = ['suicide', 'kill myself', 'end it all', 'hurt myself', 'die'];
-      const hasCrisisContent = crisisKeywords.some(keyword => 
-        userMessage.content.toLowerCase().includes(keyword)
-      );
-      
-      if (hasCrisisContent) {
-        setCrisisLevel('high');
+      // Send over the chat socket; streamed over HTTP only if it couldn't
+      // connect (a turn lost mid-way may already be recorded, so no resend)
+      // The backend flags crisis messages; the flag arrives before the reply
+      const showCrisis = (crisis: { level: 'low' | 'medium' | 'high' }) => {
+        setCrisisLevel(crisis.level);
         setShowCrisisSupport(true);
+      };
+      const handlers = {
+        onCrisis: showCrisis,
+        onDelta: (content: string) => showReply(current => current + content),
+      };
+      const chatResponse = await chatSocket.sendMessage(userMessage.content, handlers)
+        .catch(error => {
+          if (!(error instanceof ChatSocketUnavailableError)) throw error;
+          return apiService.streamMessage(userMessage.content, handlers);
+        });
+      if (!chatResponse.success) throw new Error('Failed to send message');
+      if (chatResponse.data.crisis) showCrisis(chatResponse.data.crisis);
+
+      // The final message replaces the streamed text (media replies arrive whole)
+      const messageContent = chatResponse.data.message;
+      showReply(() => messageContent);
+
+      const media = chatResponse.data.media;
+      if (media) {
+        // Backend ranks catalog items; play the best one we have locally
+        const category = media.category as MediaItem['category'];
+        const suggestedMedia = media.items
+          .map((id: string) => mediaLibrary.find(item => item.id === id))
+          .find(Boolean) || getRandomMedia(category);
+        setCurrentMedia(suggestedMedia);
       }
 
+      saveChatSession(userMessage, { id: replyId, content: messageContent, sender: 'assistant', timestamp: new Date() });
     } catch (err: any) {
       setError(err.message);
       console.error('Chat error:', err);
+    } finally {
       setIsLoading(false);
+      setReplyStarted(false);
     }
   };
 
@@ -558,7 +543,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ user }) => {
             ))
           )}
 
-          {isLoading && (
+          {isLoading && !replyStarted && (
             <TypingIndicator theme={theme}>
               <Loader size={16} style={{ marginRight: '0.5rem', animation: 'spin 1s linear infinite' }} />
               AI is typing...
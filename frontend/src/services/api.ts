@@ -150,6 +150,60 @@ class ApiService {
     }
   }
 
+  // Streaming chat: invokes the handlers as Server-Sent Events arrive and
+  // resolves with the final `done` payload (same shape as sendMessage data)
+  async streamMessage(
+    message: string,
+    handlers: {
+      onEmotion?: (emotion: string) => void;
+      onMedia?: (media: { category: string; type: string; items: string[]; message: string }) => void;
+      onCrisis?: (crisis: { level: 'low' | 'medium' | 'high'; resources: { name: string; contact: string }[] }) => void;
+      onDelta?: (content: string) => void;
+    } = {}
+  ): Promise<any> {
+    const token = this.getToken();
+    const response = await fetch(`${this.baseURL}/api/v1/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', ...(token ? { Authorization: `Bearer ${token}` } : {}) },
+      body: JSON.stringify({ message }),
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Failed to send message (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: any = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = frame.match(/^data: (.*)$/m)?.[1];
+        if (!event || !data) continue;
+
+        const payload = JSON.parse(data);
+        if (event === 'emotion') handlers.onEmotion?.(payload.emotion_detected);
+        else if (event === 'crisis') handlers.onCrisis?.(payload);
+        else if (event === 'media') handlers.onMedia?.(payload);
+        else if (event === 'delta') handlers.onDelta?.(payload.content);
+        else if (event === 'done') result = payload;
+      }
+    }
+
+    return { success: result !== null, data: result };
+  }
+
   // Emotion analysis
   async analyzeEmotion(request: EmotionRequest): Promise<EmotionResponse> {
     try {
@@ -182,7 +236,7 @@ class ApiService {
 
   async updateUserProfile(userId: string, profileData: any): Promise<any> {
     try {
-      const response = await this.api.put(`/api/v1/profile/${userId}`, profileData);
+      const response = await this.api.patch(`/api/v1/profile/${userId}`, profileData);
       return response.data;
     } catch (error: any) {
       throw new Error(error.response?.data?.detail || 'Failed to update profile');
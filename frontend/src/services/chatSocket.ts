@@ -0,0 +1,105 @@
+// Chat over one long-lived WebSocket (/api/v1/chat/ws). Turns resolve with
+// the final `done` payload, the same shape as apiService.sendMessage data,
+// so callers can fall back to HTTP when the socket isn't available.
+
+// The socket couldn't be opened, so the message was never sent: safe to
+// retry over HTTP. A connection lost mid-turn rejects with a plain Error
+// instead, since the server may already have recorded the message.
+export class ChatSocketUnavailableError extends Error {
+  constructor(message: string) {
+    super(message);
+    // Keeps instanceof working when compiled to ES5
+    Object.setPrototypeOf(this, ChatSocketUnavailableError.prototype);
+  }
+}
+
+type Handlers = {
+  onEmotion?: (emotion: string) => void;
+  onMedia?: (media: { category: string; type: string; items: string[]; message: string }) => void;
+  onCrisis?: (crisis: { level: 'low' | 'medium' | 'high'; resources: { name: string; contact: string }[] }) => void;
+  onDelta?: (content: string) => void;
+};
+
+type PendingTurn = {
+  handlers: Handlers;
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+};
+
+class ChatSocket {
+  private url = 'ws://localhost:8001/api/v1/chat/ws';
+  private socket: WebSocket | null = null;
+  private opening: Promise<WebSocket> | null = null;
+  private pending = new Map<string, PendingTurn>();
+  private nextRef = 0;
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket?.readyState === WebSocket.OPEN) return Promise.resolve(this.socket);
+    if (this.opening) return this.opening;
+
+    const token = localStorage.getItem('access_token');
+    let socket: WebSocket;
+    try {
+      socket = new WebSocket(token ? `${this.url}?token=${encodeURIComponent(token)}` : this.url);
+    } catch (error: any) {
+      return Promise.reject(new ChatSocketUnavailableError(error.message));
+    }
+    this.opening = new Promise<WebSocket>((resolve, reject) => {
+      socket.onmessage = (event) => {
+        const frame = JSON.parse(event.data);
+        if (frame.event === 'ready') {
+          this.socket = socket;
+          this.opening = null;
+          resolve(socket);
+        } else {
+          this.handleFrame(frame);
+        }
+      };
+      socket.onclose = (event) => {
+        this.socket = null;
+        this.opening = null;
+        // Only matters before `ready`; a settled promise ignores it
+        reject(new ChatSocketUnavailableError(event.reason || 'Chat connection closed'));
+        this.pending.forEach(turn => turn.reject(new Error(event.reason || 'Chat connection closed')));
+        this.pending.clear();
+      };
+    });
+    return this.opening;
+  }
+
+  private handleFrame(frame: { event: string; data: any; ref?: string }): void {
+    if (frame.event === 'ping') {
+      this.socket?.send(JSON.stringify({ type: 'pong' }));
+      return;
+    }
+    const turn = frame.ref !== undefined ? this.pending.get(frame.ref) : undefined;
+    if (!turn) return;
+
+    if (frame.event === 'emotion') turn.handlers.onEmotion?.(frame.data.emotion_detected);
+    else if (frame.event === 'crisis') turn.handlers.onCrisis?.(frame.data);
+    else if (frame.event === 'media') turn.handlers.onMedia?.(frame.data);
+    else if (frame.event === 'delta') turn.handlers.onDelta?.(frame.data.content);
+    else if (frame.event === 'done' || frame.event === 'error') {
+      this.pending.delete(frame.ref!);
+      if (frame.event === 'done') turn.resolve({ success: true, data: frame.data });
+      else turn.reject(new Error(typeof frame.data.detail === 'string' ? frame.data.detail : 'Failed to send message'));
+    }
+  }
+
+  async sendMessage(message: string, handlers: Handlers = {}): Promise<any> {
+    const socket = await this.connect();
+    const ref = String(this.nextRef++);
+    return new Promise((resolve, reject) => {
+      this.pending.set(ref, { handlers, resolve, reject });
+      socket.send(JSON.stringify({ type: 'chat', message, ref }));
+    });
+  }
+
+  close(): void {
+    this.socket?.close(1000);
+  }
+}
+
+// Export singleton instance
+export const chatSocket = new ChatSocket();
+export default chatSocket;